@@ -0,0 +1,380 @@
+import os
+import time
+from main import Board, Move, piece_helper, SEE_PIECE_VALUES, MOVE_FLAG_EN_PASSANT, MOVE_FLAG_PROMOTION
+from timer import Timer
+from default_player import DefaultPlayer
+from move_ordering import MoveOrdering
+from opening_book import OpeningBook
+from transposition_table import (TranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER,
+                                 DEFAULT_SIZE_MB)
+
+
+MATE_SCORE = 100000
+INFINITY = MATE_SCORE + 1
+MAX_DEPTH = 64
+
+# Half-width of the first aspiration window around the previous iteration's score, in centipawns
+ASPIRATION_WINDOW = 50
+# Expected number of moves still to play when splitting the remaining time
+MOVES_TO_GO = 30
+# Time kept in reserve for the UI and move application, in milliseconds
+TIME_SAFETY_MARGIN_MS = 50
+# Nodes searched between clock checks
+NODES_PER_TIME_CHECK = 1024
+# Quiescence search skips captures that cannot raise the score to alpha even with this much to spare
+DELTA_MARGIN = 200
+# Polyglot book played from when no other book is given, if the file exists
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+
+
+class SearchTimeout(Exception):
+    """Raised inside the search when the time budget for the move runs out."""
+
+
+class AlphaBetaPlayer(DefaultPlayer):
+    def __init__(self, max_depth: int = MAX_DEPTH, hash_size_mb: float = DEFAULT_SIZE_MB, book_path: str = None):
+        """
+        Args:
+            max_depth: Deepest iteration to search
+            hash_size_mb: Size of the transposition table in megabytes
+            book_path: Polyglot opening book to play from (default: DEFAULT_BOOK_PATH if it exists, "" for none)
+        """
+        super().__init__()
+        self.name = "Alpha-Beta Player"
+        self.max_depth = max_depth
+        if book_path is None and os.path.exists(DEFAULT_BOOK_PATH):
+            book_path = DEFAULT_BOOK_PATH
+        self.book = OpeningBook(book_path) if book_path else None
+        self.transposition_table = TranspositionTable(hash_size_mb)
+        self.move_ordering = MoveOrdering()
+        self.nodes = 0
+        self.deadline = 0.0
+        # (depth, score, nodes, nodes/sec, best move, seconds elapsed) of every completed iteration of the last search
+        self.iterations = []
+
+    def think(self, board: Board, timer: Timer) -> Move:
+        """
+        Search the current position with iterative deepening until the time budget runs out.
+
+        Args:
+            board: The current board state
+            timer: The game timer
+
+        Returns:
+            Move: The book move, or else the best move of the deepest completed iteration
+        """
+        book_move = self.book_move(board)
+        if book_move is not None:
+            return book_move
+
+        self.transposition_table.new_search()
+        self.transposition_table.reset_stats()
+        best_move = self.search(board, self.time_budget_ms(timer) / 1000)
+
+        stats = self.transposition_table.stats()
+        ordering_stats = self.move_ordering.stats()
+        print(f"tt hit rate {stats['hit_rate']:.1%}  collisions {stats['collisions']}  fill {stats['fill']:.1%}  "
+              f"first move cut-offs {ordering_stats['first_move_cutoff_rate']:.1%}")
+        return best_move
+
+    def save_cache(self, path: str) -> int:
+        """Save the transposition table, see TranspositionTable.save."""
+        return self.transposition_table.save(path)
+
+    def load_cache(self, path: str) -> int:
+        """Warm-start the transposition table from a file written by save_cache."""
+        return self.transposition_table.load(path)
+
+    def book_move(self, board: Board) -> Move | None:
+        """The heaviest book move of the position, or None if there is no book or the position is not in it."""
+        if self.book is None:
+            return None
+        move = self.book.choose_move(board)
+        if move is not None:
+            print(f"book move {move.get_printable()}")
+        return move
+
+    def search(self, board: Board, seconds: float, start_depth: int = 1, verbose: bool = True) -> Move:
+        """
+        Iterative deepening from `start_depth` until time runs out or keep_deepening says stop.
+        Every completed iteration is recorded in self.iterations.
+
+        Args:
+            board: The board to search; it is left as it was found
+            seconds: Time budget for the search
+            start_depth: Depth of the first iteration
+            verbose: Print a line per completed iteration
+
+        Returns:
+            Move: The best move of the deepest completed iteration
+        """
+        start_time = time.perf_counter()
+        self.deadline = start_time + seconds
+        self.nodes = 0
+        self.iterations = []
+        self.move_ordering.new_search()
+
+        moves = board.get_all_legal_moves()
+        if not moves:
+            print("ERROR: search called in a position without legal moves")
+            return None
+        if len(moves) == 1:
+            return moves[0]
+
+        best_move = moves[0]
+        score = 0
+        history_length = len(board.position_history)
+        for depth in range(start_depth, self.max_depth + 1):
+            # Search the previous best move first so a cut-off iteration is still worth something
+            moves = self.move_ordering.order_moves(board, moves, best_move, 0)
+            try:
+                score, move = self.search_with_aspiration(board, depth, score, moves)
+            except SearchTimeout:
+                # Unwind the moves the interrupted search left on the board
+                while len(board.position_history) > history_length:
+                    board.undo_move()
+                break
+            best_move = move
+
+            elapsed = time.perf_counter() - start_time
+            nodes_per_second = self.nodes / elapsed if elapsed > 0 else 0
+            self.iterations.append((depth, score, self.nodes, nodes_per_second, best_move, elapsed))
+            if verbose:
+                print(f"depth {depth:2d}  score {score:6d}  nodes {self.nodes:8d}  nps {nodes_per_second:7.0f}  "
+                      f"best {best_move.get_printable()}")
+            if not self.keep_deepening(score, elapsed, seconds):
+                break
+
+        return best_move
+
+    def keep_deepening(self, score: int, elapsed: float, seconds: float) -> bool:
+        """Stop on a forced mate, or when the next iteration is unlikely to finish in time."""
+        return abs(score) < MATE_SCORE - MAX_DEPTH and elapsed * 2 <= seconds
+
+    def out_of_time(self) -> bool:
+        """Checked every NODES_PER_TIME_CHECK nodes; True aborts the current iteration."""
+        return time.perf_counter() >= self.deadline
+
+    def time_budget_ms(self, timer: Timer) -> float:
+        """
+        Time to spend on this move: an even share of the remaining time plus most of the increment,
+        never more than half of what is left.
+
+        Args:
+            timer: The game timer
+
+        Returns:
+            float: Milliseconds to search for
+        """
+        remaining = timer.milliseconds_remaining
+        budget = remaining / MOVES_TO_GO + timer.increment_milliseconds * 3 / 4
+        budget = min(budget, remaining / 2) - TIME_SAFETY_MARGIN_MS
+        return max(budget, 1)
+
+    def search_with_aspiration(self, board: Board, depth: int, previous_score: int, moves: list[Move]) -> tuple[int, Move]:
+        """
+        Search the root in a narrow window around the previous score, widening it when the result falls outside.
+
+        Args:
+            board: The board to search
+            depth: Depth of this iteration
+            previous_score: Score of the previous iteration
+            moves: Legal root moves, best guess first
+
+        Returns:
+            tuple: (score, best move)
+        """
+        if depth < 3 or abs(previous_score) >= MATE_SCORE - MAX_DEPTH:
+            return self.search_root(board, depth, -INFINITY, INFINITY, moves)
+
+        window = ASPIRATION_WINDOW
+        alpha, beta = previous_score - window, previous_score + window
+        while True:
+            score, move = self.search_root(board, depth, alpha, beta, moves)
+            if score <= alpha:
+                alpha = max(alpha - window, -INFINITY)
+            elif score >= beta:
+                beta = min(beta + window, INFINITY)
+            else:
+                return score, move
+            window *= 2
+
+    def search_root(self, board: Board, depth: int, alpha: int, beta: int, moves: list[Move]) -> tuple[int, Move]:
+        best_score = -INFINITY
+        best_move = moves[0]
+        for move in moves:
+            board.make_move(move)
+            score = -self.negamax(board, depth - 1, -beta, -alpha, 1)
+            board.undo_move()
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score, best_move
+
+    def negamax(self, board: Board, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """
+        Fail-soft alpha-beta search.
+
+        Args:
+            board: The board to search
+            depth: Remaining depth in plies
+            alpha: Lower bound of the window
+            beta: Upper bound of the window
+            ply: Distance from the root, used to prefer shorter mates
+
+        Returns:
+            int: Score from the side to move's point of view
+        """
+        self.nodes += 1
+        if self.nodes % NODES_PER_TIME_CHECK == 0 and self.out_of_time():
+            raise SearchTimeout()
+
+        # A repetition inside the search is scored as a draw, the opponent could repeat again
+        if board.halfmove_clock >= 100 or board.repetition_counts.get(board.zobrist_hash, 0) >= 2:
+            return 0
+        if depth == 0:
+            return self.quiescence(board, alpha, beta, ply)
+
+        key = board.zobrist_hash
+        entry = self.transposition_table.probe(key)
+        hash_move = None
+        if entry is not None:
+            entry_depth, bound, score, hash_move = entry
+            if entry_depth >= depth:
+                score = score_from_table(score, ply)
+                if bound == BOUND_EXACT or (bound == BOUND_LOWER and score >= beta) or (bound == BOUND_UPPER and score <= alpha):
+                    return score
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = None
+        # Moves are generated stage by stage, so a cut-off before the quiet moves never generates them
+        for index, move in enumerate(self.move_ordering.staged_moves(board, hash_move, ply)):
+            board.make_move(move)
+            score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.undo_move()
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        self.move_ordering.record_cutoff(board, move, depth, ply, index)
+                        break
+
+        if best_move is None:
+            # No legal moves: checkmate or stalemate
+            return -MATE_SCORE + ply if board.king_is_attacked(board.is_white_turn) else 0
+
+        if best_score >= beta:
+            bound = BOUND_LOWER
+        elif best_score > original_alpha:
+            bound = BOUND_EXACT
+        else:
+            bound = BOUND_UPPER
+        self.transposition_table.store(key, depth, bound, score_to_table(best_score, ply), best_move)
+        return best_score
+
+    def quiescence(self, board: Board, alpha: int, beta: int, ply: int) -> int:
+        """
+        Search captures and promotions only until the position is quiet, so the evaluation is never taken
+        in the middle of an exchange. When in check every evasion is searched instead.
+
+        Args:
+            board: The board to search
+            alpha: Lower bound of the window
+            beta: Upper bound of the window
+            ply: Distance from the root
+
+        Returns:
+            int: Score from the side to move's point of view
+        """
+        self.nodes += 1
+        if self.nodes % NODES_PER_TIME_CHECK == 0 and self.out_of_time():
+            raise SearchTimeout()
+
+        if board.king_is_attacked(board.is_white_turn):
+            best_score = -INFINITY
+            for move in board.generate_legal_moves():
+                board.make_move(move)
+                score = -self.quiescence(board, -beta, -alpha, ply + 1)
+                board.undo_move()
+                if score > best_score:
+                    best_score = score
+                    if score > alpha:
+                        alpha = score
+                        if alpha >= beta:
+                            break
+            return best_score if best_score != -INFINITY else -MATE_SCORE + ply
+
+        # Stand pat: the side to move can usually do at least as well as the static evaluation by not capturing
+        best_score = self.evaluate(board)
+        if best_score >= beta:
+            return best_score
+        if best_score > alpha:
+            alpha = best_score
+
+        scored_captures = []
+        for move in board.get_legal_captures():
+            flag = move >> 12
+            if flag == MOVE_FLAG_EN_PASSANT:
+                gain = SEE_PIECE_VALUES[piece_helper.white_pawn]
+            else:
+                gain = SEE_PIECE_VALUES[abs(board.board[move >> 9 & 7][move >> 6 & 7])]
+            if flag >= MOVE_FLAG_PROMOTION:
+                gain += SEE_PIECE_VALUES[flag - MOVE_FLAG_PROMOTION + 2] - SEE_PIECE_VALUES[piece_helper.white_pawn]
+            # Delta pruning: even winning the piece outright would leave us below alpha
+            if best_score + gain + DELTA_MARGIN <= alpha:
+                continue
+            exchange = board.static_exchange_evaluation(move)
+            # Captures that lose material in the exchange are not worth searching
+            if exchange < 0:
+                continue
+            scored_captures.append((exchange, move))
+        scored_captures.sort(key=lambda scored: scored[0], reverse=True)
+
+        for _, move in scored_captures:
+            board.make_move(move)
+            score = -self.quiescence(board, -beta, -alpha, ply + 1)
+            board.undo_move()
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    def evaluate(self, board: Board) -> int:
+        """
+        Tapered material and piece-square score from the side to move's point of view,
+        read from the sums the board keeps up to date (see evaluation.py).
+
+        Args:
+            board: The board to evaluate
+
+        Returns:
+            int: Positive if the side to move is ahead
+        """
+        return board.evaluate()
+
+
+def score_to_table(score: int, ply: int) -> int:
+    """Store mate scores as distance from the stored position rather than from the root."""
+    if score >= MATE_SCORE - MAX_DEPTH:
+        return score + ply
+    if score <= -MATE_SCORE + MAX_DEPTH:
+        return score - ply
+    return score
+
+
+def score_from_table(score: int, ply: int) -> int:
+    """Convert a stored mate score back to distance from the root."""
+    if score >= MATE_SCORE - MAX_DEPTH:
+        return score - ply
+    if score <= -MATE_SCORE + MAX_DEPTH:
+        return score + ply
+    return score
@@ -0,0 +1,170 @@
+"""
+Move generation benchmarks over a fixed set of perft positions.
+
+    python benchmark.py --output results.json
+    python benchmark.py --save-baseline            # store this machine's numbers
+    python benchmark.py --baseline benchmark_baseline.json --threshold 0.1
+
+Every benchmark reports operations per second (nodes for perft, calls or move pairs for the rest),
+so a higher number is always better. Comparing against a baseline lists every result that dropped
+by more than the threshold and exits with status 1 if any did.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from main import Board
+from bitboard import BitboardBoard
+from perft import perft
+
+
+# name: (FEN, perft depth, expected node count)
+POSITIONS = {
+    "start": ("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1", 4, 197281),
+    "kiwipete": ("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", 3, 97862),
+    "test_gen_by_depth": ("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", 3, 62379),
+    "promotions": ("n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1", 3, 9483),
+    "en_passant": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 4, 43238),
+}
+
+DEFAULT_BASELINE_PATH = "benchmark_baseline.json"
+DEFAULT_THRESHOLD = 0.10  # Flag results more than 10% slower than the baseline
+
+
+def best_rate(run, operations: int, repeats: int) -> float:
+    """Run `run` several times and return operations per second of the fastest run."""
+    best = float("inf")
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start_time)
+    return operations / best if best > 0 else 0.0
+
+
+def bench_perft(board: Board, depth: int, expected: int, repeats: int) -> float:
+    nodes = perft(board, depth)
+    if nodes != expected:
+        print(f"ERROR: perft({depth}) of {board.get_fen()} gave {nodes} nodes, expected {expected}")
+    return best_rate(lambda: perft(board, depth), nodes, repeats)
+
+
+def bench_legal_moves(board: Board, repeats: int, calls: int = 200) -> float:
+    def run():
+        for _ in range(calls):
+            board.get_all_legal_moves()
+    return best_rate(run, calls, repeats)
+
+
+def bench_make_undo(board: Board, repeats: int, rounds: int = 20) -> float:
+    moves = board.get_all_legal_moves()
+
+    def run():
+        for _ in range(rounds):
+            for move in moves:
+                board.make_move(move)
+                board.undo_move()
+    return best_rate(run, rounds * len(moves), repeats)
+
+
+def bench_get_fen(board: Board, repeats: int, calls: int = 1000) -> float:
+    def run():
+        for _ in range(calls):
+            board.get_fen()
+    return best_rate(run, calls, repeats)
+
+
+def bench_zobrist_hash(board: Board, repeats: int, calls: int = 10000) -> float:
+    def run():
+        for _ in range(calls):
+            board.get_zobrist_hash()
+    return best_rate(run, calls, repeats)
+
+
+def run_benchmarks(board_class: type = Board, repeats: int = 3) -> dict:
+    """
+    Run every benchmark on every position.
+    Args:
+        board_class: Board implementation to measure
+        repeats: How many times to run each benchmark; the fastest run counts
+    Returns:
+        dict: {benchmark name: {position name: operations per second}}
+    """
+    results = {"perft": {}, "legal_moves": {}, "make_undo": {}, "get_fen": {}, "get_zobrist_hash": {}}
+    for name, (fen, depth, expected) in POSITIONS.items():
+        board = board_class(fen)
+        results["perft"][name] = bench_perft(board, depth, expected, repeats)
+        results["legal_moves"][name] = bench_legal_moves(board, repeats)
+        results["make_undo"][name] = bench_make_undo(board, repeats)
+        results["get_fen"][name] = bench_get_fen(board, repeats)
+        results["get_zobrist_hash"][name] = bench_zobrist_hash(board, repeats)
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """
+    Compare results with a baseline run.
+    Args:
+        results: Output of run_benchmarks
+        baseline: An earlier output of run_benchmarks
+        threshold: Fraction a result may drop below the baseline before it counts as a regression
+    Returns:
+        List of human-readable descriptions, one per regression
+    """
+    regressions = []
+    for benchmark, rates in baseline.items():
+        for position, baseline_rate in rates.items():
+            rate = results.get(benchmark, {}).get(position)
+            if rate is None or baseline_rate <= 0:
+                continue
+            change = rate / baseline_rate - 1
+            if change < -threshold:
+                regressions.append(f"{benchmark}/{position}: {rate:,.0f}/s vs {baseline_rate:,.0f}/s ({change:+.1%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark move generation and compare with a baseline.")
+    parser.add_argument("--bitboards", action="store_true", help="benchmark BitboardBoard instead of Board")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per benchmark; the fastest counts (default 3)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare with the results stored in this JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help=f"write the results to {DEFAULT_BASELINE_PATH}")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"slowdown that counts as a regression (default {DEFAULT_THRESHOLD})")
+    args = parser.parse_args()
+
+    board_class = BitboardBoard if args.bitboards else Board
+    results = run_benchmarks(board_class, args.repeats)
+    for benchmark, rates in results.items():
+        print(f"{benchmark}:")
+        for position, rate in rates.items():
+            print(f"  {position:<20} {rate:>14,.0f}/s")
+
+    report = {
+        "board": board_class.__name__,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    for path in filter(None, [args.output, DEFAULT_BASELINE_PATH if args.save_baseline else None]):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("board") != report["board"]:
+            print(f"WARNING: baseline was measured with {baseline.get('board')}, not {report['board']}")
+        regressions = find_regressions(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+from main import (Board, Move, piece_helper, _new_move, PROMOTION_FLAGS, SEE_PIECE_VALUES, MOVE_FLAG_EN_PASSANT,
+                  MOVE_FLAG_KINGSIDE_CASTLE, MOVE_FLAG_QUEENSIDE_CASTLE, MOVE_FLAG_PROMOTION)
+from tables import (WHITE, BLACK, squares_of, KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS, RAYS, BETWEEN,
+                    POSITIVE_DIRECTION, LINE_BLOCKER_MASKS, LINE_ATTACKS,
+                    CASTLING_KING_SQUARES, CASTLING_SAFE_SQUARES, CASTLING_EMPTY_MASKS)
+
+
+# Square index is row * 8 + col (the same numbering the Zobrist tables use),
+# so bit 0 is a8 and bit 63 is h1.
+ALL_SQUARES = (1 << 64) - 1
+
+
+def _nearest_square(bitboard: int, direction: int) -> int:
+    """The set bit of a ray's bitboard closest to the ray's origin."""
+    if POSITIVE_DIRECTION[direction]:
+        return (bitboard & -bitboard).bit_length() - 1
+    return bitboard.bit_length() - 1
+
+
+# A slider's attacks are one dictionary lookup per line, keyed by the pieces standing on that line
+_FILE_MASKS, _RANK_MASKS, _DIAGONAL_MASKS, _ANTI_DIAGONAL_MASKS = LINE_BLOCKER_MASKS
+_FILE_ATTACKS, _RANK_ATTACKS, _DIAGONAL_ATTACKS, _ANTI_DIAGONAL_ATTACKS = LINE_ATTACKS
+
+
+def rook_attacks(square: int, occupied: int) -> int:
+    return (_FILE_ATTACKS[square][occupied & _FILE_MASKS[square]] |
+            _RANK_ATTACKS[square][occupied & _RANK_MASKS[square]])
+
+
+def bishop_attacks(square: int, occupied: int) -> int:
+    return (_DIAGONAL_ATTACKS[square][occupied & _DIAGONAL_MASKS[square]] |
+            _ANTI_DIAGONAL_ATTACKS[square][occupied & _ANTI_DIAGONAL_MASKS[square]])
+
+
+def iterate_squares(bitboard: int):
+    """Yield the index of every set bit, lowest first."""
+    while bitboard:
+        lowest = bitboard & -bitboard
+        yield lowest.bit_length() - 1
+        bitboard ^= lowest
+
+
+class BitboardBoard(Board):
+    """
+    Board backed by one 64-bit integer per piece type and color plus occupancy masks.
+    The 8x8 `board` list is kept in sync so get_piece, get_fen and any code reading
+    `board.board` directly behave exactly as with the list-based Board.
+    """
+
+    def __init__(self, fen: str = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"):
+        super().__init__(fen)
+        self.bitboards = [0] * 13  # piece + 6 -> bitboard (index 6, the empty square, stays 0)
+        self.occupancy = [0, 0]    # [WHITE, BLACK]
+        self.sync_bitboards()
+
+    def sync_bitboards(self):
+        """Rebuild every bitboard from the 8x8 board."""
+        self.bitboards = [0] * 13
+        self.occupancy = [0, 0]
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != piece_helper.empty:
+                    bit = 1 << (row * 8 + col)
+                    self.bitboards[piece + 6] |= bit
+                    self.occupancy[WHITE if piece > 0 else BLACK] |= bit
+
+    def make_move(self, move: Move) -> bool:
+        """
+        Make a move on the board, updating the bitboards alongside the 8x8 board.
+        Args:
+            move: The move to make
+        Returns:
+            bool: True if the move was successful, False otherwise
+        """
+        if not super().make_move(move):
+            return False
+        record = self.position_history[-1]
+        self._toggle_move_bits(move, record.moved_piece, record.captured_piece)
+        return True
+
+    def undo_move(self) -> bool:
+        """
+        Undo the last move made.
+        Returns:
+            bool: True if a move was undone, False if there are no moves to undo
+        """
+        if not self.position_history:
+            return False
+        # Every bitboard change is an XOR, so applying the same changes again reverses them
+        record = self.position_history[-1]
+        self._toggle_move_bits(record.move, record.moved_piece, record.captured_piece)
+        return super().undo_move()
+
+    def _toggle_move_bits(self, move: Move, piece: int, captured_piece: int):
+        bitboards = self.bitboards
+        occupancy = self.occupancy
+        us, them = (WHITE, BLACK) if piece > 0 else (BLACK, WHITE)
+        start_square = move & 63
+        end_square = move >> 6 & 63
+        flag = move >> 12
+        from_bit = 1 << start_square
+        to_bit = 1 << end_square
+        placed_piece = piece
+        if flag >= MOVE_FLAG_PROMOTION:
+            placed_piece = flag - MOVE_FLAG_PROMOTION + 2 if piece > 0 else MOVE_FLAG_PROMOTION - 2 - flag
+
+        bitboards[piece + 6] ^= from_bit
+        bitboards[placed_piece + 6] ^= to_bit
+        occupancy[us] ^= from_bit | to_bit
+
+        if flag == MOVE_FLAG_EN_PASSANT:
+            # The captured pawn stands on the start row, in the end column
+            captured_bit = 1 << ((start_square & ~7) | (end_square & 7))
+            bitboards[captured_piece + 6] ^= captured_bit
+            occupancy[them] ^= captured_bit
+        elif captured_piece != piece_helper.empty:
+            bitboards[captured_piece + 6] ^= to_bit
+            occupancy[them] ^= to_bit
+        elif flag == MOVE_FLAG_KINGSIDE_CASTLE or flag == MOVE_FLAG_QUEENSIDE_CASTLE:
+            # Rook jumps from the corner to the square the king passed over
+            if flag == MOVE_FLAG_KINGSIDE_CASTLE:
+                rook_bits = (1 << (start_square + 3)) | (1 << (start_square + 1))
+            else:
+                rook_bits = (1 << (start_square - 4)) | (1 << (start_square - 1))
+            bitboards[(piece_helper.white_rook if piece > 0 else piece_helper.black_rook) + 6] ^= rook_bits
+            occupancy[us] ^= rook_bits
+
+    def find_king(self, is_white: bool) -> tuple[int, int]:
+        """Find the position of the specified king."""
+        king_bitboard = self.bitboards[(piece_helper.white_king if is_white else piece_helper.black_king) + 6]
+        if not king_bitboard:
+            print(f"ERROR: No {'white' if is_white else 'black'} king found on the board!")
+            return -1, -1
+        return divmod(king_bitboard.bit_length() - 1, 8)
+
+    def is_square_attacked(self, row: int, col: int, is_white: bool) -> bool:
+        """Check if a square is attacked by any opponent piece."""
+        if not (0 <= row < 8 and 0 <= col < 8):
+            print(f"ERROR: is_square_attacked called with invalid coordinates: {row}, {col}")
+            return False
+        return self._square_attacked(row * 8 + col, is_white)
+
+    def _square_attacked(self, square: int, is_white: bool, occupied: int = None) -> bool:
+        # Look outward from the square: a piece on it "sees" exactly the attackers of the same kind.
+        bitboards = self.bitboards
+        sign = -1 if is_white else 1  # Sign of the opponent's pieces
+        if KNIGHT_ATTACKS[square] & bitboards[sign * piece_helper.white_knight + 6]:
+            return True
+        if KING_ATTACKS[square] & bitboards[sign * piece_helper.white_king + 6]:
+            return True
+        if PAWN_ATTACKS[WHITE if is_white else BLACK][square] & bitboards[sign * piece_helper.white_pawn + 6]:
+            return True
+        if occupied is None:
+            occupied = self.occupancy[WHITE] | self.occupancy[BLACK]
+        queens = bitboards[sign * piece_helper.white_queen + 6]
+        if rook_attacks(square, occupied) & (bitboards[sign * piece_helper.white_rook + 6] | queens):
+            return True
+        if bishop_attacks(square, occupied) & (bitboards[sign * piece_helper.white_bishop + 6] | queens):
+            return True
+        return False
+
+    def attackers_mask(self, square: int, is_white: bool, occupied: int = None) -> int:
+        """
+        Bitboard of every piece of the given color attacking a square.
+        Args:
+            square: Square index (row * 8 + col)
+            is_white: True for white attackers, False for black attackers
+            occupied: Occupancy to slide through, e.g. with pieces already exchanged removed
+        Returns:
+            int: Mask of the attacking pieces' squares
+        """
+        bitboards = self.bitboards
+        sign = 1 if is_white else -1
+        if occupied is None:
+            occupied = self.occupancy[WHITE] | self.occupancy[BLACK]
+        queens = bitboards[sign * piece_helper.white_queen + 6]
+        attackers = ((KNIGHT_ATTACKS[square] & bitboards[sign * piece_helper.white_knight + 6]) |
+                     (KING_ATTACKS[square] & bitboards[sign * piece_helper.white_king + 6]) |
+                     # A pawn of the defending color on the square attacks exactly where enemy pawns attack it from
+                     (PAWN_ATTACKS[BLACK if is_white else WHITE][square] & bitboards[sign * piece_helper.white_pawn + 6]) |
+                     (rook_attacks(square, occupied) & (bitboards[sign * piece_helper.white_rook + 6] | queens)) |
+                     (bishop_attacks(square, occupied) & (bitboards[sign * piece_helper.white_bishop + 6] | queens)))
+        return attackers & occupied
+
+    def attackers_of(self, row: int, col: int, is_white: bool) -> list[tuple[int, int]]:
+        """
+        Find every piece of the given color that attacks a square.
+        Args:
+            row: Row of the square
+            col: Column of the square
+            is_white: True to list white attackers, False to list black attackers
+        Returns:
+            List of (row, col) squares of the attacking pieces
+        """
+        return [divmod(square, 8) for square in iterate_squares(self.attackers_mask(row * 8 + col, is_white))]
+
+    def king_is_attacked(self, white_king: bool) -> bool:
+        """
+        Check if the specified king is under attack.
+        Args:
+            white_king: True to check white king, False to check black king
+        Returns:
+            bool: True if the king is under attack, False otherwise
+        """
+        king_bitboard = self.bitboards[(piece_helper.white_king if white_king else piece_helper.black_king) + 6]
+        return self._square_attacked(king_bitboard.bit_length() - 1, white_king)
+
+    def get_pseudo_legal_moves(self, row: int, col: int, only_captures: bool = False) -> list[Move]:
+        """
+        Get all possible moves for a piece at the given position, without checking if the move would leave the king in check.
+        Args:
+            row: Row of the piece
+            col: Column of the piece
+            only_captures: If True, only return captures, en passant and promotions
+        Returns:
+            List of Move objects representing possible moves
+        """
+        if not (0 <= row < 8 and 0 <= col < 8):
+            print(f"ERROR: get_pseudo_legal_moves called with invalid coordinates: {row}, {col}")
+            return []
+        piece = self.board[row][col]
+        if piece == piece_helper.empty:
+            print("ERROR: get_pseudo_legal_moves called on empty square")
+            return []
+
+        moves = []
+        square = row * 8 + col
+        is_white = piece > 0
+        own = self.occupancy[WHITE if is_white else BLACK]
+        enemy = self.occupancy[BLACK if is_white else WHITE]
+        occupied = own | enemy
+        kind = abs(piece)
+
+        if kind == piece_helper.white_pawn:
+            self._add_pawn_moves(moves, row, col, is_white, enemy, occupied, only_captures)
+            return moves
+
+        if kind == piece_helper.white_knight:
+            targets = KNIGHT_ATTACKS[square]
+        elif kind == piece_helper.white_bishop:
+            targets = bishop_attacks(square, occupied)
+        elif kind == piece_helper.white_rook:
+            targets = rook_attacks(square, occupied)
+        elif kind == piece_helper.white_queen:
+            targets = rook_attacks(square, occupied) | bishop_attacks(square, occupied)
+        else:
+            targets = KING_ATTACKS[square]
+        targets &= enemy if only_captures else ~own
+
+        for target in iterate_squares(targets):
+            moves.append(_new_move(Move, square | target << 6))
+        return moves
+
+    def _add_pawn_moves(self, moves: list[Move], row: int, col: int, is_white: bool,
+                        enemy: int, occupied: int, only_captures: bool, allowed: int = ALL_SQUARES):
+        """Append a pawn's moves; all but en passant (always added last) must land on `allowed`."""
+        square = row * 8 + col
+        step = -8 if is_white else 8
+        promotion_rank = 0 if is_white else 7
+        new_row = row + (-1 if is_white else 1)
+        one_step = square + step
+
+        # Forward moves (only promotions when generating captures)
+        if (not only_captures or new_row == promotion_rank) and not occupied >> one_step & 1:
+            if new_row == promotion_rank:
+                if allowed >> one_step & 1:
+                    for flag in PROMOTION_FLAGS:
+                        moves.append(_new_move(Move, square | one_step << 6 | flag << 12))
+            else:
+                if allowed >> one_step & 1:
+                    moves.append(_new_move(Move, square | one_step << 6))
+                two_steps = one_step + step
+                if row == (6 if is_white else 1) and not occupied >> two_steps & 1 and allowed >> two_steps & 1:
+                    moves.append(_new_move(Move, square | two_steps << 6))
+
+        # Regular captures
+        captures = PAWN_ATTACKS[WHITE if is_white else BLACK][square] & enemy & allowed
+        while captures:
+            lowest = captures & -captures
+            target = lowest.bit_length() - 1
+            if new_row == promotion_rank:
+                for flag in PROMOTION_FLAGS:
+                    moves.append(_new_move(Move, square | target << 6 | flag << 12))
+            else:
+                moves.append(_new_move(Move, square | target << 6))
+            captures ^= lowest
+
+        # En passant captures
+        if self.en_passant_target is not None:
+            en_passant_row, en_passant_col = self.en_passant_target
+            if row == (3 if is_white else 4) and abs(col - en_passant_col) == 1:
+                target = en_passant_row * 8 + en_passant_col
+                moves.append(_new_move(Move, square | target << 6 | MOVE_FLAG_EN_PASSANT << 12))
+
+    def _check_and_pin_masks(self, is_white: bool) -> tuple[int, int, dict]:
+        """
+        Bitboard counterpart of get_checks_and_pins.
+        Returns:
+            tuple: (number of checkers, mask of squares that resolve the check (all squares if not in check),
+                    {pinned piece square: mask of squares it may move to})
+        """
+        bitboards = self.bitboards
+        own = self.occupancy[WHITE if is_white else BLACK]
+        occupied = own | self.occupancy[BLACK if is_white else WHITE]
+        sign = -1 if is_white else 1  # Sign of the opponent's pieces
+        king_square = bitboards[(piece_helper.white_king if is_white else piece_helper.black_king) + 6].bit_length() - 1
+        enemy_queens = bitboards[sign * piece_helper.white_queen + 6]
+        rook_sliders = bitboards[sign * piece_helper.white_rook + 6] | enemy_queens
+        bishop_sliders = bitboards[sign * piece_helper.white_bishop + 6] | enemy_queens
+
+        checkers = 0
+        check_mask = 0
+        pins = {}
+        for direction in range(8):
+            ray = RAYS[direction][king_square]
+            sliders = ray & (rook_sliders if direction < 4 else bishop_sliders)
+            if not sliders:
+                continue
+            blockers = ray & occupied
+            first = _nearest_square(blockers, direction)
+            if sliders >> first & 1:
+                checkers += 1
+                check_mask |= BETWEEN[king_square * 64 + first] | 1 << first
+            elif own >> first & 1:
+                behind = blockers ^ (1 << first)
+                if behind:
+                    second = _nearest_square(behind, direction)
+                    if sliders >> second & 1:
+                        pins[first] = BETWEEN[king_square * 64 + second] | 1 << second
+
+        leapers = ((KNIGHT_ATTACKS[king_square] & bitboards[sign * piece_helper.white_knight + 6]) |
+                   (PAWN_ATTACKS[WHITE if is_white else BLACK][king_square] & bitboards[sign * piece_helper.white_pawn + 6]))
+        if leapers:
+            checkers += bin(leapers).count("1")
+            check_mask |= leapers
+
+        return checkers, check_mask if checkers else ALL_SQUARES, pins
+
+    def _legal_piece_moves(self, row: int, col: int, checks_and_pins: tuple[int, int, dict],
+                           only_captures: bool = False) -> list[Move]:
+        """Generate the legal moves of one piece from its target mask, the check mask and its pin ray."""
+        piece = self.board[row][col]
+        checkers, check_mask, pins = checks_and_pins
+        square = row * 8 + col
+        is_white = piece > 0
+        own = self.occupancy[WHITE if is_white else BLACK]
+        enemy = self.occupancy[BLACK if is_white else WHITE]
+        occupied = own | enemy
+        kind = abs(piece)
+        moves = []
+        # Squares a move may land on: any not holding our own piece, or only enemy pieces for captures
+        landing = enemy if only_captures else ~own
+
+        if kind == piece_helper.white_king:
+            # Take the king off the board so sliders attack through the square it leaves
+            occupied_without_king = occupied ^ (1 << square)
+            for target in iterate_squares(KING_ATTACKS[square] & landing):
+                if not self._square_attacked(target, is_white, occupied_without_king):
+                    moves.append(_new_move(Move, square | target << 6))
+            if checkers == 0 and not only_captures:
+                moves.extend(self._castling_moves(row, col, is_white))
+            return moves
+
+        # In double check only the king can move
+        if checkers > 1:
+            return moves
+
+        allowed = check_mask & pins.get(square, ALL_SQUARES)
+        if kind == piece_helper.white_pawn:
+            self._add_pawn_moves(moves, row, col, is_white, enemy, occupied, only_captures, allowed)
+            # En passant removes two pieces from one rank, which can uncover a check that no pin covers
+            if moves and moves[-1] >> 12 == MOVE_FLAG_EN_PASSANT and not self._leaves_king_safe(moves[-1]):
+                moves.pop()
+            return moves
+
+        if kind == piece_helper.white_knight:
+            targets = KNIGHT_ATTACKS[square]
+        elif kind == piece_helper.white_bishop:
+            targets = bishop_attacks(square, occupied)
+        elif kind == piece_helper.white_rook:
+            targets = rook_attacks(square, occupied)
+        else:
+            targets = rook_attacks(square, occupied) | bishop_attacks(square, occupied)
+
+        targets &= landing & allowed
+        while targets:
+            lowest = targets & -targets
+            moves.append(_new_move(Move, square | (lowest.bit_length() - 1) << 6))
+            targets ^= lowest
+        return moves
+
+    def _castling_moves(self, row: int, col: int, is_white: bool) -> list[Move]:
+        """Castling moves for a king that is not in check, tested with the precomputed path masks."""
+        moves = []
+        occupied = self.occupancy[WHITE] | self.occupancy[BLACK]
+        king_square = row * 8 + col
+        for side in (0, 1) if is_white else (2, 3):
+            start_square, end_square = CASTLING_KING_SQUARES[side]
+            if not self.castling_rights >> side & 1 or king_square != start_square:
+                continue
+            if occupied & CASTLING_EMPTY_MASKS[side]:
+                continue
+            if any(self._square_attacked(square, is_white, occupied) for square in CASTLING_SAFE_SQUARES[side]):
+                continue
+            flag = MOVE_FLAG_KINGSIDE_CASTLE if end_square > start_square else MOVE_FLAG_QUEENSIDE_CASTLE
+            moves.append(_new_move(Move, start_square | end_square << 6 | flag << 12))
+        return moves
+
+    def get_piece_moves(self, row: int, col: int) -> list[Move]:
+        """
+        Get all legal moves for a piece at the given position, including castling.
+        Args:
+            row: Row of the piece
+            col: Column of the piece
+        Returns:
+            List of Move objects representing legal moves
+        """
+        piece = self.get_piece(row, col)
+        if piece == piece_helper.empty:
+            print(f"ERROR: get_piece_moves called on empty square at {row}, {col}")
+            return []
+        return self._legal_piece_moves(row, col, self._check_and_pin_masks(piece > 0))
+
+    def _checks_and_pins_to_move(self) -> tuple[int, int, dict]:
+        return self._check_and_pin_masks(self.is_white_turn)
+
+    def _squares_to_move(self) -> list[int]:
+        return squares_of(self.occupancy[WHITE if self.is_white_turn else BLACK])
+
+    def static_exchange_evaluation(self, move: Move) -> int:
+        """
+        Estimate the material won or lost by a capture once all captures on its target square are played out.
+        Bitboard version of Board.static_exchange_evaluation: exchanged pieces are removed from an
+        occupancy mask, which uncovers the sliders behind them.
+        Args:
+            move: The capture (or any move) to evaluate, for the side to move
+        Returns:
+            int: Expected material gain in centipawns for the side making the move
+        """
+        bitboards = self.bitboards
+        start_square = move & 63
+        end_square = move >> 6 & 63
+        flag = move >> 12
+        piece = self.board[start_square >> 3][start_square & 7]
+
+        gains = [SEE_PIECE_VALUES[abs(self.board[end_square >> 3][end_square & 7])]]
+        next_victim = SEE_PIECE_VALUES[abs(piece)]
+        occupied = (self.occupancy[WHITE] | self.occupancy[BLACK]) ^ (1 << start_square)
+        if flag == MOVE_FLAG_EN_PASSANT:
+            gains[0] = SEE_PIECE_VALUES[piece_helper.white_pawn]
+            occupied ^= 1 << ((start_square & ~7) | (end_square & 7))
+        elif flag >= MOVE_FLAG_PROMOTION:
+            promotion_value = SEE_PIECE_VALUES[flag - MOVE_FLAG_PROMOTION + 2]
+            gains[0] += promotion_value - SEE_PIECE_VALUES[piece_helper.white_pawn]
+            next_victim = promotion_value
+
+        is_white = piece < 0
+        while True:
+            attackers = self.attackers_mask(end_square, is_white, occupied)
+            if not attackers:
+                break
+            # Least valuable attacker first
+            sign = 1 if is_white else -1
+            for kind in range(piece_helper.white_pawn, piece_helper.white_king + 1):
+                candidates = attackers & bitboards[sign * kind + 6]
+                if candidates:
+                    break
+            gains.append(next_victim - gains[-1])
+            next_victim = SEE_PIECE_VALUES[kind]
+            occupied ^= candidates & -candidates
+            is_white = not is_white
+
+        # Each side may stop capturing when continuing would be worse
+        while len(gains) > 1:
+            last = gains.pop()
+            gains[-1] = -max(-gains[-1], last)
+        return gains[0]
@@ -29,3 +29,27 @@ class DefaultPlayer:
         # sleep(0.1)
 
         return chosen_move
+
+    def save_cache(self, path: str) -> int:
+        """
+        Save what the player learned while searching, so later games and runs can start from it.
+
+        Args:
+            path: File to write
+
+        Returns:
+            int: Number of entries saved (the default player keeps nothing)
+        """
+        return 0
+
+    def load_cache(self, path: str) -> int:
+        """
+        Load a cache written by save_cache.
+
+        Args:
+            path: File to read
+
+        Returns:
+            int: Number of entries loaded (the default player keeps nothing)
+        """
+        return 0
@@ -0,0 +1,124 @@
+"""
+Vectorized board-to-feature encoding for neural networks.
+
+Every position becomes FEATURE_COUNT values, all 0 or 1:
+
+    0-767    piece planes, 12 x 8 x 8: plane 0-5 white pawn..king, 6-11 black pawn..king,
+             then row and column as on the board (a8 first)
+    768      white to move
+    769-772  castling rights (white kingside, white queenside, black kingside, black queenside)
+    773-780  en passant file
+
+A BoardEncoder copies the state of each board it is given into small preallocated arrays (the 8x8
+board goes in as it is, without building a FEN) and then fills the feature rows of the whole batch
+with a handful of NumPy indexing operations. All arrays, including the output, are allocated once
+and reused, or the caller passes the output buffer in, for example an array over shared memory.
+"""
+import numpy as np
+from main import Board
+
+
+PIECE_FEATURES = 12 * 64
+SIDE_FEATURE = PIECE_FEATURES
+CASTLING_FEATURE = SIDE_FEATURE + 1
+EN_PASSANT_FEATURE = CASTLING_FEATURE + 4
+FEATURE_COUNT = EN_PASSANT_FEATURE + 8
+
+# piece + 6 -> first feature of the piece's plane (empty squares never index this)
+PLANE_OFFSETS = np.array([11, 10, 9, 8, 7, 6, 0, 0, 1, 2, 3, 4, 5], dtype=np.intp) * 64
+_CASTLING_BITS = np.arange(4, dtype=np.int8)
+
+
+def piece_planes(features: np.ndarray) -> np.ndarray:
+    """View the piece features of a (positions, FEATURE_COUNT) array as (positions, 12, 8, 8), without copying."""
+    return features[:, :PIECE_FEATURES].reshape(-1, 12, 8, 8)
+
+
+class BoardEncoder:
+    def __init__(self, capacity: int = 256, features: np.ndarray = None, dtype: type = np.float32):
+        """
+        Args:
+            capacity: Most positions in one batch; the buffers grow if a batch is larger
+            features: Optional output buffer of shape (capacity, FEATURE_COUNT) to write into
+            dtype: Type of the output buffer if it is allocated here
+        """
+        if features is not None and (features.ndim != 2 or features.shape[1] != FEATURE_COUNT):
+            print(f"ERROR: feature buffer has shape {features.shape}, expected (positions, {FEATURE_COUNT})")
+            features = None
+        if features is not None:
+            capacity = features.shape[0]
+        self.capacity = 0
+        self.count = 0
+        self.dtype = dtype
+        self.features = features
+        self._allocate(capacity, keep_features=features is not None)
+
+    def _allocate(self, capacity: int, keep_features: bool = False):
+        if not keep_features:
+            self.features = np.zeros((capacity, FEATURE_COUNT), dtype=self.dtype)
+        self.pieces = np.zeros((capacity, 8, 8), dtype=np.int8)
+        self.white_to_move = np.zeros(capacity, dtype=np.bool_)
+        self.castling_rights = np.zeros(capacity, dtype=np.int8)
+        self.en_passant_files = np.full(capacity, -1, dtype=np.intp)
+        self.capacity = capacity
+
+    def reserve(self, capacity: int):
+        """Make room for batches of `capacity` positions (replacing a caller-provided buffer if it is too small)."""
+        if capacity > self.capacity:
+            count = self.count
+            old = (self.pieces, self.white_to_move, self.castling_rights, self.en_passant_files)
+            self._allocate(max(capacity, 2 * self.capacity))
+            for new_array, old_array in zip((self.pieces, self.white_to_move, self.castling_rights,
+                                             self.en_passant_files), old):
+                new_array[:count] = old_array[:count]
+
+    def clear(self):
+        """Start a new batch."""
+        self.count = 0
+
+    def add(self, board: Board) -> int:
+        """
+        Copy a position into the batch; it can be changed or undone afterwards.
+        Args:
+            board: The position
+        Returns:
+            int: Row of the position in the encoded batch
+        """
+        row = self.count
+        if row == self.capacity:
+            self.reserve(row + 1)
+        self.pieces[row] = board.board
+        self.white_to_move[row] = board.is_white_turn
+        self.castling_rights[row] = board.castling_rights
+        self.en_passant_files[row] = -1 if board.en_passant_target is None else board.en_passant_target[1]
+        self.count = row + 1
+        return row
+
+    def encode(self) -> np.ndarray:
+        """
+        Write the features of the positions added since the last clear.
+        Returns:
+            np.ndarray: View of the first rows of the output buffer, shape (positions, FEATURE_COUNT)
+        """
+        count = self.count
+        features = self.features[:count]
+        features.fill(0)
+
+        pieces = self.pieces[:count].reshape(count, 64)
+        rows, squares = np.nonzero(pieces)
+        features[rows, PLANE_OFFSETS[pieces[rows, squares] + 6] + squares] = 1
+
+        features[:, SIDE_FEATURE] = self.white_to_move[:count]
+        features[:, CASTLING_FEATURE:CASTLING_FEATURE + 4] = (self.castling_rights[:count, None] >> _CASTLING_BITS) & 1
+        files = self.en_passant_files[:count]
+        rows = np.nonzero(files >= 0)[0]
+        features[rows, EN_PASSANT_FEATURE + files[rows]] = 1
+        return features
+
+    def encode_boards(self, boards: list[Board]) -> np.ndarray:
+        """Encode a list of boards as one batch, see encode."""
+        self.clear()
+        self.reserve(len(boards))
+        for board in boards:
+            self.add(board)
+        return self.encode()
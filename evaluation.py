@@ -0,0 +1,152 @@
+"""
+Tapered evaluation kept up to date by Board.make_move and Board.undo_move.
+
+Every piece on a square contributes a middlegame and an endgame score (material plus a piece-square
+bonus, positive for white) and a game-phase weight. The board keeps the running sums, so a move only
+subtracts and adds the entries of the pieces it moves, captures or promotes, and evaluating a position
+blends the two sums by the phase without looking at the squares.
+
+The middlegame and endgame scores are packed into one int as mg + eg * 2**SCORE_SHIFT, so a single
+addition updates both. Material values are PeSTO's; the piece-square tables are those of the Simplified
+Evaluation Function, with an endgame king table that pulls the king to the centre and an endgame pawn
+table that rewards advanced pawns. Tables are written from white's side with a8 first, the same order
+as the board's squares (row * 8 + col); black uses the vertically mirrored square.
+"""
+
+SCORE_SHIFT = 20
+_HALF = 1 << (SCORE_SHIFT - 1)
+
+# Phase weight by abs(piece); a full set of pieces adds up to MAX_PHASE (pure middlegame), bare kings to 0
+PHASE_WEIGHTS = [0, 0, 1, 1, 2, 4, 0]
+MAX_PHASE = 24
+
+# Material by abs(piece): pawn, knight, bishop, rook, queen, king
+MIDDLEGAME_VALUES = [0, 82, 337, 365, 477, 1025, 0]
+ENDGAME_VALUES = [0, 94, 281, 297, 512, 936, 0]
+
+PAWN_TABLE = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     10,  10,  20,  30,  30,  20,  10,  10,
+      5,   5,  10,  25,  25,  10,   5,   5,
+      0,   0,   0,  20,  20,   0,   0,   0,
+      5,  -5, -10,   0,   0, -10,  -5,   5,
+      5,  10,  10, -20, -20,  10,  10,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+PAWN_ENDGAME_TABLE = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+     80,  80,  80,  80,  80,  80,  80,  80,
+     50,  50,  50,  50,  50,  50,  50,  50,
+     30,  30,  30,  30,  30,  30,  30,  30,
+     15,  15,  15,  15,  15,  15,  15,  15,
+      5,   5,   5,   5,   5,   5,   5,   5,
+      0,   0,   0,   0,   0,   0,   0,   0,
+      0,   0,   0,   0,   0,   0,   0,   0,
+]
+KNIGHT_TABLE = [
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20,   0,   0,   0,   0, -20, -40,
+    -30,   0,  10,  15,  15,  10,   0, -30,
+    -30,   5,  15,  20,  20,  15,   5, -30,
+    -30,   0,  15,  20,  20,  15,   0, -30,
+    -30,   5,  10,  15,  15,  10,   5, -30,
+    -40, -20,   0,   5,   5,   0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+]
+BISHOP_TABLE = [
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,  10,  10,   5,   0, -10,
+    -10,   5,   5,  10,  10,   5,   5, -10,
+    -10,   0,  10,  10,  10,  10,   0, -10,
+    -10,  10,  10,  10,  10,  10,  10, -10,
+    -10,   5,   0,   0,   0,   0,   5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+]
+ROOK_TABLE = [
+      0,   0,   0,   0,   0,   0,   0,   0,
+      5,  10,  10,  10,  10,  10,  10,   5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+     -5,   0,   0,   0,   0,   0,   0,  -5,
+      0,   0,   0,   5,   5,   0,   0,   0,
+]
+QUEEN_TABLE = [
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+    -10,   0,   0,   0,   0,   0,   0, -10,
+    -10,   0,   5,   5,   5,   5,   0, -10,
+     -5,   0,   5,   5,   5,   5,   0,  -5,
+      0,   0,   5,   5,   5,   5,   0,  -5,
+    -10,   5,   5,   5,   5,   5,   0, -10,
+    -10,   0,   5,   0,   0,   0,   0, -10,
+    -20, -10, -10,  -5,  -5, -10, -10, -20,
+]
+KING_TABLE = [
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+     20,  20,   0,   0,   0,   0,  20,  20,
+     20,  30,  10,   0,   0,  10,  30,  20,
+]
+KING_ENDGAME_TABLE = [
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10,   0,   0, -10, -20, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  30,  40,  40,  30, -10, -30,
+    -30, -10,  20,  30,  30,  20, -10, -30,
+    -30, -30,   0,   0,   0,   0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+]
+
+# abs(piece) -> piece-square table
+MIDDLEGAME_TABLES = [None, PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE, KING_TABLE]
+ENDGAME_TABLES = [None, PAWN_ENDGAME_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE, KING_ENDGAME_TABLE]
+
+# Lookups used by the board, indexed like the Zobrist keys; empty squares are 0
+PIECE_SQUARE_SCORES = [0] * (13 * 64)  # (piece + 6) * 64 + square -> packed score, positive for white
+PIECE_PHASES = [0] * 13                # piece + 6 -> phase weight
+
+
+def pack_score(middlegame: int, endgame: int) -> int:
+    return middlegame + (endgame << SCORE_SHIFT)
+
+
+def endgame_score(score: int) -> int:
+    return (score + _HALF) >> SCORE_SHIFT
+
+
+def middlegame_score(score: int) -> int:
+    return score - (endgame_score(score) << SCORE_SHIFT)
+
+
+def tapered_score(score: int, phase: int) -> int:
+    """
+    Blend a packed score by the game phase.
+    Args:
+        score: Packed middlegame and endgame score
+        phase: Sum of the phase weights on the board (more than MAX_PHASE counts as MAX_PHASE)
+    Returns:
+        int: Score in centipawns from the same side's point of view as the packed score
+    """
+    phase = min(phase, MAX_PHASE)
+    return (middlegame_score(score) * phase + endgame_score(score) * (MAX_PHASE - phase)) // MAX_PHASE
+
+
+def _init_tables():
+    for kind in range(1, 7):
+        PIECE_PHASES[kind + 6] = PIECE_PHASES[-kind + 6] = PHASE_WEIGHTS[kind]
+        for square in range(64):
+            score = pack_score(MIDDLEGAME_VALUES[kind] + MIDDLEGAME_TABLES[kind][square],
+                               ENDGAME_VALUES[kind] + ENDGAME_TABLES[kind][square])
+            PIECE_SQUARE_SCORES[(kind + 6) * 64 + square] = score
+            PIECE_SQUARE_SCORES[(-kind + 6) * 64 + (square ^ 56)] = -score
+
+
+_init_tables()
@@ -0,0 +1,162 @@
+"""
+Bounded cache of position evaluations keyed by Zobrist hash.
+
+Network evaluation is the expensive part of a neural player's move, and the same positions come back:
+the children of one move are often the grandchildren of the last, and every start position is played
+twice with the colours swapped. The board keeps its Zobrist hash up to date in make_move and undo_move,
+so looking a position up costs one dictionary probe.
+
+Entries are kept in least-recently-used order; once the cache holds `capacity` positions, storing a
+new one evicts the position that was used longest ago. The hash covers the pieces, side to move,
+castling rights and en passant file, which is everything the network sees.
+
+save and load keep the scores between games and runs, like TranspositionTable.save and load. The file
+holds a header, then the keys as unsigned 64-bit words and the scores as doubles, little-endian, from
+least to most recently used.
+"""
+import os
+import struct
+import sys
+from array import array
+from collections import OrderedDict
+
+
+DEFAULT_CAPACITY = 200_000
+# Approximate bytes per entry: the dictionary's slot and link overhead, a 64-bit int key and a float
+_ENTRY_BYTES = 104 + sys.getsizeof(1 << 63) + sys.getsizeof(0.0)
+
+CACHE_MAGIC = b"EVAL"
+CACHE_VERSION = 1
+_CACHE_HEADER = struct.Struct("<4sII")  # magic, version, number of entries
+
+
+class EvaluationCache:
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        """
+        Args:
+            capacity: Most positions to keep before evicting the least recently used
+        """
+        if capacity < 1:
+            print(f"ERROR: evaluation cache capacity {capacity} is not positive, using 1")
+            capacity = 1
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.probes = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: int) -> float | None:
+        """
+        Look a position up and mark it as recently used.
+        Args:
+            key: Zobrist hash of the position
+        Returns:
+            float: The cached score, or None if the position is not cached
+        """
+        self.probes += 1
+        score = self.entries.get(key)
+        if score is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return score
+
+    def put(self, key: int, score: float):
+        """
+        Store a score, evicting the least recently used position if the cache is full.
+        Args:
+            key: Zobrist hash of the position
+            score: The position's evaluation
+        """
+        entries = self.entries
+        if key in entries:
+            entries.move_to_end(key)
+        elif len(entries) >= self.capacity:
+            entries.popitem(last=False)
+            self.evictions += 1
+        entries[key] = score
+
+    def clear(self):
+        """Empty the cache and reset the statistics."""
+        self.entries.clear()
+        self.reset_stats()
+
+    def save(self, path: str) -> int:
+        """
+        Write the cached scores to a file.
+        Args:
+            path: File to write
+        Returns:
+            int: Number of entries written
+        """
+        keys = array('Q', self.entries.keys())
+        scores = array('d', self.entries.values())
+        if sys.byteorder != "little":
+            keys.byteswap()
+            scores.byteswap()
+        with open(path, "wb") as f:
+            f.write(_CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, len(keys)))
+            keys.tofile(f)
+            scores.tofile(f)
+        return len(keys)
+
+    def load(self, path: str) -> int:
+        """
+        Add the scores of a file written by save, keeping their order of use. If the file holds more than
+        the capacity, only the most recently used entries stay.
+        Args:
+            path: File to read; a missing file loads nothing
+        Returns:
+            int: Number of entries loaded
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            header = f.read(_CACHE_HEADER.size)
+            if len(header) < _CACHE_HEADER.size:
+                print(f"ERROR: {path} is too short to be an evaluation cache file")
+                return 0
+            magic, version, count = _CACHE_HEADER.unpack(header)
+            if magic != CACHE_MAGIC or version != CACHE_VERSION:
+                print(f"ERROR: {path} is not a version {CACHE_VERSION} evaluation cache file")
+                return 0
+            data = f.read(count * 16)
+        if len(data) != count * 16:
+            print(f"ERROR: {path} is truncated, expected {count} entries")
+            return 0
+        keys = array('Q', data[:count * 8])
+        scores = array('d', data[count * 8:])
+        if sys.byteorder != "little":
+            keys.byteswap()
+            scores.byteswap()
+
+        for key, score in zip(keys, scores):
+            self.put(key, score)
+        return count
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the cached entries."""
+        return len(self.entries) * _ENTRY_BYTES
+
+    def stats(self) -> dict:
+        """
+        Usage statistics since the last reset.
+        Returns:
+            dict: entries, capacity, probes, hits, hit_rate, evictions and memory_mb
+        """
+        return {
+            "entries": len(self.entries),
+            "capacity": self.capacity,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "evictions": self.evictions,
+            "memory_mb": self.memory_bytes() / (1024 * 1024),
+        }
@@ -0,0 +1,302 @@
+"""
+Inference server: one process holds the network and scores positions for many games at once.
+
+Game workers send encoded positions (the features of encoder.BoardEncoder) over a shared request
+queue and wait for the scores on their own response queue. The server takes the first waiting
+request and keeps collecting more until it has max_batch positions or the first request has waited
+max_wait_ms, then runs them all in one forward pass. Concurrent games therefore share one copy of
+the model and fill each other's batches, and no request waits much longer than the latency cap.
+
+InferenceClient has the evaluate_positions and evaluate_moves methods of BatchEvaluator, so a player
+can use either. Clients are created by the server before its process starts and can be passed to
+worker processes.
+
+When it stops, the server reports a histogram of batch sizes (in positions), queue latency (from a
+client sending a request to its batch starting) and throughput. Measure it with simulated games:
+
+    python inference_server.py --games 8 --moves 20 --max-wait-ms 2
+"""
+import argparse
+import multiprocessing
+import queue
+import time
+import weakref
+from collections import Counter
+import numpy as np
+import torch
+from main import Board, Move
+from encoder import BoardEncoder
+from nn_evaluation import BatchEvaluator, reference_model
+
+
+DEFAULT_MAX_WAIT_MS = 2.0
+STOP_TIMEOUT = 10.0  # Seconds to wait for the server's report when stopping it
+
+# The server runs in a spawned process, since forking a process that has already run torch can hang
+_context = multiprocessing.get_context("spawn")
+
+
+def _load_model(model_path: str | None, seed: int) -> torch.nn.Module:
+    if model_path:
+        return torch.load(model_path, map_location="cpu")
+    torch.manual_seed(seed)
+    return reference_model()
+
+
+def _serve(model_path: str | None, seed: int, max_batch: int, max_wait: float, threads: int | None,
+           requests, responses: list, reports):
+    """Server process: batch requests until the stop sentinel (None) arrives, then send the report."""
+    if threads:
+        torch.set_num_threads(threads)
+    evaluator = BatchEvaluator(_load_model(model_path, seed), max_batch=max_batch)
+    batch_sizes = Counter()
+    latencies = []
+    first_request_time = last_result_time = None
+
+    stopping = False
+    while not stopping:
+        request = requests.get()
+        if request is None:
+            break
+        batch = [request]
+        positions = len(request[3])
+        deadline = request[2] + max_wait
+        while positions < max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                request = requests.get(timeout=timeout) if timeout > 0 else requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                stopping = True
+                break
+            batch.append(request)
+            positions += len(request[3])
+
+        start_time = time.monotonic()
+        if first_request_time is None:
+            first_request_time = min(submitted for _, _, submitted, _ in batch)
+        features = batch[0][3] if len(batch) == 1 else np.concatenate([features for *_, features in batch])
+        scores = evaluator.evaluate_features(features).numpy()
+        offset = 0
+        for client_id, request_id, submitted, features in batch:
+            responses[client_id].put((request_id, scores[offset:offset + len(features)]))
+            offset += len(features)
+            latencies.append(start_time - submitted)
+        batch_sizes[positions] += 1
+        last_result_time = time.monotonic()
+
+    elapsed = last_result_time - first_request_time if first_request_time is not None else 0.0
+    reports.put(_report(batch_sizes, latencies, elapsed))
+
+
+def _report(batch_sizes: Counter, latencies: list[float], elapsed: float) -> dict:
+    positions = sum(size * count for size, count in batch_sizes.items())
+    batches = sum(batch_sizes.values())
+    latencies_ms = np.array(latencies or [0.0]) * 1000
+    return {
+        "requests": len(latencies),
+        "positions": positions,
+        "batches": batches,
+        "batch_sizes": dict(sorted(batch_sizes.items())),
+        "mean_batch_size": positions / batches if batches else 0.0,
+        "latency_mean_ms": float(latencies_ms.mean()),
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+        "latency_max_ms": float(latencies_ms.max()),
+        "positions_per_second": positions / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def _shutdown(process, requests):
+    if process is not None and process.is_alive():
+        requests.put(None)
+        process.join(STOP_TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+
+
+class InferenceClient:
+    def __init__(self, client_id: int, requests, responses, max_batch: int = 256):
+        """
+        A game worker's connection to the server; create clients with InferenceServer.client.
+        Args:
+            client_id: Index of the client's response queue
+            requests: The server's request queue
+            responses: The client's response queue
+            max_batch: Positions the encoder buffers are allocated for (they grow if needed)
+        """
+        self.client_id = client_id
+        self.requests = requests
+        self.responses = responses
+        self.max_batch = max_batch
+        self.request_id = 0
+        self.encoder = None  # Created on first use, so a client sent to a worker process carries no buffers
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        state["encoder"] = None
+        return state
+
+    def _evaluate(self, features: np.ndarray) -> torch.Tensor:
+        if len(features) == 0:
+            return torch.zeros(0)
+        self.request_id += 1
+        # The queue pickles the features in a background thread; the reply can only come after that,
+        # so the encoder buffer is not reused before it has been sent
+        self.requests.put((self.client_id, self.request_id, time.monotonic(), features))
+        request_id, scores = self.responses.get()
+        if request_id != self.request_id:
+            print(f"ERROR: client {self.client_id} got the reply to request {request_id}, expected {self.request_id}")
+        return torch.from_numpy(scores)
+
+    def evaluate_positions(self, boards: list[Board]) -> torch.Tensor:
+        """
+        Score a list of boards on the server.
+        Args:
+            boards: The positions
+        Returns:
+            torch.Tensor: 1-D tensor of scores, one per position
+        """
+        if self.encoder is None:
+            self.encoder = BoardEncoder(self.max_batch)
+        return self._evaluate(self.encoder.encode_boards(boards))
+
+    def evaluate_moves(self, board: Board, moves: list[Move]) -> torch.Tensor:
+        """
+        Score the position after each move on the server.
+        Args:
+            board: The current position; it is left as it was found
+            moves: Legal moves in that position
+        Returns:
+            torch.Tensor: 1-D tensor with the score of each child position, in the order of moves
+        """
+        if self.encoder is None:
+            self.encoder = BoardEncoder(self.max_batch)
+        encoder = self.encoder
+        encoder.clear()
+        encoder.reserve(len(moves))
+        for move in moves:
+            board.make_move(move)
+            encoder.add(board)
+            board.undo_move()
+        return self._evaluate(encoder.encode())
+
+
+class InferenceServer:
+    def __init__(self, clients: int, model_path: str = None, seed: int = 0, max_batch: int = 256,
+                 max_wait_ms: float = DEFAULT_MAX_WAIT_MS, threads: int = None):
+        """
+        Args:
+            clients: Number of clients (one per concurrent game)
+            model_path: Saved torch model to serve (default: reference_model seeded with `seed`)
+            seed: Seed of the stand-in model
+            max_batch: Positions at which a batch is run without waiting further
+            max_wait_ms: Longest a request waits for other requests to join its batch
+            threads: Torch CPU threads in the server process
+        """
+        self.requests = _context.Queue()
+        self.responses = [_context.Queue() for _ in range(clients)]
+        self.reports = _context.Queue()
+        self.max_batch = max_batch
+        self.process = _context.Process(target=_serve, daemon=True,
+                                        args=(model_path, seed, max_batch, max_wait_ms / 1000, threads,
+                                              self.requests, self.responses, self.reports))
+        self._finalizer = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self._finalizer is None:
+            self.process.start()
+            self._finalizer = weakref.finalize(self, _shutdown, self.process, self.requests)
+
+    def client(self, client_id: int) -> InferenceClient:
+        """The client using response queue `client_id`; give each concurrent game its own."""
+        return InferenceClient(client_id, self.requests, self.responses[client_id], self.max_batch)
+
+    def stop(self) -> dict | None:
+        """
+        Stop the server once the requests already sent are answered.
+        Returns:
+            dict: requests, positions, batches, batch_sizes ({positions in batch: number of batches}),
+                  mean_batch_size, latency_mean_ms, latency_p50_ms, latency_p95_ms, latency_max_ms and
+                  positions_per_second (from the first request to the last reply), or None if the
+                  server was not running
+        """
+        if self._finalizer is None or not self.process.is_alive():
+            return None
+        self.requests.put(None)
+        try:
+            report = self.reports.get(timeout=STOP_TIMEOUT)
+        except queue.Empty:
+            print("ERROR: inference server did not report in time")
+            report = None
+        self._finalizer()
+        return report
+
+
+def _play(client: InferenceClient, fen: str, moves: int):
+    """Game worker: play up to `moves` plies, choosing moves the way PlayerOne does."""
+    board = Board(fen)
+    for _ in range(moves):
+        legal_moves = board.get_all_legal_moves()
+        if not legal_moves:
+            break
+        evals = client.evaluate_moves(board, legal_moves)
+        board.make_move(legal_moves[int(evals.argmin()) if board.is_white_turn else int(evals.argmax())])
+
+
+def batch_size_buckets(batch_sizes: dict) -> dict:
+    """Group a batch size histogram into power-of-two ranges, {(low, high): batches}."""
+    buckets = Counter()
+    for size, count in batch_sizes.items():
+        low = 1 << (size.bit_length() - 1)
+        buckets[(low, 2 * low - 1)] += count
+    return dict(sorted(buckets.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the inference server with concurrent simulated games.")
+    parser.add_argument("--games", type=int, default=8, help="concurrent game worker processes (default 8)")
+    parser.add_argument("--moves", type=int, default=20, help="plies played by each game (default 20)")
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    parser.add_argument("--model", help="saved torch model to serve instead of the stand-in network")
+    parser.add_argument("--threads", type=int, help="torch CPU threads in the server")
+    args = parser.parse_args()
+
+    with open("start_positions.txt") as f:
+        fens = [line.strip() for line in f if line.strip()]
+    server = InferenceServer(args.games, args.model, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms,
+                             threads=args.threads)
+    server.start()
+    # Queues can only be handed to processes when they are created, so each game gets its own Process
+    games = [_context.Process(target=_play, args=(server.client(game), fens[game % len(fens)], args.moves))
+             for game in range(args.games)]
+    for game in games:
+        game.start()
+    for game in games:
+        game.join()
+    report = server.stop()
+    if report is None:
+        return
+
+    print(f"{args.games} games, {report['positions']} positions in {report['requests']} requests "
+          f"and {report['batches']} batches")
+    print(f"{'batch size':>10}  {'batches':>7}")
+    for (low, high), count in batch_size_buckets(report["batch_sizes"]).items():
+        print(f"{f'{low}-{high}' if high > low else low:>10}  {count:>7}")
+    print(f"mean batch {report['mean_batch_size']:.1f}  queue latency mean {report['latency_mean_ms']:.2f} ms  "
+          f"p50 {report['latency_p50_ms']:.2f} ms  p95 {report['latency_p95_ms']:.2f} ms  "
+          f"max {report['latency_max_ms']:.2f} ms  throughput {report['positions_per_second']:,.0f} positions/sec")
+
+
+if __name__ == "__main__":
+    main()
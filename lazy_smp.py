@@ -0,0 +1,191 @@
+"""
+Lazy SMP: helper processes search the same root position as the main search, starting at staggered
+depths, and all of them share one transposition table in shared memory. The helpers mostly fill the
+table with results the main search can reuse; when one of them finishes a deeper iteration than the
+main search, its move is played instead.
+
+Writes to the shared table are not locked. Each entry stores its key XOR-ed with its data, so an entry
+torn by two processes writing at once fails verification and reads as a miss.
+
+Measure time-to-depth as workers are added:
+
+    python lazy_smp.py --depth 5 --workers 1 2 4
+"""
+import argparse
+import os
+import time
+import weakref
+from multiprocessing import Pool, shared_memory
+import main
+from main import Board, Move
+from bitboard import BitboardBoard
+from timer import Timer
+from alpha_beta_player import AlphaBetaPlayer, MATE_SCORE, MAX_DEPTH
+from transposition_table import TranspositionTable, DEFAULT_SIZE_MB
+
+
+# The shared block starts with a small control area; the transposition table follows it
+CONTROL_BYTES = 64
+STOP_FLAG = 0  # Byte set by the main search to stop the helpers
+
+# State of a helper process, created by _init_helper
+_helper = None
+
+
+class _HelperSearch(AlphaBetaPlayer):
+    """Search run inside a helper process; it searches until the main search raises the stop flag."""
+
+    def __init__(self, memory: shared_memory.SharedMemory, max_depth: int):
+        super().__init__(max_depth, hash_size_mb=0, book_path="")
+        self.control = memory.buf
+        self.transposition_table = TranspositionTable(buffer=memory.buf[CONTROL_BYTES:])
+
+    def out_of_time(self) -> bool:
+        return self.control[STOP_FLAG] != 0 or super().out_of_time()
+
+    def keep_deepening(self, score: int, elapsed: float, seconds: float) -> bool:
+        return abs(score) < MATE_SCORE - MAX_DEPTH
+
+
+def _init_helper(memory: shared_memory.SharedMemory, max_depth: int, zobrist_side: int):
+    global _helper
+    if main.ZOBRIST_SIDE != zobrist_side:
+        print("ERROR: helper process has different Zobrist keys, the shared transposition table will not be shared")
+    _helper = _HelperSearch(memory, max_depth)
+
+
+def _helper_search(board_class: type, fen: str, repetition_counts: dict, seconds: float,
+                   start_depth: int, age: int) -> tuple[list, int]:
+    board = board_class(fen)
+    board.repetition_counts = dict(repetition_counts)
+    _helper.transposition_table.age = age
+    _helper.search(board, seconds, start_depth, verbose=False)
+    return _helper.iterations, _helper.nodes
+
+
+def _release(pool, memory: shared_memory.SharedMemory, table: TranspositionTable):
+    if pool is not None:
+        pool.terminate()
+        pool.join()
+    # The table's view into the block must go before the block can be closed
+    table.table.release()
+    memory.close()
+    memory.unlink()
+
+
+class LazySMPPlayer(AlphaBetaPlayer):
+    def __init__(self, workers: int = None, max_depth: int = MAX_DEPTH, hash_size_mb: float = DEFAULT_SIZE_MB,
+                 book_path: str = None):
+        """
+        Args:
+            workers: Number of searching processes including this one (default: one per core)
+            max_depth: Deepest iteration to search
+            hash_size_mb: Size of the shared transposition table in megabytes
+            book_path: Polyglot opening book to play from (default: DEFAULT_BOOK_PATH if it exists, "" for none)
+        """
+        super().__init__(max_depth, hash_size_mb=0, book_path=book_path)
+        self.name = "Lazy SMP Player"
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.memory = shared_memory.SharedMemory(create=True, size=CONTROL_BYTES + int(hash_size_mb * 1024 * 1024))
+        self.control = self.memory.buf
+        self.transposition_table = TranspositionTable(buffer=self.memory.buf[CONTROL_BYTES:])
+        self.pool = None
+        if self.workers > 1:
+            self.pool = Pool(self.workers - 1, initializer=_init_helper,
+                             initargs=(self.memory, max_depth, main.ZOBRIST_SIDE))
+        self._finalizer = weakref.finalize(self, _release, self.pool, self.memory, self.transposition_table)
+
+    def close(self):
+        """Stop the helper processes and free the shared table."""
+        self._finalizer()
+
+    def think(self, board: Board, timer: Timer) -> Move:
+        """
+        Search with the helpers until the time budget runs out.
+
+        Args:
+            board: The current board state
+            timer: The game timer
+
+        Returns:
+            Move: The book move, or else the best move of the deepest iteration completed by any process
+        """
+        book_move = self.book_move(board)
+        if book_move is not None:
+            return book_move
+
+        seconds = self.time_budget_ms(timer) / 1000
+        self.transposition_table.new_search()
+        self.transposition_table.reset_stats()
+        self.control[STOP_FLAG] = 0
+
+        pending = []
+        if self.pool is not None:
+            fen = board.get_fen()
+            repetition_counts = dict(board.repetition_counts)
+            for index in range(1, self.workers):
+                # Odd helpers skip a depth so the processes spread over neighbouring iterations
+                start_depth = 1 + index % 2
+                pending.append(self.pool.apply_async(
+                    _helper_search,
+                    (type(board), fen, repetition_counts, seconds, start_depth, self.transposition_table.age)))
+
+        start_time = time.perf_counter()
+        best_move = self.search(board, seconds)
+        self.control[STOP_FLAG] = 1
+
+        # Deepest completed iteration wins; on equal depth the main search is preferred
+        best_depth = self.iterations[-1][0] if self.iterations else 0
+        best_worker = 0
+        total_nodes = self.nodes
+        for worker, result in enumerate(pending, 1):
+            iterations, nodes = result.get()
+            total_nodes += nodes
+            if iterations and iterations[-1][0] > best_depth:
+                best_depth, best_move, best_worker = iterations[-1][0], iterations[-1][4], worker
+
+        elapsed = time.perf_counter() - start_time
+        stats = self.transposition_table.stats()
+        print(f"workers {self.workers}  depth {best_depth} (worker {best_worker})  nodes {total_nodes}  "
+              f"nps {total_nodes / elapsed if elapsed > 0 else 0:.0f}  tt hit rate {stats['hit_rate']:.1%}  "
+              f"fill {stats['fill']:.1%}")
+        return best_move
+
+
+def time_to_depth(fen: str, depth: int, workers: int, hash_size_mb: float = DEFAULT_SIZE_MB,
+                  board_class: type = Board) -> float:
+    """
+    Seconds until the main search completes `depth` with the given number of workers.
+    The helper processes are started before the clock starts.
+    """
+    player = LazySMPPlayer(workers, max_depth=depth, hash_size_mb=hash_size_mb)
+    try:
+        player.think(board_class(fen), Timer(10 ** 12, 0))
+        completed = [iteration for iteration in player.iterations if iteration[0] == depth]
+        if not completed:
+            print(f"ERROR: search stopped before depth {depth}")
+            return float("inf")
+        return completed[0][5]
+    finally:
+        player.close()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Measure Lazy SMP time-to-depth for several worker counts.")
+    parser.add_argument("--fen", default="r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--hash", type=float, default=DEFAULT_SIZE_MB, help="shared table size in megabytes")
+    parser.add_argument("--bitboards", action="store_true", help="use BitboardBoard instead of Board")
+    args = parser.parse_args()
+
+    board_class = BitboardBoard if args.bitboards else Board
+    print(f"{os.cpu_count()} cores")
+    results = [(workers, time_to_depth(args.fen, args.depth, workers, args.hash, board_class)) for workers in args.workers]
+    print(f"\n{'workers':>7}  {'seconds':>8}  {'speedup':>7}")
+    for workers, seconds in results:
+        print(f"{workers:>7}  {seconds:>8.2f}  {results[0][1] / seconds:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main_cli()
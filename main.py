@@ -1,4 +1,11 @@
-import random
+from typing import Iterator
+
+from tables import (WHITE, BLACK, KNIGHT_TARGETS, KING_TARGETS, PAWN_ATTACK_TARGETS, RAY_TARGETS,
+                    ROOK_DIRECTIONS, BISHOP_DIRECTIONS, CASTLING_KING_SQUARES, CASTLING_EMPTY_SQUARES,
+                    CASTLING_SAFE_SQUARES)
+from evaluation import PIECE_SQUARE_SCORES, PIECE_PHASES, tapered_score
+from polyglot_keys import (POLYGLOT_RANDOM_ARRAY, POLYGLOT_CASTLING_OFFSET, POLYGLOT_EN_PASSANT_OFFSET,
+                           POLYGLOT_TURN_OFFSET)
 
 
 class piece_helper:
@@ -18,13 +25,35 @@ class piece_helper:
     black_king = -6
 
 
-# Initialize Zobrist hashing values (at module level)
-ZOBRIST_PIECE_SQUARE = {}  # (piece, square) -> random 64-bit number
-ZOBRIST_CASTLING = {}      # (castle_right) -> random 64-bit number
-ZOBRIST_EN_PASSANT = {}    # (file) -> random 64-bit number
-ZOBRIST_SIDE = random.getrandbits(64)  # For side to move
+# Piece values used by static exchange evaluation, indexed by abs(piece). The king is worth more than
+# everything else together, so an exchange never ends with it being captured.
+SEE_PIECE_VALUES = [0, 100, 320, 330, 500, 900, 20000]
+
+
+# Castling rights are stored as a 4-bit mask
+CASTLE_WHITE_KINGSIDE = 1
+CASTLE_WHITE_QUEENSIDE = 2
+CASTLE_BLACK_KINGSIDE = 4
+CASTLE_BLACK_QUEENSIDE = 8
+
+# Rights that survive a move touching each square: moving from or capturing on
+# a king or rook home square clears the matching rights.
+CASTLING_RIGHTS_MASK = [15] * 64
+CASTLING_RIGHTS_MASK[0] = 15 & ~CASTLE_BLACK_QUEENSIDE   # a8
+CASTLING_RIGHTS_MASK[4] = 15 & ~(CASTLE_BLACK_KINGSIDE | CASTLE_BLACK_QUEENSIDE)  # e8
+CASTLING_RIGHTS_MASK[7] = 15 & ~CASTLE_BLACK_KINGSIDE    # h8
+CASTLING_RIGHTS_MASK[56] = 15 & ~CASTLE_WHITE_QUEENSIDE  # a1
+CASTLING_RIGHTS_MASK[60] = 15 & ~(CASTLE_WHITE_KINGSIDE | CASTLE_WHITE_QUEENSIDE)  # e1
+CASTLING_RIGHTS_MASK[63] = 15 & ~CASTLE_WHITE_KINGSIDE   # h1
 
-# Initialize random numbers for Zobrist hashing
+# Zobrist hashing values, taken from the Polyglot key set so hashes are the same in every process and run
+# and match Polyglot opening books (apart from the en passant rule, see opening_book.polyglot_key)
+ZOBRIST_PIECE_SQUARE = [0] * (13 * 64)  # (piece + 6) * 64 + square -> 64-bit key (0 for empty squares)
+ZOBRIST_CASTLING = [0] * 16             # castling rights mask -> XOR of the keys of each right it holds
+ZOBRIST_EN_PASSANT = [0] * 8            # file -> 64-bit key
+ZOBRIST_SIDE = POLYGLOT_RANDOM_ARRAY[POLYGLOT_TURN_OFFSET]  # Hashed in when white is to move
+
+# Fill the Zobrist tables from the Polyglot keys
 def _init_zobrist():
     # For each piece on each square
     pieces = [
@@ -34,33 +63,108 @@ def _init_zobrist():
         piece_helper.black_rook, piece_helper.black_queen, piece_helper.black_king
     ]
     for piece in pieces:
+        # Polyglot orders the pieces black pawn, white pawn, black knight, ... and numbers squares from a1
+        kind = 2 * (abs(piece) - 1) + (piece > 0)
         for square in range(64):
-            ZOBRIST_PIECE_SQUARE[(piece, square)] = random.getrandbits(64)
+            ZOBRIST_PIECE_SQUARE[(piece + 6) * 64 + square] = POLYGLOT_RANDOM_ARRAY[64 * kind + (square ^ 56)]
 
-    # For castling rights
-    for right in ['K', 'Q', 'k', 'q']:
-        ZOBRIST_CASTLING[right] = random.getrandbits(64)
+    # For castling rights, combined so a whole mask is hashed with one lookup.
+    # The rights bits are in Polyglot's order: white kingside, white queenside, black kingside, black queenside
+    right_keys = POLYGLOT_RANDOM_ARRAY[POLYGLOT_CASTLING_OFFSET:POLYGLOT_CASTLING_OFFSET + 4]
+    for rights in range(16):
+        for bit in range(4):
+            if rights & (1 << bit):
+                ZOBRIST_CASTLING[rights] ^= right_keys[bit]
 
     # For en passant files
     for file in range(8):
-        ZOBRIST_EN_PASSANT[file] = random.getrandbits(64)
+        ZOBRIST_EN_PASSANT[file] = POLYGLOT_RANDOM_ARRAY[POLYGLOT_EN_PASSANT_OFFSET + file]
 
 
 # Initialize Zobrist values when module is loaded
 _init_zobrist()
 
-class Move:
-    def __init__(self, start_row: int, start_col: int, end_row: int, end_col: int, 
-                 is_en_passant: bool = False, is_kingside_castle: bool = False, 
-                 is_queenside_castle: bool = False, promotion_piece: int = None):
-        self.start_row = start_row
-        self.start_col = start_col
-        self.end_row = end_row
-        self.end_col = end_col
-        self.is_en_passant = is_en_passant
-        self.is_kingside_castle = is_kingside_castle
-        self.is_queenside_castle = is_queenside_castle
-        self.promotion_piece = promotion_piece  # The piece type to promote to
+
+def _castling_property(right: int) -> property:
+    """Expose one bit of Board.castling_rights as a boolean attribute."""
+    def getter(self) -> bool:
+        return bool(self.castling_rights & right)
+
+    def setter(self, value: bool):
+        if value:
+            self.castling_rights |= right
+        else:
+            self.castling_rights &= ~right
+
+    return property(getter, setter)
+
+# Move encoding: bits 0-5 start square, bits 6-11 end square (row * 8 + col), bits 12-15 flag
+MOVE_FLAG_EN_PASSANT = 1
+MOVE_FLAG_KINGSIDE_CASTLE = 2
+MOVE_FLAG_QUEENSIDE_CASTLE = 3
+MOVE_FLAG_PROMOTION = 4  # Flags 4-7 promote to knight, bishop, rook, queen: flag = MOVE_FLAG_PROMOTION - 2 + abs(piece)
+
+
+class Move(int):
+    """
+    A move packed into a 16-bit int. Generators build moves straight from the packed value;
+    the attributes of the original class are kept as read-only properties for player code.
+    Being an int, a move compares, hashes and stores like one.
+    """
+    __slots__ = ()
+
+    def __new__(cls, start_row: int, start_col: int, end_row: int, end_col: int, 
+                is_en_passant: bool = False, is_kingside_castle: bool = False, 
+                is_queenside_castle: bool = False, promotion_piece: int = None):
+        if not (0 <= start_row < 8 and 0 <= start_col < 8 and 0 <= end_row < 8 and 0 <= end_col < 8):
+            raise ValueError(f"Move coordinates out of range: from ({start_row}, {start_col}) to ({end_row}, {end_col})")
+        flag = 0
+        if is_en_passant:
+            flag = MOVE_FLAG_EN_PASSANT
+        elif is_kingside_castle:
+            flag = MOVE_FLAG_KINGSIDE_CASTLE
+        elif is_queenside_castle:
+            flag = MOVE_FLAG_QUEENSIDE_CASTLE
+        elif promotion_piece is not None:
+            flag = MOVE_FLAG_PROMOTION - 2 + abs(promotion_piece)
+        return int.__new__(cls, (start_row * 8 + start_col) | (end_row * 8 + end_col) << 6 | flag << 12)
+
+    @property
+    def start_row(self) -> int:
+        return (self & 63) >> 3
+
+    @property
+    def start_col(self) -> int:
+        return self & 7
+
+    @property
+    def end_row(self) -> int:
+        return (self >> 9) & 7
+
+    @property
+    def end_col(self) -> int:
+        return (self >> 6) & 7
+
+    @property
+    def is_en_passant(self) -> bool:
+        return self >> 12 == MOVE_FLAG_EN_PASSANT
+
+    @property
+    def is_kingside_castle(self) -> bool:
+        return self >> 12 == MOVE_FLAG_KINGSIDE_CASTLE
+
+    @property
+    def is_queenside_castle(self) -> bool:
+        return self >> 12 == MOVE_FLAG_QUEENSIDE_CASTLE
+
+    @property
+    def promotion_piece(self) -> int:
+        """The piece to promote to (signed by the color promoting onto row 0 or 7), or None."""
+        flag = self >> 12
+        if flag < MOVE_FLAG_PROMOTION:
+            return None
+        piece = flag - MOVE_FLAG_PROMOTION + 2
+        return piece if (self >> 9) & 7 == 0 else -piece
 
     def get_printable(self) -> str:
         """
@@ -82,8 +186,51 @@ class Move:
             
         return f"{start_square}-{end_square}"
 
+    def __repr__(self) -> str:
+        return f"Move({self.get_printable()})"
+
+    def __reduce__(self):
+        # Pickle as the packed value; Move.__new__ takes coordinates, not an int
+        return _new_move, (Move, int(self))
+
+
+# Build a Move from its packed value without going through Move.__new__
+_new_move = int.__new__
+
+# Promotion flags in the order moves are generated: queen, rook, bishop, knight
+PROMOTION_FLAGS = [MOVE_FLAG_PROMOTION + 3, MOVE_FLAG_PROMOTION + 2, MOVE_FLAG_PROMOTION + 1, MOVE_FLAG_PROMOTION]
+
+
+class UndoRecord:
+    """The state make_move overwrites, so undo_move can reverse a move without a board snapshot."""
+    __slots__ = ('move', 'moved_piece', 'captured_piece', 'castling_rights',
+                 'en_passant_target', 'halfmove_clock', 'zobrist_hash', 'eval_score', 'eval_phase')
+
+    def __init__(self, move: Move, moved_piece: int, captured_piece: int, castling_rights: int,
+                 en_passant_target: tuple[int, int], halfmove_clock: int, zobrist_hash: int,
+                 eval_score: int, eval_phase: int):
+        self.move = move
+        self.moved_piece = moved_piece
+        self.captured_piece = captured_piece  # The en passant pawn for en passant captures
+        self.castling_rights = castling_rights
+        self.en_passant_target = en_passant_target
+        self.halfmove_clock = halfmove_clock
+        self.zobrist_hash = zobrist_hash
+        self.eval_score = eval_score
+        self.eval_phase = eval_phase
+
 
 class Board:
+    # When True, make_move and undo_move check the running Zobrist hash against a full recomputation
+    debug_zobrist = False
+    # When True, make_move and undo_move check the running evaluation sums against a full recomputation
+    debug_evaluation = False
+
+    white_kingside_castle = _castling_property(CASTLE_WHITE_KINGSIDE)
+    white_queenside_castle = _castling_property(CASTLE_WHITE_QUEENSIDE)
+    black_kingside_castle = _castling_property(CASTLE_BLACK_KINGSIDE)
+    black_queenside_castle = _castling_property(CASTLE_BLACK_QUEENSIDE)
+
     def __init__(self, fen: str ="rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"):
         """
        Set the board position from FEN notation.
@@ -97,7 +244,7 @@ class Board:
         self.board = [[piece_helper.empty for _ in range(8)] for _ in range(8)]
 
         # History
-        self.position_history = []  # List of comprehensive board states
+        self.position_history = []  # UndoRecord for every move made, oldest first
         
         # Split FEN into its components
         parts = fen.split()
@@ -147,6 +294,7 @@ class Board:
         self.is_white_turn = turn == 'w'
 
         # Parse castling rights
+        self.castling_rights = 0
         self.white_kingside_castle = 'K' in castling
         self.white_queenside_castle = 'Q' in castling
         self.black_kingside_castle = 'k' in castling
@@ -163,31 +311,54 @@ class Board:
         # Parse halfmove clock
         self.halfmove_clock = int(halfmove)
 
+        # Piece lists, updated by make_move and undo_move so nothing has to scan all 64 squares
+        self.piece_squares = {True: set(), False: set()}  # is_white -> squares (row * 8 + col) of that side's pieces
+        self.king_squares = {True: None, False: None}     # is_white -> (row, col) of that side's king
+        for row in range(8):
+            for col in range(8):
+                piece = self.board[row][col]
+                if piece != piece_helper.empty:
+                    self.piece_squares[piece > 0].add(row * 8 + col)
+                    if abs(piece) == piece_helper.white_king:
+                        self.king_squares[piece > 0] = (row, col)
+
+        # Running Zobrist hash, updated by make_move and restored by undo_move
+        self.zobrist_hash = self.compute_zobrist_hash()
+
+        # Running evaluation sums (see evaluation.py), updated by make_move and restored by undo_move
+        self.eval_score, self.eval_phase = self.compute_evaluation()
+
+        # Optional incrementally updated network accumulator (nnue.Accumulator), pushed by make_move and popped by undo_move
+        self.accumulator = None
+
+        # How often each position has occurred since the last pawn move or capture, keyed by Zobrist hash.
+        # The counts from before each such move wait in repetition_stack until undo_move restores them.
+        self.repetition_counts = {self.zobrist_hash: 1}
+        self.repetition_stack = []
+
     def get_zobrist_hash(self) -> int:
         """
-        Calculate and return the Zobrist hash for the current position.
+        Return the Zobrist hash for the current position.
+        Returns:
+            int: 64-bit Zobrist hash value
+        """
+        return self.zobrist_hash
+
+    def compute_zobrist_hash(self) -> int:
+        """
+        Calculate the Zobrist hash for the current position from scratch.
         Returns:
             int: 64-bit Zobrist hash value
         """
         h = 0
 
         # Hash pieces
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece != piece_helper.empty:
-                    square = row * 8 + col
-                    h ^= ZOBRIST_PIECE_SQUARE[(piece, square)]
+        for square in self.piece_squares[True] | self.piece_squares[False]:
+            piece = self.board[square >> 3][square & 7]
+            h ^= ZOBRIST_PIECE_SQUARE[(piece + 6) * 64 + square]
 
         # Hash castling rights
-        if self.white_kingside_castle:
-            h ^= ZOBRIST_CASTLING['K']
-        if self.white_queenside_castle:
-            h ^= ZOBRIST_CASTLING['Q']
-        if self.black_kingside_castle:
-            h ^= ZOBRIST_CASTLING['k']
-        if self.black_queenside_castle:
-            h ^= ZOBRIST_CASTLING['q']
+        h ^= ZOBRIST_CASTLING[self.castling_rights]
 
         # Hash en passant
         if self.en_passant_target is not None:
@@ -200,6 +371,53 @@ class Board:
 
         return h
 
+    def check_zobrist_hash(self) -> bool:
+        """
+        Compare the running Zobrist hash with a full recomputation.
+        Returns:
+            bool: True if they match, False otherwise
+        """
+        expected = self.compute_zobrist_hash()
+        if self.zobrist_hash != expected:
+            print(f"ERROR: Running Zobrist hash {self.zobrist_hash:016x} does not match recomputed {expected:016x} in {self.get_fen()}")
+            return False
+        return True
+
+    def compute_evaluation(self) -> tuple[int, int]:
+        """
+        Calculate the evaluation sums for the current position from scratch.
+        Returns:
+            tuple: (packed middlegame and endgame score, positive for white; game phase)
+        """
+        score = 0
+        phase = 0
+        for square in self.piece_squares[True] | self.piece_squares[False]:
+            piece = self.board[square >> 3][square & 7]
+            score += PIECE_SQUARE_SCORES[(piece + 6) * 64 + square]
+            phase += PIECE_PHASES[piece + 6]
+        return score, phase
+
+    def check_evaluation(self) -> bool:
+        """
+        Compare the running evaluation sums with a full recomputation.
+        Returns:
+            bool: True if they match, False otherwise
+        """
+        expected = self.compute_evaluation()
+        if (self.eval_score, self.eval_phase) != expected:
+            print(f"ERROR: Running evaluation {(self.eval_score, self.eval_phase)} does not match recomputed {expected} in {self.get_fen()}")
+            return False
+        return True
+
+    def evaluate(self) -> int:
+        """
+        Static evaluation from the running sums, without looking at the squares.
+        Returns:
+            int: Tapered material and piece-square score in centipawns from the side to move's point of view
+        """
+        # Negate before tapering so the rounding is the same for both sides
+        return tapered_score(self.eval_score if self.is_white_turn else -self.eval_score, self.eval_phase)
+
     def get_fen(self) -> str:
         """
         Get the current position in FEN notation.
@@ -278,7 +496,7 @@ class Board:
         Args:
             row: Row of the piece
             col: Column of the piece
-            only_captures: If True, only return moves that capture a piece
+            only_captures: If True, only return captures, en passant and promotions
         Returns:
             List of Move objects representing possible moves
         """
@@ -293,168 +511,179 @@ class Board:
             return []
 
         moves = []
+        board = self.board
         is_white = piece > 0
+        start_square = row * 8 + col
 
         # Pawn moves
         if abs(piece) == piece_helper.white_pawn:
             row_direction = -1 if is_white else 1
             promotion_rank = 0 if is_white else 7
             
-            # Forward move
-            if not only_captures:
-                if 0 <= row + row_direction < 8 and self.get_piece(row + row_direction, col) == piece_helper.empty:
+            # Forward move (only promotions when generating captures)
+            if not only_captures or row + row_direction == promotion_rank:
+                if 0 <= row + row_direction < 8 and board[row + row_direction][col] == piece_helper.empty:
+                    end_square = (row + row_direction) * 8 + col
                     # Check for promotion
                     if row + row_direction == promotion_rank:
                         # Add all possible promotion moves
-                        promotion_pieces = [
-                            piece_helper.white_queen if is_white else piece_helper.black_queen,
-                            piece_helper.white_rook if is_white else piece_helper.black_rook,
-                            piece_helper.white_bishop if is_white else piece_helper.black_bishop,
-                            piece_helper.white_knight if is_white else piece_helper.black_knight
-                        ]
-                        for promotion_piece in promotion_pieces:
-                            moves.append(Move(row, col, row + row_direction, col, promotion_piece=promotion_piece))
+                        for flag in PROMOTION_FLAGS:
+                            moves.append(_new_move(Move, start_square | end_square << 6 | flag << 12))
                     else:
-                        moves.append(Move(row, col, row + row_direction, col))
+                        moves.append(_new_move(Move, start_square | end_square << 6))
                         # Double move from starting position
                         if (is_white and row == 6) or (not is_white and row == 1):
-                            if self.get_piece(row + 2 * row_direction, col) == piece_helper.empty:
-                                moves.append(Move(row, col, row + 2 * row_direction, col))
+                            if board[row + 2 * row_direction][col] == piece_helper.empty:
+                                moves.append(_new_move(Move, start_square | (end_square + row_direction * 8) << 6))
             
             # Regular captures
-            for col_direction in [-1, 1]:
-                if 0 <= col + col_direction < 8 and 0 <= row + row_direction < 8:
-                    target = self.get_piece(row + row_direction, col + col_direction)
-                    if target != piece_helper.empty and (target > 0) != is_white:
-                        # Check for promotion
-                        if row + row_direction == promotion_rank:
-                            # Add all possible promotion captures
-                            promotion_pieces = [
-                                piece_helper.white_queen if is_white else piece_helper.black_queen,
-                                piece_helper.white_rook if is_white else piece_helper.black_rook,
-                                piece_helper.white_bishop if is_white else piece_helper.black_bishop,
-                                piece_helper.white_knight if is_white else piece_helper.black_knight
-                            ]
-                            for promotion_piece in promotion_pieces:
-                                moves.append(Move(row, col, row + row_direction, col + col_direction, promotion_piece=promotion_piece))
-                        else:
-                            moves.append(Move(row, col, row + row_direction, col + col_direction))
+            for end_square in PAWN_ATTACK_TARGETS[WHITE if is_white else BLACK][start_square]:
+                target = board[end_square >> 3][end_square & 7]
+                if target != piece_helper.empty and (target > 0) != is_white:
+                    # Check for promotion
+                    if row + row_direction == promotion_rank:
+                        # Add all possible promotion captures
+                        for flag in PROMOTION_FLAGS:
+                            moves.append(_new_move(Move, start_square | end_square << 6 | flag << 12))
+                    else:
+                        moves.append(_new_move(Move, start_square | end_square << 6))
             
             # En passant captures
             if self.en_passant_target is not None:
                 en_passant_row, en_passant_col = self.en_passant_target
                 if row == (3 if is_white else 4):  # Correct rank for en passant
                     if abs(col - en_passant_col) == 1:  # Adjacent column
-                        moves.append(Move(row, col, en_passant_row, en_passant_col, is_en_passant=True))
-
-        # Knight moves
-        elif abs(piece) == piece_helper.white_knight:
-            knight_moves = [
-                (-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                (1, -2), (1, 2), (2, -1), (2, 1)
-            ]
-            for row_direction, col_direction in knight_moves:
-                new_row, new_col = row + row_direction, col + col_direction
-                if 0 <= new_row < 8 and 0 <= new_col < 8:
-                    target = self.get_piece(new_row, new_col)
-                    if (not only_captures and target == piece_helper.empty) or \
-                       (target != piece_helper.empty and (target > 0) != is_white):
-                        moves.append(Move(row, col, new_row, new_col))
-
-        # Bishop moves
-        elif abs(piece) == piece_helper.white_bishop:
-            directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-            for row_direction, col_direction in directions:
-                for i in range(1, 8):
-                    new_row, new_col = row + i * row_direction, col + i * col_direction
-                    if not (0 <= new_row < 8 and 0 <= new_col < 8):
-                        break
-                    target = self.get_piece(new_row, new_col)
-                    if not only_captures and target == piece_helper.empty:
-                        moves.append(Move(row, col, new_row, new_col))
-                    elif target != piece_helper.empty:
-                        if (target > 0) != is_white:
-                            moves.append(Move(row, col, new_row, new_col))
-                        break
+                        end_square = en_passant_row * 8 + en_passant_col
+                        moves.append(_new_move(Move, start_square | end_square << 6 | MOVE_FLAG_EN_PASSANT << 12))
 
-        # Rook moves
-        elif abs(piece) == piece_helper.white_rook:
-            directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-            for row_direction, col_direction in directions:
-                for i in range(1, 8):
-                    new_row, new_col = row + i * row_direction, col + i * col_direction
-                    if not (0 <= new_row < 8 and 0 <= new_col < 8):
-                        break
-                    target = self.get_piece(new_row, new_col)
-                    if not only_captures and target == piece_helper.empty:
-                        moves.append(Move(row, col, new_row, new_col))
-                    elif target != piece_helper.empty:
-                        if (target > 0) != is_white:
-                            moves.append(Move(row, col, new_row, new_col))
-                        break
+        # Knight and king moves
+        elif abs(piece) == piece_helper.white_knight or abs(piece) == piece_helper.white_king:
+            targets = KNIGHT_TARGETS if abs(piece) == piece_helper.white_knight else KING_TARGETS
+            for end_square in targets[start_square]:
+                target = board[end_square >> 3][end_square & 7]
+                if (not only_captures and target == piece_helper.empty) or \
+                   (target != piece_helper.empty and (target > 0) != is_white):
+                    moves.append(_new_move(Move, start_square | end_square << 6))
 
-        # Queen moves (combination of bishop and rook)
-        elif abs(piece) == piece_helper.white_queen:
-            directions = [
-                (-1, -1), (-1, 1), (1, -1), (1, 1),  # Bishop directions
-                (-1, 0), (1, 0), (0, -1), (0, 1)     # Rook directions
-            ]
-            for row_direction, col_direction in directions:
-                for i in range(1, 8):
-                    new_row, new_col = row + i * row_direction, col + i * col_direction
-                    if not (0 <= new_row < 8 and 0 <= new_col < 8):
-                        break
-                    target = self.get_piece(new_row, new_col)
-                    if not only_captures and target == piece_helper.empty:
-                        moves.append(Move(row, col, new_row, new_col))
-                    elif target != piece_helper.empty:
+        # Sliding moves: bishops and rooks along their own directions, queens along both
+        else:
+            if abs(piece) == piece_helper.white_bishop:
+                directions = BISHOP_DIRECTIONS
+            elif abs(piece) == piece_helper.white_rook:
+                directions = ROOK_DIRECTIONS
+            else:
+                directions = range(8)
+            rays = RAY_TARGETS[start_square]
+            for direction in directions:
+                for end_square in rays[direction]:
+                    target = board[end_square >> 3][end_square & 7]
+                    if target == piece_helper.empty:
+                        if not only_captures:
+                            moves.append(_new_move(Move, start_square | end_square << 6))
+                    else:
                         if (target > 0) != is_white:
-                            moves.append(Move(row, col, new_row, new_col))
+                            moves.append(_new_move(Move, start_square | end_square << 6))
                         break
 
-        # King moves
-        elif abs(piece) == piece_helper.white_king:
-            for row_direction in [-1, 0, 1]:
-                for col_direction in [-1, 0, 1]:
-                    if row_direction == 0 and col_direction == 0:
-                        continue
-                    new_row, new_col = row + row_direction, col + col_direction
-                    if 0 <= new_row < 8 and 0 <= new_col < 8:
-                        target = self.get_piece(new_row, new_col)
-                        if (not only_captures and target == piece_helper.empty) or \
-                           (target != piece_helper.empty and (target > 0) != is_white):
-                            moves.append(Move(row, col, new_row, new_col))
-
         return moves
 
     def find_king(self, is_white: bool) -> tuple[int, int]:
         """Find the position of the specified king."""
-        king = piece_helper.white_king if is_white else piece_helper.black_king
-        for row in range(8):
-            for col in range(8):
-                if self.board[row][col] == king:
-                    return row, col
-        print(f"ERROR: No {'white' if is_white else 'black'} king found on the board!")
-        return -1, -1  # Should never happen in a valid chess position
+        king_square = self.king_squares[is_white]
+        if king_square is None:
+            print(f"ERROR: No {'white' if is_white else 'black'} king found on the board!")
+            return -1, -1  # Should never happen in a valid chess position
+        return king_square
 
     def is_square_attacked(self, row: int, col: int, is_white: bool) -> bool:
-        """Check if a square is attacked by any opponent piece."""
+        """
+        Check if a square is attacked by any opponent piece.
+        Looks outward from the square along knight, king and pawn offsets and the eight rays,
+        so the cost does not depend on how many moves the opponent has.
+        Args:
+            row: Row of the square
+            col: Column of the square
+            is_white: True if the square is defended by white (attacked by black), False otherwise
+        Returns:
+            bool: True if an opponent piece attacks the square
+        """
         if not (0 <= row < 8 and 0 <= col < 8):
             print(f"ERROR: is_square_attacked called with invalid coordinates: {row}, {col}")
             return False
 
-        # Check each square on the board for opponent pieces
-        for r in range(8):
-            for c in range(8):
-                piece = self.board[r][c]
-                if piece != piece_helper.empty and (piece > 0) != is_white:
-                    # Get all possible moves for this piece
-                    moves = self.get_pseudo_legal_moves(r, c)
-                    # Check if any move attacks the target square
-                    if any(move.end_row == row and move.end_col == col for move in moves):
+        board = self.board
+        square = row * 8 + col
+        sign = -1 if is_white else 1  # Sign of the opponent's pieces
+
+        enemy_knight = sign * piece_helper.white_knight
+        for target in KNIGHT_TARGETS[square]:
+            if board[target >> 3][target & 7] == enemy_knight:
+                return True
+
+        # Opponent pawns stand exactly where a pawn of ours on this square would attack
+        enemy_pawn = sign * piece_helper.white_pawn
+        for target in PAWN_ATTACK_TARGETS[WHITE if is_white else BLACK][square]:
+            if board[target >> 3][target & 7] == enemy_pawn:
+                return True
+
+        enemy_king = sign * piece_helper.white_king
+        for target in KING_TARGETS[square]:
+            if board[target >> 3][target & 7] == enemy_king:
+                return True
+
+        enemy_queen = sign * piece_helper.white_queen
+        for direction, ray in enumerate(RAY_TARGETS[square]):
+            enemy_slider = sign * (piece_helper.white_rook if direction < 4 else piece_helper.white_bishop)
+            for target in ray:
+                piece = board[target >> 3][target & 7]
+                if piece != piece_helper.empty:
+                    if piece == enemy_slider or piece == enemy_queen:
                         return True
+                    break
         return False
 
+    def attackers_of(self, row: int, col: int, is_white: bool) -> list[tuple[int, int]]:
+        """
+        Find every piece of the given color that attacks a square.
+        Args:
+            row: Row of the square
+            col: Column of the square
+            is_white: True to list white attackers, False to list black attackers
+        Returns:
+            List of (row, col) squares of the attacking pieces
+        """
+        board = self.board
+        square = row * 8 + col
+        sign = 1 if is_white else -1  # Sign of the attacking pieces
+        attackers = []
+
+        knight = sign * piece_helper.white_knight
+        for target in KNIGHT_TARGETS[square]:
+            if board[target >> 3][target & 7] == knight:
+                attackers.append(divmod(target, 8))
+
+        # Our pawns stand where a pawn of the other color on this square would attack
+        pawn = sign * piece_helper.white_pawn
+        for target in PAWN_ATTACK_TARGETS[BLACK if is_white else WHITE][square]:
+            if board[target >> 3][target & 7] == pawn:
+                attackers.append(divmod(target, 8))
+
+        king = sign * piece_helper.white_king
+        for target in KING_TARGETS[square]:
+            if board[target >> 3][target & 7] == king:
+                attackers.append(divmod(target, 8))
+
+        queen = sign * piece_helper.white_queen
+        for direction, ray in enumerate(RAY_TARGETS[square]):
+            slider = sign * (piece_helper.white_rook if direction < 4 else piece_helper.white_bishop)
+            for target in ray:
+                piece = board[target >> 3][target & 7]
+                if piece != piece_helper.empty:
+                    if piece == slider or piece == queen:
+                        attackers.append(divmod(target, 8))
+                    break
+        return attackers
+
     def king_is_attacked(self, white_king: bool) -> bool:
         """
         Check if the specified king is under attack.
@@ -464,140 +693,158 @@ class Board:
             bool: True if the king is under attack, False otherwise
         """
         king_row, king_col = self.find_king(white_king)
-
-        # Check each square on the board for opponent pieces
-        for r in range(8):
-            for c in range(8):
-                piece = self.board[r][c]
-                if piece != piece_helper.empty and (piece > 0) != white_king:
-                    # Get all possible moves for this piece
-                    moves = self.get_pseudo_legal_moves(r, c, only_captures=True)
-                    # Check if any move attacks the target square
-                    if any(move.end_row == king_row and move.end_col == king_col for move in moves):
-                        return True
-        return False
+        return self.is_square_attacked(king_row, king_col, white_king)
 
     def make_move(self, move: Move) -> bool:
         """
         Make a move on the board.
         Args:
-            move: The move to make
+            move: The move to make (a Move, or its packed int value)
         Returns:
             bool: True if the move was successful, False otherwise
         """
-        # Validate move coordinates
-        if not (0 <= move.start_row < 8 and 0 <= move.start_col < 8 and 
-                0 <= move.end_row < 8 and 0 <= move.end_col < 8):
-            print(f"ERROR: make_move called with invalid coordinates: from ({move.start_row}, {move.start_col}) to ({move.end_row}, {move.end_col})")
+        # Validate the packed move
+        if not 0 <= move < (MOVE_FLAG_PROMOTION + 4) << 12:
+            print(f"ERROR: make_move called with an invalid move: {int(move)}")
             return False
 
-        # Save current comprehensive state BEFORE making the move
-        current_state = {
-            'board': [row[:] for row in self.board],
-            'white_kingside_castle': self.white_kingside_castle,
-            'white_queenside_castle': self.white_queenside_castle,
-            'black_kingside_castle': self.black_kingside_castle,
-            'black_queenside_castle': self.black_queenside_castle,
-            'en_passant_target': self.en_passant_target,
-            'halfmove_clock': self.halfmove_clock,
-            'is_white_turn': self.is_white_turn  # Whose turn it is before this move
-        }
-        self.position_history.append(current_state)
+        board = self.board
+        start_square = move & 63
+        end_square = move >> 6 & 63
+        flag = move >> 12
+        start_row, start_col = start_square >> 3, start_square & 7
+        end_row, end_col = end_square >> 3, end_square & 7
         
         # Get the piece being moved
-        piece = self.get_piece(move.start_row, move.start_col)
+        piece = board[start_row][start_col]
         if piece == piece_helper.empty:
-            print(f"ERROR: Attempting to move an empty square from ({move.start_row}, {move.start_col})")
+            print(f"ERROR: Attempting to move an empty square from ({start_row}, {start_col})")
             return False
 
         # Verify piece color matches turn
         if (piece > 0) != self.is_white_turn:
             print(f"ERROR: Wrong color piece moved! Turn: {'white' if self.is_white_turn else 'black'}, Piece: {piece}")
             return False
-            
-        # Remove piece from old position
-        self.board[move.start_row][move.start_col] = piece_helper.empty
-        
-        # Handle en passant capture
-        if move.is_en_passant:
-            if self.en_passant_target is None:
-                print("ERROR: En passant move attempted but no en passant target exists!")
-                return False
-            captured_pawn_row = move.start_row  # The captured pawn is on the same row as the moving pawn
-            captured_pawn_col = move.end_col    # The captured pawn is on the same column as the destination
-            self.board[captured_pawn_row][captured_pawn_col] = piece_helper.empty
-        
-        # Handle castling
-        if move.is_kingside_castle or move.is_queenside_castle:
+
+        target_piece = board[end_row][end_col]
+        if abs(target_piece) == piece_helper.white_king:
+            print("ERROR: Attempting to capture a king!")
+            return False
+
+        # Validate special moves before touching the board, so a rejected move leaves no trace
+        if flag == MOVE_FLAG_EN_PASSANT and self.en_passant_target is None:
+            print("ERROR: En passant move attempted but no en passant target exists!")
+            return False
+        if flag == MOVE_FLAG_KINGSIDE_CASTLE or flag == MOVE_FLAG_QUEENSIDE_CASTLE:
             if abs(piece) != piece_helper.white_king:
                 print("ERROR: Castling attempted with non-king piece!")
                 return False
-            rook_col = 7 if move.is_kingside_castle else 0
+            rook_col = 7 if flag == MOVE_FLAG_KINGSIDE_CASTLE else 0
             rook_piece = piece_helper.white_rook if piece > 0 else piece_helper.black_rook
-            new_rook_col = move.end_col - 1 if move.is_kingside_castle else move.end_col + 1
-            
-            # Verify rook is present
-            if self.get_piece(move.start_row, rook_col) != rook_piece:
-                print(f"ERROR: Castling attempted but no rook found at {move.start_row}, {rook_col}")
+            if board[start_row][rook_col] != rook_piece:
+                print(f"ERROR: Castling attempted but no rook found at {start_row}, {rook_col}")
                 return False
-            
-            # Move the rook
-            self.board[move.start_row][rook_col] = piece_helper.empty
-            self.board[move.start_row][new_rook_col] = rook_piece
-        
-        # Place piece in new position
-        target_piece = self.get_piece(move.end_row, move.end_col)
-        if abs(target_piece) == piece_helper.white_king:
-            print("ERROR: Attempting to capture a king!")
-            return False
-        
-        # Handle pawn promotion
-        if move.promotion_piece is not None:
+        if flag >= MOVE_FLAG_PROMOTION:
             if abs(piece) != piece_helper.white_pawn:
                 print("ERROR: Promotion attempted with non-pawn piece!")
                 return False
-            if (piece > 0 and move.end_row != 0) or (piece < 0 and move.end_row != 7):
+            if (piece > 0 and end_row != 0) or (piece < 0 and end_row != 7):
                 print("ERROR: Promotion attempted on wrong rank!")
                 return False
-            piece = move.promotion_piece
 
-        self.board[move.end_row][move.end_col] = piece
+        # Save just what is needed to reverse the move
+        captured_piece = -piece if flag == MOVE_FLAG_EN_PASSANT else target_piece
+        self.position_history.append(UndoRecord(move, piece, captured_piece, self.castling_rights,
+                                                self.en_passant_target, self.halfmove_clock, self.zobrist_hash,
+                                                self.eval_score, self.eval_phase))
+
+        own_squares = self.piece_squares[self.is_white_turn]
+        enemy_squares = self.piece_squares[not self.is_white_turn]
+        own_squares.discard(start_square)
+        own_squares.add(end_square)
+        if abs(piece) == piece_helper.white_king:
+            self.king_squares[self.is_white_turn] = (end_row, end_col)
+        h = self.zobrist_hash
+        score = self.eval_score - PIECE_SQUARE_SCORES[(piece + 6) * 64 + start_square]
+            
+        # Remove piece from old position
+        board[start_row][start_col] = piece_helper.empty
+        h ^= ZOBRIST_PIECE_SQUARE[(piece + 6) * 64 + start_square]
+        
+        # Handle en passant capture
+        if flag == MOVE_FLAG_EN_PASSANT:
+            # The captured pawn is on the same row as the moving pawn and the same column as the destination
+            captured_square = start_row * 8 + end_col
+            board[start_row][end_col] = piece_helper.empty
+            enemy_squares.discard(captured_square)
+            h ^= ZOBRIST_PIECE_SQUARE[(captured_piece + 6) * 64 + captured_square]
+            score -= PIECE_SQUARE_SCORES[(captured_piece + 6) * 64 + captured_square]
+        
+        # Handle castling
+        elif flag == MOVE_FLAG_KINGSIDE_CASTLE or flag == MOVE_FLAG_QUEENSIDE_CASTLE:
+            new_rook_col = end_col - 1 if flag == MOVE_FLAG_KINGSIDE_CASTLE else end_col + 1
+            board[start_row][rook_col] = piece_helper.empty
+            board[start_row][new_rook_col] = rook_piece
+            own_squares.discard(start_row * 8 + rook_col)
+            own_squares.add(start_row * 8 + new_rook_col)
+            h ^= (ZOBRIST_PIECE_SQUARE[(rook_piece + 6) * 64 + start_row * 8 + rook_col] ^
+                  ZOBRIST_PIECE_SQUARE[(rook_piece + 6) * 64 + start_row * 8 + new_rook_col])
+            score += (PIECE_SQUARE_SCORES[(rook_piece + 6) * 64 + start_row * 8 + new_rook_col] -
+                      PIECE_SQUARE_SCORES[(rook_piece + 6) * 64 + start_row * 8 + rook_col])
+        
+        # Handle pawn promotion
+        elif flag >= MOVE_FLAG_PROMOTION:
+            promotion_piece = flag - MOVE_FLAG_PROMOTION + 2
+            piece = promotion_piece if piece > 0 else -promotion_piece
+            self.eval_phase += PIECE_PHASES[piece + 6]
 
-        # Handle captures (including en passant)
-        captured_piece = target_piece
+        # Place piece in new position (empty squares hash to 0, so this also covers quiet moves)
+        board[end_row][end_col] = piece
+        if target_piece != piece_helper.empty:
+            enemy_squares.discard(end_square)
+        h ^= ZOBRIST_PIECE_SQUARE[(target_piece + 6) * 64 + end_square] ^ ZOBRIST_PIECE_SQUARE[(piece + 6) * 64 + end_square]
+        self.eval_score = score + PIECE_SQUARE_SCORES[(piece + 6) * 64 + end_square] - PIECE_SQUARE_SCORES[(target_piece + 6) * 64 + end_square]
+        if target_piece != piece_helper.empty:
+            self.eval_phase -= PIECE_PHASES[target_piece + 6]
         
         # Update halfmove clock
-        if abs(piece) == piece_helper.white_pawn or captured_piece != piece_helper.empty or move.is_en_passant:
+        if abs(piece) == piece_helper.white_pawn or captured_piece != piece_helper.empty:
             self.halfmove_clock = 0
         else:
             self.halfmove_clock += 1
         
-        # Update castling rights
-        if abs(piece) == piece_helper.white_king:
-            if piece > 0:  # White king
-                self.white_kingside_castle = False
-                self.white_queenside_castle = False
-            else:  # Black king
-                self.black_kingside_castle = False
-                self.black_queenside_castle = False
-
-        if (move.start_col == 7 and move.start_row == 7) or (move.end_col == 7 and move.end_row == 7):  # Kingside white rook
-            self.white_kingside_castle = False
-        elif (move.start_col == 0 and move.start_row == 7) or (move.end_col == 0 and move.end_row == 7):  # Queenside whiterook
-            self.white_queenside_castle = False
-        elif (move.start_col == 0 and move.start_row == 0) or (move.end_col == 0 and move.end_row == 0):  # Queenside black rook
-            self.black_queenside_castle = False
-        elif (move.start_col == 7 and move.start_row == 0) or (move.end_col == 7 and move.end_row == 0):  # Kingside black rook
-            self.black_kingside_castle = False
+        # Update castling rights: moving the king or a rook, or capturing a rook on its home square
+        castling_rights = self.castling_rights & CASTLING_RIGHTS_MASK[start_square] & CASTLING_RIGHTS_MASK[end_square]
+        h ^= ZOBRIST_CASTLING[self.castling_rights] ^ ZOBRIST_CASTLING[castling_rights]
+        self.castling_rights = castling_rights
         
         # Update en passant target if it was a double pawn move
-        if abs(piece) == piece_helper.white_pawn and abs(move.end_row - move.start_row) == 2:
-            self.en_passant_target = ((move.start_row + move.end_row) // 2, move.start_col)
+        if self.en_passant_target is not None:
+            h ^= ZOBRIST_EN_PASSANT[self.en_passant_target[1]]
+        if abs(piece) == piece_helper.white_pawn and abs(end_row - start_row) == 2:
+            self.en_passant_target = ((start_row + end_row) // 2, start_col)
+            h ^= ZOBRIST_EN_PASSANT[start_col]
         else:
             self.en_passant_target = None
         
         # Switch turns
         self.is_white_turn = not self.is_white_turn
+        self.zobrist_hash = h = h ^ ZOBRIST_SIDE
+
+        # No position from before a pawn move or capture can occur again, so start counting afresh
+        if self.halfmove_clock == 0:
+            self.repetition_stack.append(self.repetition_counts)
+            self.repetition_counts = {h: 1}
+        else:
+            counts = self.repetition_counts
+            counts[h] = counts.get(h, 0) + 1
+
+        if self.debug_zobrist:
+            self.check_zobrist_hash()
+        if self.debug_evaluation:
+            self.check_evaluation()
+        if self.accumulator is not None:
+            self.accumulator.push(self)
         
         return True
 
@@ -610,20 +857,187 @@ class Board:
         if not self.position_history:
             return False
             
-        # Restore the comprehensive state from before the undone move
-        last_saved_state = self.position_history.pop()
-        
-        self.board = last_saved_state['board']
-        self.white_kingside_castle = last_saved_state['white_kingside_castle']
-        self.white_queenside_castle = last_saved_state['white_queenside_castle']
-        self.black_kingside_castle = last_saved_state['black_kingside_castle']
-        self.black_queenside_castle = last_saved_state['black_queenside_castle']
-        self.en_passant_target = last_saved_state['en_passant_target']
-        self.halfmove_clock = last_saved_state['halfmove_clock']
-        self.is_white_turn = last_saved_state['is_white_turn'] # This restores the turn to what it was before the move
+        # Take the position being left out of the repetition counts
+        if self.halfmove_clock == 0:
+            self.repetition_counts = self.repetition_stack.pop()
+        else:
+            counts = self.repetition_counts
+            count = counts[self.zobrist_hash] - 1
+            if count:
+                counts[self.zobrist_hash] = count
+            else:
+                del counts[self.zobrist_hash]
+
+        # Reverse only the squares the move touched
+        record = self.position_history.pop()
+        move = record.move
+        board = self.board
+        is_white = not self.is_white_turn  # The side that made the move
+        own_squares = self.piece_squares[is_white]
+        start_square = move & 63
+        end_square = move >> 6 & 63
+        flag = move >> 12
+        start_row, start_col = start_square >> 3, start_square & 7
+        end_row, end_col = end_square >> 3, end_square & 7
+
+        board[start_row][start_col] = record.moved_piece
+        own_squares.discard(end_square)
+        own_squares.add(start_square)
+        if abs(record.moved_piece) == piece_helper.white_king:
+            self.king_squares[is_white] = (start_row, start_col)
+
+        if flag == MOVE_FLAG_EN_PASSANT:
+            board[end_row][end_col] = piece_helper.empty
+            board[start_row][end_col] = record.captured_piece
+            self.piece_squares[not is_white].add(start_row * 8 + end_col)
+        else:
+            board[end_row][end_col] = record.captured_piece
+            if record.captured_piece != piece_helper.empty:
+                self.piece_squares[not is_white].add(end_square)
+            elif flag == MOVE_FLAG_KINGSIDE_CASTLE or flag == MOVE_FLAG_QUEENSIDE_CASTLE:
+                rook_col = 7 if flag == MOVE_FLAG_KINGSIDE_CASTLE else 0
+                new_rook_col = end_col - 1 if flag == MOVE_FLAG_KINGSIDE_CASTLE else end_col + 1
+                board[start_row][rook_col] = board[start_row][new_rook_col]
+                board[start_row][new_rook_col] = piece_helper.empty
+                own_squares.discard(start_row * 8 + new_rook_col)
+                own_squares.add(start_row * 8 + rook_col)
+
+        self.castling_rights = record.castling_rights
+        self.en_passant_target = record.en_passant_target
+        self.halfmove_clock = record.halfmove_clock
+        self.is_white_turn = is_white
+        self.zobrist_hash = record.zobrist_hash
+        self.eval_score = record.eval_score
+        self.eval_phase = record.eval_phase
+        if self.accumulator is not None:
+            self.accumulator.pop()
+
+        if self.debug_zobrist:
+            self.check_zobrist_hash()
+        if self.debug_evaluation:
+            self.check_evaluation()
         
         return True
 
+    def get_checks_and_pins(self, is_white: bool) -> tuple[int, set, dict]:
+        """
+        Find the pieces giving check to the specified king and the pieces pinned against it.
+        Args:
+            is_white: True for the white king, False for the black king
+        Returns:
+            tuple: (number of checkers,
+                    squares a non-king move must land on to resolve the check, or None if not in check,
+                    {pinned piece square: squares it may move to along the pin})
+            with every square given as row * 8 + col
+        """
+        board = self.board
+        king_row, king_col = self.find_king(is_white)
+        king_square = king_row * 8 + king_col
+        checkers = 0
+        check_squares = None
+        pins = {}
+
+        # Walk the eight rays from the king: the first enemy slider seen gives check,
+        # or pins our piece if exactly one of ours stands in between
+        for direction, ray in enumerate(RAY_TARGETS[king_square]):
+            slider = piece_helper.white_rook if direction < 4 else piece_helper.white_bishop
+            blocker = None
+            for distance, square in enumerate(ray):
+                piece = board[square >> 3][square & 7]
+                if piece != piece_helper.empty:
+                    if (piece > 0) == is_white:
+                        if blocker is not None:
+                            break
+                        blocker = square
+                    else:
+                        if abs(piece) == slider or abs(piece) == piece_helper.white_queen:
+                            if blocker is None:
+                                checkers += 1
+                                check_squares = set(ray[:distance + 1])
+                            else:
+                                pins[blocker] = set(ray[:distance + 1])
+                        break
+
+        # Knights and pawns can only give check by capture, so the checker's square is the only answer
+        enemy_knight = piece_helper.black_knight if is_white else piece_helper.white_knight
+        for square in KNIGHT_TARGETS[king_square]:
+            if board[square >> 3][square & 7] == enemy_knight:
+                checkers += 1
+                check_squares = {square}
+        enemy_pawn = piece_helper.black_pawn if is_white else piece_helper.white_pawn
+        for square in PAWN_ATTACK_TARGETS[WHITE if is_white else BLACK][king_square]:
+            if board[square >> 3][square & 7] == enemy_pawn:
+                checkers += 1
+                check_squares = {square}
+
+        return checkers, check_squares, pins
+
+    def _leaves_king_safe(self, move: Move) -> bool:
+        """Try a move and report whether the mover's king is safe afterwards."""
+        is_white = self.is_white_turn
+        if not self.make_move(move):
+            print("ERROR: Failed to make move during move generation!")
+            return False
+        safe = not self.king_is_attacked(is_white)
+        self.undo_move()
+        return safe
+
+    def _legal_piece_moves(self, row: int, col: int, checks_and_pins: tuple[int, set, dict],
+                           only_captures: bool = False) -> list[Move]:
+        """Filter the pseudo-legal moves of one piece using precomputed checks and pins."""
+        piece = self.board[row][col]
+        checkers, check_squares, pins = checks_and_pins
+
+        if abs(piece) == piece_helper.white_king:
+            # Take the king off the board so sliders attack through the square it leaves
+            is_white = piece > 0
+            pseudo_moves = self.get_pseudo_legal_moves(row, col, only_captures)
+            self.board[row][col] = piece_helper.empty
+            moves = [move for move in pseudo_moves if not self.is_square_attacked(move >> 9 & 7, move >> 6 & 7, is_white)]
+            self.board[row][col] = piece
+            if checkers == 0 and not only_captures:
+                moves.extend(self._castling_moves(row, col, piece > 0))
+            return moves
+
+        # In double check only the king can move
+        if checkers > 1:
+            return []
+
+        pin_squares = pins.get(row * 8 + col)
+        moves = []
+        for move in self.get_pseudo_legal_moves(row, col, only_captures):
+            if move >> 12 == MOVE_FLAG_EN_PASSANT:
+                # Removes two pieces from one rank, which can uncover a check that no pin covers
+                if self._leaves_king_safe(move):
+                    moves.append(move)
+                continue
+            end_square = move >> 6 & 63
+            if check_squares is not None and end_square not in check_squares:
+                continue
+            if pin_squares is not None and end_square not in pin_squares:
+                continue
+            moves.append(move)
+        return moves
+
+    def _castling_moves(self, row: int, col: int, is_white: bool) -> list[Move]:
+        """Castling moves for a king that is not in check."""
+        moves = []
+        board = self.board
+        king_square = row * 8 + col
+        # Rights bits 0/1 are white's, 2/3 black's, each kingside then queenside
+        for side in (0, 1) if is_white else (2, 3):
+            start_square, end_square = CASTLING_KING_SQUARES[side]
+            if not self.castling_rights >> side & 1 or king_square != start_square:
+                continue
+            # The squares between king and rook must be empty, and those the king crosses not attacked
+            if any(board[square >> 3][square & 7] != piece_helper.empty for square in CASTLING_EMPTY_SQUARES[side]):
+                continue
+            if any(self.is_square_attacked(square >> 3, square & 7, is_white) for square in CASTLING_SAFE_SQUARES[side]):
+                continue
+            flag = MOVE_FLAG_KINGSIDE_CASTLE if end_square > start_square else MOVE_FLAG_QUEENSIDE_CASTLE
+            moves.append(_new_move(Move, start_square | end_square << 6 | flag << 12))
+        return moves
+
     def get_piece_moves(self, row: int, col: int) -> list[Move]:
         """
         Get all legal moves for a piece at the given position, including castling.
@@ -638,83 +1052,166 @@ class Board:
         if piece == piece_helper.empty:
             print(f"ERROR: get_piece_moves called on empty square at {row}, {col}")
             return []
-            
-        is_white = piece > 0
-        moves = []
-        
-        # Get pseudo-legal moves
-        pseudo_moves = self.get_pseudo_legal_moves(row, col)
-        
-        # Try each move and check if it leaves the king in check
-        for move in pseudo_moves:
-            # Make the move
-            if not self.make_move(move):
-                print("ERROR: Failed to make move during move generation!")
-                continue
-            
-            # Check if the king is safe
-            if not self.king_is_attacked(is_white):
-                moves.append(move)
-            
-            # Undo the move
-            if not self.undo_move():
-                print("ERROR: Failed to undo move during move generation!")
-                continue
-        
-        # Add castling moves if it's a king
-        if abs(piece) == piece_helper.white_king:
-            # Kingside castling
-            if (is_white and self.white_kingside_castle) or (not is_white and self.black_kingside_castle):
-                # Check if path is clear
-                path_clear = True
-                for c in range(col + 1, 7):  # Check squares between king and rook
-                    if self.get_piece(row, c) != piece_helper.empty:
-                        path_clear = False
-                        break
-                
-                # Check if squares are not under attack
-                squares_safe = True
-                for c in range(col, col + 3):  # Check king's square and two squares to the right
-                    squares_safe &= not self.is_square_attacked(row, c, is_white)
-                
-                if path_clear and squares_safe:
-                    moves.append(Move(row, col, row, col + 2, is_kingside_castle=True))
-            
-            # Queenside castling
-            if (is_white and self.white_queenside_castle) or (not is_white and self.black_queenside_castle):
-                # Check if path is clear
-                path_clear = True
-                for c in range(col - 1, 0, -1):  # Check squares between king and rook
-                    if self.get_piece(row, c) != piece_helper.empty:
-                        path_clear = False
-                        break
-                
-                # Check if squares are not under attack
-                squares_safe = True
-                for c in range(col, col - 3, -1):  # Check king's square and two squares to the left
-                    squares_safe &= not self.is_square_attacked(row, c, is_white)
-                
-                if path_clear and squares_safe:
-                    moves.append(Move(row, col, row, col - 2, is_queenside_castle=True))
-        
-        return moves
+        return self._legal_piece_moves(row, col, self.get_checks_and_pins(piece > 0))
+
+    def _checks_and_pins_to_move(self) -> tuple[int, set, dict]:
+        """Checks and pins against the king of the side to move, in the form _legal_piece_moves takes."""
+        return self.get_checks_and_pins(self.is_white_turn)
+
+    def _squares_to_move(self) -> list[int]:
+        """Squares of the side to move's pieces."""
+        # Sorted copy: en passant checks make and undo moves, which touches the set
+        return sorted(self.piece_squares[self.is_white_turn])
+
+    def _quiet_moves(self, squares: list[int], checks_and_pins: tuple) -> Iterator[Move]:
+        """Yield the legal quiet moves and castling of the pieces on `squares`, one piece at a time."""
+        board = self.board
+        for square in squares:
+            for move in self._legal_piece_moves(square >> 3, square & 7, checks_and_pins):
+                end_square = move >> 6 & 63
+                if board[end_square >> 3][end_square & 7] == piece_helper.empty and \
+                        move >> 12 != MOVE_FLAG_EN_PASSANT and move >> 12 < MOVE_FLAG_PROMOTION:
+                    yield move
+
+    def generate_legal_moves(self) -> Iterator[Move]:
+        """
+        Yield the legal moves for the side to move in two stages: captures and promotions (including
+        en passant) first, from a pass that generates nothing else, then quiet moves and castling.
+        Checks and pins against the king are worked out once. Quiet moves are generated one piece at
+        a time as the generator reaches that piece, so a caller that stops early (e.g. on a beta
+        cutoff) skips the remaining pieces, and one that stops among the captures generates no quiet
+        moves at all. The caller may make moves between yields as long as it undoes them before
+        asking for the next one.
+        Yields:
+            Move objects, captures and promotions before quiet moves
+        """
+        checks_and_pins = self._checks_and_pins_to_move()
+        squares = self._squares_to_move()
+        for square in squares:
+            yield from self._legal_piece_moves(square >> 3, square & 7, checks_and_pins, True)
+        yield from self._quiet_moves(squares, checks_and_pins)
+
+    def generate_quiet_moves(self) -> Iterator[Move]:
+        """
+        Yield the legal quiet moves and castling for the side to move (the second stage of
+        generate_legal_moves), one piece at a time.
+        Yields:
+            Move objects that capture nothing and do not promote
+        """
+        yield from self._quiet_moves(self._squares_to_move(), self._checks_and_pins_to_move())
 
     def get_all_legal_moves(self) -> list[Move]:
         """
-        Get all legal moves for the given color.
+        Get all legal moves for the side to move, captures and promotions first.
+        Returns:
+            List of Move objects representing all legal moves for the side to move
+        """
+        # One pass over the pieces, split afterwards; the staged generator would generate captures twice
+        checks_and_pins = self._checks_and_pins_to_move()
+        board = self.board
+        captures = []
+        quiet_moves = []
+        for square in self._squares_to_move():
+            for move in self._legal_piece_moves(square >> 3, square & 7, checks_and_pins):
+                end_square = move >> 6 & 63
+                if board[end_square >> 3][end_square & 7] != piece_helper.empty or \
+                        move >> 12 == MOVE_FLAG_EN_PASSANT or move >> 12 >= MOVE_FLAG_PROMOTION:
+                    captures.append(move)
+                else:
+                    quiet_moves.append(move)
+        captures.extend(quiet_moves)
+        return captures
+
+    def get_legal_captures(self) -> list[Move]:
+        """
+        Get the legal captures, en passant captures and promotions for the side to move,
+        without generating any quiet moves.
         Returns:
-            List of Move objects representing all legal moves for the given color
+            List of Move objects
         """
+        checks_and_pins = self._checks_and_pins_to_move()
         moves = []
-        # Iterate through all squares
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                # If we find a piece of the right color
-                if piece != piece_helper.empty and (piece > 0) == self.is_white_turn:
-                    moves.extend(self.get_piece_moves(row, col))
+        for square in self._squares_to_move():
+            moves.extend(self._legal_piece_moves(square >> 3, square & 7, checks_and_pins, True))
         return moves
 
+    def is_legal_move(self, move: Move) -> bool:
+        """
+        Check a move for the side to move (e.g. one taken from the transposition table) by generating
+        only the moves of the piece on its start square.
+        Args:
+            move: The move to check
+        Returns:
+            bool: True if the move is legal in the current position
+        """
+        start_square = move & 63
+        piece = self.board[start_square >> 3][start_square & 7]
+        if piece == piece_helper.empty or (piece > 0) != self.is_white_turn:
+            return False
+        return move in self._legal_piece_moves(start_square >> 3, start_square & 7, self._checks_and_pins_to_move())
+
+    def static_exchange_evaluation(self, move: Move) -> int:
+        """
+        Estimate the material won or lost by a capture once all captures on its target square are played out,
+        each side recapturing with its least valuable attacker and stopping when that would lose material.
+        Pins are ignored.
+        Args:
+            move: The capture (or any move) to evaluate, for the side to move
+        Returns:
+            int: Expected material gain in centipawns for the side making the move
+        """
+        board = self.board
+        start_row, start_col = move >> 3 & 7, move & 7
+        end_row, end_col = move >> 9 & 7, move >> 6 & 7
+        flag = move >> 12
+        piece = board[start_row][start_col]
+
+        gains = [SEE_PIECE_VALUES[abs(board[end_row][end_col])]]
+        next_victim = SEE_PIECE_VALUES[abs(piece)]
+        removed = [(start_row, start_col, piece)]
+        if flag == MOVE_FLAG_EN_PASSANT:
+            gains[0] = SEE_PIECE_VALUES[piece_helper.white_pawn]
+            removed.append((start_row, end_col, board[start_row][end_col]))
+        elif flag >= MOVE_FLAG_PROMOTION:
+            promotion_value = SEE_PIECE_VALUES[flag - MOVE_FLAG_PROMOTION + 2]
+            gains[0] += promotion_value - SEE_PIECE_VALUES[piece_helper.white_pawn]
+            next_victim = promotion_value
+
+        # Lift pieces off the board as they capture, so sliders behind them join the exchange
+        for row, col, _ in removed:
+            board[row][col] = piece_helper.empty
+        is_white = piece < 0
+        while True:
+            attackers = self.attackers_of(end_row, end_col, is_white)
+            if not attackers:
+                break
+            row, col = min(attackers, key=lambda square: abs(board[square[0]][square[1]]))
+            gains.append(next_victim - gains[-1])
+            next_victim = SEE_PIECE_VALUES[abs(board[row][col])]
+            removed.append((row, col, board[row][col]))
+            board[row][col] = piece_helper.empty
+            is_white = not is_white
+        for row, col, removed_piece in removed:
+            board[row][col] = removed_piece
+
+        # Each side may stop capturing when continuing would be worse
+        while len(gains) > 1:
+            last = gains.pop()
+            gains[-1] = -max(-gains[-1], last)
+        return gains[0]
+
+    def has_legal_move(self) -> bool:
+        """
+        Check whether the side to move has any legal move, stopping at the first piece that has one.
+        Returns:
+            bool: True if at least one legal move exists, False on checkmate or stalemate
+        """
+        checks_and_pins = self._checks_and_pins_to_move()
+        for square in self._squares_to_move():
+            if self._legal_piece_moves(square >> 3, square & 7, checks_and_pins):
+                return True
+        return False
+
     def get_gamestate(self) -> str:
         """
         Determines the current state of the game.
@@ -722,8 +1219,7 @@ class Board:
             str: "ongoing", "checkmate", "stalemate", "draw_50_move", "draw_threefold_repetition"
         """
         # Check for checkmate or stalemate
-        legal_moves = self.get_all_legal_moves()
-        if not legal_moves:
+        if not self.has_legal_move():
             if self.king_is_attacked(self.is_white_turn):
                 return "checkmate"
             else:
@@ -734,36 +1230,9 @@ class Board:
             return "draw_50_move"
 
         # Check for threefold repetition
-        # A position is repeated if the board, current turn, castling rights, and en passant target are identical.
-        current_board_tuple = tuple(map(tuple, self.board))
-        current_comparable_state = (
-            current_board_tuple,
-            self.is_white_turn,
-            self.white_kingside_castle,
-            self.white_queenside_castle,
-            self.black_kingside_castle,
-            self.black_queenside_castle,
-            self.en_passant_target
-        )
-
-        # Count occurrences of the current state in history.
-        # The current state itself counts as one occurrence.
-        occurrences = 1 
-        for past_saved_state_dict in self.position_history:
-            past_board_tuple = tuple(map(tuple, past_saved_state_dict['board']))
-            past_comparable_state = (
-                past_board_tuple,
-                past_saved_state_dict['is_white_turn'],
-                past_saved_state_dict['white_kingside_castle'],
-                past_saved_state_dict['white_queenside_castle'],
-                past_saved_state_dict['black_kingside_castle'],
-                past_saved_state_dict['black_queenside_castle'],
-                past_saved_state_dict['en_passant_target']
-            )
-            if past_comparable_state == current_comparable_state:
-                occurrences += 1
-        
-        if occurrences >= 3:
+        # A position is repeated if the board, current turn, castling rights and en passant target are
+        # identical, which is exactly what the Zobrist hash covers
+        if self.repetition_counts.get(self.zobrist_hash, 0) >= 3:
             return "draw_threefold_repetition"
 
         return "ongoing"
\ No newline at end of file
@@ -0,0 +1,162 @@
+"""
+Move ordering for the alpha-beta search: the hash move first, then captures and promotions by MVV-LVA
+(most valuable victim, least valuable attacker), then the two killer moves of the ply, then quiet moves
+by their butterfly history score.
+
+Moves are scored from their packed bits plus one lookup of each end square on the 8x8 board;
+the low 12 bits of a move (start | end << 6) index the history table directly.
+
+order_moves sorts a complete move list. staged_moves yields the same order but generates the moves
+stage by stage, so a cut-off by the hash move, a capture or a killer skips generating quiet moves.
+"""
+from typing import Iterator
+from main import Board, Move, MOVE_FLAG_EN_PASSANT, MOVE_FLAG_PROMOTION, piece_helper
+
+
+HASH_MOVE_SCORE = 1 << 30
+CAPTURE_SCORE = 1 << 28
+KILLER_SCORES = [(1 << 27) + 1, 1 << 27]
+# History scores are halved whenever one would reach this, so they stay below the killer scores
+HISTORY_LIMIT = 1 << 26
+MAX_PLY = 128
+
+
+class MoveOrdering:
+    def __init__(self):
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [0] * 4096  # [start | end << 6] -> bonus from cut-offs by that quiet move
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def new_search(self):
+        """Forget the killers of the previous search and age the history scores."""
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [score >> 1 for score in self.history]
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def order_moves(self, board: Board, moves: list[Move], hash_move: Move | None, ply: int) -> list[Move]:
+        """
+        Sort moves best first.
+        Args:
+            board: The position the moves are legal in
+            moves: Legal moves to sort
+            hash_move: Best move stored in the transposition table for this position, or None
+            ply: Distance from the root, selecting the killer slots
+        Returns:
+            List of the same moves, best first
+        """
+        squares = board.board
+        history = self.history
+        killers = self.killers[ply] if ply < MAX_PLY else [None, None]
+        scored = []
+        for move in moves:
+            if move == hash_move:
+                score = HASH_MOVE_SCORE
+            else:
+                end_square = move >> 6 & 63
+                flag = move >> 12
+                victim = squares[end_square >> 3][end_square & 7]
+                if victim != piece_helper.empty or flag == MOVE_FLAG_EN_PASSANT or flag >= MOVE_FLAG_PROMOTION:
+                    score = capture_score(squares, move)
+                elif move == killers[0]:
+                    score = KILLER_SCORES[0]
+                elif move == killers[1]:
+                    score = KILLER_SCORES[1]
+                else:
+                    score = history[move & 0xFFF]
+            scored.append((score, move))
+        scored.sort(key=lambda pair: pair[0], reverse=True)
+        return [move for _, move in scored]
+
+    def staged_moves(self, board: Board, hash_move: Move | None, ply: int) -> Iterator[Move]:
+        """
+        Yield the legal moves in the order of order_moves, generating each stage only when it is reached:
+        the hash move, then captures and promotions, then the killers, then the other quiet moves.
+        The caller may make and undo moves between yields.
+        Args:
+            board: The position to generate moves in
+            hash_move: Best move stored in the transposition table for this position, or None
+            ply: Distance from the root, selecting the killer slots
+        Yields:
+            Legal moves, best first
+        """
+        if hash_move is not None and board.is_legal_move(hash_move):
+            yield hash_move
+        else:
+            hash_move = None
+
+        squares = board.board
+        captures = [(capture_score(squares, move), move) for move in board.get_legal_captures() if move != hash_move]
+        captures.sort(key=lambda pair: pair[0], reverse=True)
+        for _, move in captures:
+            yield move
+
+        # Killers are quiet moves from other positions at this ply; here they may be illegal or captures
+        killers = []
+        for killer in self.killers[ply] if ply < MAX_PLY else ():
+            if killer is not None and killer != hash_move:
+                end_square = killer >> 6 & 63
+                if squares[end_square >> 3][end_square & 7] == piece_helper.empty and board.is_legal_move(killer):
+                    killers.append(killer)
+        yield from killers
+
+        history = self.history
+        quiet_moves = [(history[move & 0xFFF], move) for move in board.generate_quiet_moves()
+                       if move != hash_move and move not in killers]
+        quiet_moves.sort(key=lambda pair: pair[0], reverse=True)
+        for _, move in quiet_moves:
+            yield move
+
+    def record_cutoff(self, board: Board, move: Move, depth: int, ply: int, move_index: int):
+        """
+        Learn from a beta cut-off: a quiet move becomes a killer for its ply and earns history.
+        Args:
+            board: The position the move was played in (with the move undone)
+            move: The move that caused the cut-off
+            depth: Remaining depth of the node
+            ply: Distance from the root
+            move_index: Position of the move in the searched order, 0 for the first
+        """
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+
+        end_square = move >> 6 & 63
+        if board.board[end_square >> 3][end_square & 7] != piece_helper.empty or move >> 12 != 0:
+            return  # Captures, promotions and special moves are ordered without killers or history
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+        history = self.history
+        index = move & 0xFFF
+        history[index] += depth * depth
+        if history[index] >= HISTORY_LIMIT:
+            self.history = [score >> 1 for score in history]
+
+    def stats(self) -> dict:
+        """
+        Returns:
+            dict: cutoffs, first_move_cutoffs and first_move_cutoff_rate (share of cut-offs made by the first move)
+        """
+        return {
+            "cutoffs": self.cutoffs,
+            "first_move_cutoffs": self.first_move_cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+        }
+
+
+def capture_score(squares: list[list[int]], move: Move) -> int:
+    """MVV-LVA score of a capture or promotion, above every quiet move score."""
+    start_square = move & 63
+    end_square = move >> 6 & 63
+    flag = move >> 12
+    attacker = squares[start_square >> 3][start_square & 7]
+    victim = squares[end_square >> 3][end_square & 7]
+    score = CAPTURE_SCORE + (abs(victim) or (flag == MOVE_FLAG_EN_PASSANT)) * 8 - abs(attacker)
+    if flag >= MOVE_FLAG_PROMOTION:
+        score += (flag - MOVE_FLAG_PROMOTION + 2) * 8
+    return score
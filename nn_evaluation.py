@@ -0,0 +1,202 @@
+"""
+Batched neural-network evaluation: encode many positions into one tensor and score them with a single
+forward pass, instead of one batch-of-one call per position.
+
+Networks take the FEATURE_COUNT inputs per position built by encoder.BoardEncoder and return one
+score per position, in the units the player expects from the network. A network trained on another
+input encoding cannot be batched this way; accepts_encoder_features tells the two apart by the width
+of the first linear layer. The encoder's buffer is handed
+to torch without copying. With an EvaluationCache, positions scored before (by Zobrist hash) are
+taken from the cache and only the rest go through the network.
+
+Measure positions/sec by batch size with a stand-in network (or a saved one):
+
+    python nn_evaluation.py --batch-sizes 1 32 256
+"""
+import argparse
+import numpy as np
+import torch
+from main import Board, Move
+from benchmark import POSITIONS, best_rate
+from encoder import BoardEncoder, FEATURE_COUNT
+from evaluation_cache import EvaluationCache
+
+
+def reference_model(hidden: int = 256) -> torch.nn.Module:
+    """A small untrained network with the expected input and output shapes, for benchmarks and tests."""
+    return torch.nn.Sequential(
+        torch.nn.Linear(FEATURE_COUNT, hidden), torch.nn.ReLU(),
+        torch.nn.Linear(hidden, 32), torch.nn.ReLU(),
+        torch.nn.Linear(32, 1),
+    )
+
+
+def input_width(model) -> int | None:
+    """Number of inputs of the model's first linear layer, or None if it is not a torch module with one."""
+    if isinstance(model, torch.nn.Module):
+        for module in model.modules():
+            if isinstance(module, torch.nn.Linear):
+                return module.in_features
+    return None
+
+
+def accepts_encoder_features(model) -> bool:
+    """True if the model takes the FEATURE_COUNT inputs built by encoder.BoardEncoder."""
+    return input_width(model) == FEATURE_COUNT
+
+
+class BatchEvaluator:
+    def __init__(self, model: torch.nn.Module, device: str = "cpu", max_batch: int = 256,
+                 cache: EvaluationCache = None):
+        """
+        Args:
+            model: Network mapping a (positions, FEATURE_COUNT) tensor to one score per position
+            device: Device to run the network on
+            max_batch: Batch size the encoder buffers are allocated for (they grow if needed)
+            cache: Optional cache of scores by Zobrist hash, consulted before and filled after each forward pass
+        """
+        if not accepts_encoder_features(model):
+            print(f"ERROR: model takes {input_width(model)} inputs, not the {FEATURE_COUNT} encoder features")
+        self.device = torch.device(device)
+        self.model = model.to(self.device).eval()
+        self.encoder = BoardEncoder(max_batch)
+        self.cache = cache
+        self.positions = 0
+        self.batches = 0
+
+    def evaluate_features(self, features: np.ndarray) -> torch.Tensor:
+        """
+        Score already encoded positions in one forward pass, without consulting the cache.
+        Args:
+            features: (positions, FEATURE_COUNT) float32 array, as built by encoder.BoardEncoder
+        Returns:
+            torch.Tensor: 1-D tensor of scores on the CPU, one per position
+        """
+        if len(features) == 0:
+            return torch.zeros(0)
+        with torch.inference_mode():
+            scores = self.model(torch.from_numpy(features).to(self.device))
+        self.positions += len(features)
+        self.batches += 1
+        return scores.reshape(-1).cpu()
+
+    def _lookup(self, board: Board, index: int, scores: list, misses: list) -> bool:
+        """Take the board's score from the cache into scores[index], or note it as a miss; True on a hit."""
+        key = board.zobrist_hash
+        score = self.cache.get(key)
+        if score is None:
+            misses.append((index, key))
+            return False
+        scores[index] = score
+        return True
+
+    def _forward_misses(self, scores: list, misses: list) -> torch.Tensor:
+        """Score the encoded cache misses, store them and return all scores as a tensor."""
+        computed = self.evaluate_features(self.encoder.encode()).tolist() if misses else []
+        for (index, key), score in zip(misses, computed):
+            scores[index] = score
+            self.cache.put(key, score)
+        return torch.tensor(scores, dtype=torch.float32)
+
+    def evaluate_positions(self, boards: list[Board]) -> torch.Tensor:
+        """
+        Score a list of boards with one forward pass.
+        Args:
+            boards: The positions
+        Returns:
+            torch.Tensor: 1-D tensor of scores on the CPU, one per position
+        """
+        if self.cache is None:
+            return self.evaluate_features(self.encoder.encode_boards(boards))
+        encoder = self.encoder
+        encoder.clear()
+        scores = [0.0] * len(boards)
+        misses = []
+        for index, board in enumerate(boards):
+            if not self._lookup(board, index, scores, misses):
+                encoder.add(board)
+        return self._forward_misses(scores, misses)
+
+    def evaluate_moves(self, board: Board, moves: list[Move]) -> torch.Tensor:
+        """
+        Score the position after each move with one forward pass.
+        Args:
+            board: The current position; it is left as it was found
+            moves: Legal moves in that position
+        Returns:
+            torch.Tensor: 1-D tensor with the score of each child position, in the order of moves
+        """
+        encoder = self.encoder
+        encoder.clear()
+        encoder.reserve(len(moves))
+        if self.cache is None:
+            for move in moves:
+                board.make_move(move)
+                encoder.add(board)
+                board.undo_move()
+            return self.evaluate_features(encoder.encode())
+        scores = [0.0] * len(moves)
+        misses = []
+        for index, move in enumerate(moves):
+            board.make_move(move)
+            if not self._lookup(board, index, scores, misses):
+                encoder.add(board)
+            board.undo_move()
+        return self._forward_misses(scores, misses)
+
+
+def sample_positions(count: int) -> list[Board]:
+    """The benchmark positions followed by their children and grandchildren, up to `count` boards."""
+    boards = [Board(fen) for fen, _, _ in POSITIONS.values()]
+    index = 0
+    while len(boards) < count and index < len(boards):
+        parent = boards[index]
+        for move in parent.get_all_legal_moves():
+            parent.make_move(move)
+            boards.append(Board(parent.get_fen()))
+            parent.undo_move()
+        index += 1
+    return boards[:count]
+
+
+def bench_batch_sizes(evaluator: BatchEvaluator, batch_sizes: list[int], positions: int = 256,
+                      repeats: int = 3) -> dict:
+    """
+    Score the same positions in batches of each size.
+    Args:
+        evaluator: The evaluator to measure
+        batch_sizes: Batch sizes to try
+        positions: Number of positions scored per run
+        repeats: Runs per batch size; the fastest counts
+    Returns:
+        dict: {batch size: positions per second, including encoding}
+    """
+    boards = sample_positions(positions)
+    results = {}
+    for batch_size in batch_sizes:
+        def run():
+            for start in range(0, len(boards), batch_size):
+                evaluator.evaluate_positions(boards[start:start + batch_size])
+        results[batch_size] = best_rate(run, len(boards), repeats)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure batched network evaluation speed on the CPU.")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256])
+    parser.add_argument("--positions", type=int, default=256, help="positions scored per run (default 256)")
+    parser.add_argument("--model", help="saved torch model to load instead of the stand-in network")
+    parser.add_argument("--threads", type=int, help="torch CPU threads")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    model = torch.load(args.model, map_location="cpu") if args.model else reference_model()
+    results = bench_batch_sizes(BatchEvaluator(model), args.batch_sizes, args.positions)
+    print(f"{'batch':>6}  {'positions/sec':>14}  {'speedup':>7}")
+    for batch_size, rate in results.items():
+        print(f"{batch_size:>6}  {rate:>14,.0f}  {rate / results[args.batch_sizes[0]]:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+NNUE-style evaluation: a network whose large first layer is kept up to date incrementally.
+
+The first layer (the feature transformer) sums one weight row per piece on a square, once from white's
+point of view and once from black's (own pieces in planes 0-5, the opponent's in 6-11, and squares
+mirrored for black). Both rows of a piece on a square are stored side by side, so an Accumulator
+attached to a board keeps both sums in one vector on a stack: make_move pushes the previous vector plus
+the row of the piece that arrived and minus the rows of the pieces that left (at most four rows), and
+undo_move pops. Only the small output layers run per evaluation:
+
+    side to move's sums, opponent's sums -> clipped ReLU -> dense (L1) -> clipped ReLU -> dense -> score
+
+The score is in centipawns from the side to move's point of view.
+
+Weights file (little-endian): magic b"NNUE", version, hidden size H, L1 size (uint32 each), then float32
+arrays: feature weights (768 x H), feature bias (H), L1 weights (2H x L1), L1 bias (L1), output weights
+(L1), output bias (1).
+
+Network.quantize() gives the int16 path: feature weights and accumulators in int16 scaled by QA and
+L1 weights scaled by QB, as in engines that run NNUE with integer SIMD.
+
+    python nnue.py --weights net.nnue     # compare incremental and full evaluation speed
+"""
+import argparse
+import struct
+import time
+import numpy as np
+from main import Board, MOVE_FLAG_EN_PASSANT, MOVE_FLAG_KINGSIDE_CASTLE, MOVE_FLAG_QUEENSIDE_CASTLE
+from alpha_beta_player import AlphaBetaPlayer, MAX_DEPTH
+from timer import Timer
+from transposition_table import DEFAULT_SIZE_MB
+
+
+FEATURES = 12 * 64
+WEIGHTS_MAGIC = b"NNUE"
+WEIGHTS_VERSION = 1
+_HEADER = struct.Struct("<4sIII")  # magic, version, hidden size, L1 size
+
+QA = 255  # Scale of the quantized feature transformer; an accumulator of QA is a clipped 1.0
+QB = 64   # Scale of the quantized L1 weights
+ACCUMULATOR_STACK = 128  # Initial number of stacked accumulators; the stack grows with the game
+
+# [perspective][piece + 6][square] -> feature index, perspective 0 for white and 1 for black
+FEATURE_INDEX = [[[0] * 64 for _ in range(13)] for _ in range(2)]
+for _piece in range(-6, 7):
+    if _piece == 0:
+        continue
+    for _square in range(64):
+        FEATURE_INDEX[0][_piece + 6][_square] = ((_piece - 1) if _piece > 0 else (-_piece + 5)) * 64 + _square
+        FEATURE_INDEX[1][_piece + 6][_square] = ((-_piece - 1) if _piece < 0 else (_piece + 5)) * 64 + (_square ^ 56)
+
+
+def piece_square_indices(board: Board) -> list[int]:
+    """(piece + 6) * 64 + square of every piece on the board, the rows of Network.piece_square_rows it sums."""
+    squares = board.board
+    return [(squares[square >> 3][square & 7] + 6) * 64 + square
+            for square in board.piece_squares[True] | board.piece_squares[False]]
+
+
+class Network:
+    def __init__(self, feature_weights: np.ndarray, feature_bias: np.ndarray, l1_weights: np.ndarray,
+                 l1_bias: np.ndarray, output_weights: np.ndarray, output_bias: float):
+        self.feature_weights = feature_weights.astype(np.float32)  # (768, H), one row per feature
+        self.feature_bias = feature_bias.astype(np.float32)        # (H,)
+        self.l1_weights = l1_weights.astype(np.float32)            # (2H, L1), side to move's half first
+        self.l1_bias = l1_bias.astype(np.float32)                  # (L1,)
+        self.output_weights = output_weights.astype(np.float32)    # (L1,)
+        self.output_bias = float(output_bias)
+        self.hidden = self.feature_bias.shape[0]
+        self._prepare(self.feature_weights, self.feature_bias, self.l1_weights, np.float32)
+
+    def _prepare(self, feature_weights: np.ndarray, feature_bias: np.ndarray, l1_weights: np.ndarray, l1_type: type):
+        """Lay out the weights for incremental use."""
+        hidden = self.hidden
+        self.dtype = feature_weights.dtype
+        # Accumulators hold white's sums then black's, so one piece on one square is one row of 2H to add
+        self.piece_square_rows = np.zeros((13 * 64, 2 * hidden), dtype=self.dtype)
+        for piece in range(-6, 7):
+            if piece:
+                for square in range(64):
+                    row = self.piece_square_rows[(piece + 6) * 64 + square]
+                    row[:hidden] = feature_weights[FEATURE_INDEX[0][piece + 6][square]]
+                    row[hidden:] = feature_weights[FEATURE_INDEX[1][piece + 6][square]]
+        self.accumulator_bias = np.concatenate((feature_bias, feature_bias))
+        # L1 weights for each side to move, so the accumulator never has to be reordered
+        self.l1_for_side = {True: l1_weights.astype(l1_type),
+                            False: np.concatenate((l1_weights[hidden:], l1_weights[:hidden])).astype(l1_type)}
+        self._hidden = np.empty(2 * hidden, dtype=l1_type)
+
+    @classmethod
+    def random(cls, hidden: int = 128, l1: int = 32, seed: int = 0) -> "Network":
+        """An untrained network with plausible weight ranges, for tests and benchmarks."""
+        rng = np.random.default_rng(seed)
+        return cls(rng.normal(0, 0.1, (FEATURES, hidden)), rng.normal(0.3, 0.1, hidden),
+                   rng.normal(0, (2 * hidden) ** -0.5, (2 * hidden, l1)), rng.normal(0, 0.1, l1),
+                   rng.normal(0, 100, l1), rng.normal(0, 10))
+
+    @classmethod
+    def load(cls, path: str) -> "Network | None":
+        """
+        Read a weights file.
+        Args:
+            path: File written by save
+        Returns:
+            Network, or None if the file is not a weights file
+        """
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < _HEADER.size:
+            print(f"ERROR: {path} is too short to be an NNUE weights file")
+            return None
+        magic, version, hidden, l1 = _HEADER.unpack_from(data)
+        if magic != WEIGHTS_MAGIC or version != WEIGHTS_VERSION:
+            print(f"ERROR: {path} is not a version {WEIGHTS_VERSION} NNUE weights file")
+            return None
+        shapes = [(FEATURES, hidden), (hidden,), (2 * hidden, l1), (l1,), (l1,), (1,)]
+        expected = _HEADER.size + 4 * sum(int(np.prod(shape)) for shape in shapes)
+        if len(data) != expected:
+            print(f"ERROR: {path} is {len(data)} bytes, expected {expected} for H={hidden}, L1={l1}")
+            return None
+        arrays = []
+        offset = _HEADER.size
+        for shape in shapes:
+            count = int(np.prod(shape))
+            arrays.append(np.frombuffer(data, dtype="<f4", count=count, offset=offset).reshape(shape))
+            offset += 4 * count
+        return cls(*arrays[:5], arrays[5][0])
+
+    def save(self, path: str):
+        """Write the weights in the format read by load."""
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(WEIGHTS_MAGIC, WEIGHTS_VERSION, self.hidden, self.l1_bias.shape[0]))
+            for array in (self.feature_weights, self.feature_bias, self.l1_weights, self.l1_bias,
+                          self.output_weights, np.array([self.output_bias])):
+                f.write(array.astype("<f4").tobytes())
+
+    def quantize(self) -> "QuantizedNetwork":
+        return QuantizedNetwork(self)
+
+    def accumulate(self, indices: list[int]) -> np.ndarray:
+        """
+        Feature sums from scratch.
+        Args:
+            indices: Pieces on the board, as returned by piece_square_indices
+        Returns:
+            np.ndarray: (2H,) sums, white's point of view then black's
+        """
+        return self.accumulator_bias + self.piece_square_rows[indices].sum(axis=0, dtype=self.dtype)
+
+    def output(self, accumulator: np.ndarray, white_to_move: bool) -> float:
+        """
+        Run the output layers.
+        Args:
+            accumulator: (2H,) feature sums, white's point of view then black's
+            white_to_move: Side to move
+        Returns:
+            float: Score in centipawns from the side to move's point of view
+        """
+        hidden = self._hidden
+        np.maximum(accumulator, 0, out=hidden)
+        np.minimum(hidden, 1, out=hidden)
+        l1 = hidden @ self.l1_for_side[white_to_move]
+        l1 += self.l1_bias
+        np.maximum(l1, 0, out=l1)
+        np.minimum(l1, 1, out=l1)
+        return float(l1 @ self.output_weights) + self.output_bias
+
+    def evaluate(self, board: Board) -> float:
+        """Reference evaluation that builds the accumulator from scratch."""
+        return self.output(self.accumulate(piece_square_indices(board)), board.is_white_turn)
+
+
+class QuantizedNetwork(Network):
+    """
+    The int16 path: feature rows and accumulators in int16 scaled by QA, L1 weights scaled by QB.
+    The L1 sums are integers; they are computed in float64, which holds them exactly, because NumPy's
+    integer matrix product does not use BLAS.
+    """
+
+    def __init__(self, network: Network):
+        self.feature_weights = network.feature_weights
+        self.feature_bias = network.feature_bias
+        self.l1_weights = network.l1_weights
+        self.output_weights = network.output_weights
+        self.output_bias = network.output_bias
+        self.hidden = network.hidden
+        self.l1_bias = np.round(network.l1_bias * QA * QB)
+        self._prepare(_to_int16(network.feature_weights * QA), _to_int16(network.feature_bias * QA),
+                      _to_int16(network.l1_weights * QB), np.float64)
+
+    def quantize(self) -> "QuantizedNetwork":
+        return self
+
+    def output(self, accumulator: np.ndarray, white_to_move: bool) -> float:
+        hidden = self._hidden
+        np.maximum(accumulator, 0, out=hidden)
+        np.minimum(hidden, QA, out=hidden)
+        l1 = hidden @ self.l1_for_side[white_to_move]
+        l1 += self.l1_bias
+        np.maximum(l1, 0, out=l1)
+        np.minimum(l1, QA * QB, out=l1)
+        return float(l1 @ self.output_weights) / (QA * QB) + self.output_bias
+
+
+def _to_int16(array: np.ndarray) -> np.ndarray:
+    rounded = np.round(array)
+    if rounded.min() < -32768 or rounded.max() > 32767:
+        print("ERROR: weights out of int16 range after quantization, clipping")
+    return np.clip(rounded, -32768, 32767).astype(np.int16)
+
+
+class Accumulator:
+    """Stack of feature sums following a board through make_move and undo_move."""
+
+    def __init__(self, network: Network, board: Board):
+        """
+        Attach to a board and build the sums of its current position.
+        Args:
+            network: The network (float or quantized) whose feature transformer to apply
+            board: The board; from now on its make_move and undo_move update this accumulator
+        """
+        self.network = network
+        self.rows = network.piece_square_rows
+        self.stack = np.empty((ACCUMULATOR_STACK, 2 * network.hidden), dtype=network.dtype)
+        self.top = 0
+        self.stack[0] = network.accumulate(piece_square_indices(board))
+        board.accumulator = self
+
+    def detach(self, board: Board):
+        """Stop following the board."""
+        if board.accumulator is self:
+            board.accumulator = None
+
+    def push(self, board: Board):
+        """Add the last move of the board; called by make_move after the move is on the board."""
+        record = board.position_history[-1]
+        move = record.move
+        start_square = move & 63
+        end_square = move >> 6 & 63
+        flag = move >> 12
+        squares = board.board
+        rows = self.rows
+
+        top = self.top + 1
+        if top == len(self.stack):
+            self.stack = np.concatenate((self.stack, np.empty_like(self.stack)))
+        accumulator = self.stack[top]
+        self.top = top
+
+        # The arriving piece (which may be a promotion) in, the moving piece out
+        np.add(self.stack[top - 1], rows[(squares[end_square >> 3][end_square & 7] + 6) * 64 + end_square], out=accumulator)
+        np.subtract(accumulator, rows[(record.moved_piece + 6) * 64 + start_square], out=accumulator)
+        if record.captured_piece:
+            captured_square = (start_square & 56) | (end_square & 7) if flag == MOVE_FLAG_EN_PASSANT else end_square
+            np.subtract(accumulator, rows[(record.captured_piece + 6) * 64 + captured_square], out=accumulator)
+        elif flag == MOVE_FLAG_KINGSIDE_CASTLE or flag == MOVE_FLAG_QUEENSIDE_CASTLE:
+            rank = start_square & 56
+            rook_from, rook_to = (rank | 7, end_square - 1) if flag == MOVE_FLAG_KINGSIDE_CASTLE else (rank, end_square + 1)
+            rook = squares[rook_to >> 3][rook_to & 7] + 6
+            np.add(accumulator, rows[rook * 64 + rook_to], out=accumulator)
+            np.subtract(accumulator, rows[rook * 64 + rook_from], out=accumulator)
+
+    def pop(self):
+        """Drop the last move; called by undo_move."""
+        self.top -= 1
+
+    def evaluate(self, board: Board) -> float:
+        """Score of the board's current position from the side to move's point of view."""
+        return self.network.output(self.stack[self.top], board.is_white_turn)
+
+
+class NNUEPlayer(AlphaBetaPlayer):
+    def __init__(self, weights_path: str, quantized: bool = True, max_depth: int = MAX_DEPTH,
+                 hash_size_mb: float = DEFAULT_SIZE_MB, book_path: str = None):
+        """
+        Args:
+            weights_path: NNUE weights file
+            quantized: Use the int16 path
+            max_depth: Deepest iteration to search
+            hash_size_mb: Size of the transposition table in megabytes
+            book_path: Polyglot opening book to play from (default: DEFAULT_BOOK_PATH if it exists, "" for none)
+        """
+        super().__init__(max_depth, hash_size_mb, book_path)
+        self.name = "NNUE Player"
+        self.network = Network.load(weights_path)
+        if self.network is not None and quantized:
+            self.network = self.network.quantize()
+
+    def think(self, board: Board, timer: Timer):
+        if self.network is None:
+            return super().think(board, timer)
+        accumulator = Accumulator(self.network, board)
+        try:
+            return super().think(board, timer)
+        finally:
+            accumulator.detach(board)
+
+    def evaluate(self, board: Board) -> int:
+        """Network score from the accumulator the board carries during think, or the board's own evaluation."""
+        if board.accumulator is None:
+            return board.evaluate()
+        return int(board.accumulator.evaluate(board))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare incremental and full NNUE evaluation speed.")
+    parser.add_argument("--weights", help="weights file (default: a random network)")
+    parser.add_argument("--fen", default="r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    network = Network.load(args.weights) if args.weights else Network.random()
+    if network is None:
+        return
+    board = Board(args.fen)
+    moves = board.get_all_legal_moves()
+    for name, net in [("float32", network), ("int16", network.quantize())]:
+        accumulator = Accumulator(net, board)
+        start_time = time.perf_counter()
+        for _ in range(args.rounds):
+            for move in moves:
+                board.make_move(move)
+                accumulator.evaluate(board)
+                board.undo_move()
+        incremental = (time.perf_counter() - start_time) / (args.rounds * len(moves))
+        accumulator.detach(board)
+
+        start_time = time.perf_counter()
+        for _ in range(args.rounds):
+            for move in moves:
+                board.make_move(move)
+                net.evaluate(board)
+                board.undo_move()
+        full = (time.perf_counter() - start_time) / (args.rounds * len(moves))
+        print(f"{name:>8}: make + evaluate + undo {incremental * 1e6:7.1f} us incremental, {full * 1e6:7.1f} us full")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Reader for Polyglot opening books (.bin).
+
+A book is a file of 16-byte big-endian entries sorted by position key:
+
+    key (8 bytes)  move (2 bytes)  weight (2 bytes)  learn (4 bytes)
+
+The file is memory-mapped and binary-searched by key, so opening even a large book reads nothing up
+front and a lookup touches only a few pages. The board's Zobrist keys are the Polyglot keys, so the
+position key is the board's running hash, except that Polyglot only hashes the en passant file when
+a pawn can actually make the capture.
+
+A move packs to file, to rank, from file and from rank in three bits each (a1 = 0), then the
+promotion piece (1 knight .. 4 queen); castling is written as the king taking its own rook.
+"""
+import mmap
+import os
+import random
+import struct
+from main import (Board, Move, piece_helper, ZOBRIST_EN_PASSANT, MOVE_FLAG_KINGSIDE_CASTLE,
+                  MOVE_FLAG_QUEENSIDE_CASTLE, MOVE_FLAG_PROMOTION)
+
+
+ENTRY_SIZE = 16
+_ENTRY = struct.Struct(">QHHI")
+_KEY = struct.Struct(">Q")
+
+
+def polyglot_key(board: Board) -> int:
+    """
+    Polyglot key of a position.
+    Args:
+        board: The position
+    Returns:
+        int: The board's Zobrist hash without the en passant file if no pawn can capture en passant
+    """
+    key = board.get_zobrist_hash()
+    if board.en_passant_target is not None:
+        row, col = board.en_passant_target
+        if board.is_white_turn:
+            pawn, pawn_row = piece_helper.white_pawn, row + 1
+        else:
+            pawn, pawn_row = piece_helper.black_pawn, row - 1
+        if not any(0 <= pawn_col < 8 and board.board[pawn_row][pawn_col] == pawn for pawn_col in (col - 1, col + 1)):
+            key ^= ZOBRIST_EN_PASSANT[col]
+    return key
+
+
+def polyglot_move(move: Move) -> int:
+    """
+    Encode a move the way Polyglot books store it.
+    Args:
+        move: The move
+    Returns:
+        int: The 16-bit Polyglot move
+    """
+    start_square = move & 63
+    end_square = move >> 6 & 63
+    flag = move >> 12
+    if flag == MOVE_FLAG_KINGSIDE_CASTLE:
+        end_square += 1  # King takes the h-file rook
+    elif flag == MOVE_FLAG_QUEENSIDE_CASTLE:
+        end_square -= 2  # King takes the a-file rook
+    promotion = flag - MOVE_FLAG_PROMOTION + 1 if flag >= MOVE_FLAG_PROMOTION else 0
+    # Polyglot numbers squares from a1, the board from a8
+    return (end_square ^ 56) | (start_square ^ 56) << 6 | promotion << 12
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        """
+        Open a Polyglot book.
+        Args:
+            path: Path of the .bin file; a missing or empty file gives an empty book
+        """
+        self.path = path
+        self.entries = 0
+        self._file = None
+        self._data = None
+        if not os.path.exists(path):
+            print(f"ERROR: opening book {path} not found")
+            return
+        size = os.path.getsize(path)
+        if size % ENTRY_SIZE:
+            print(f"ERROR: opening book {path} is {size} bytes, not a whole number of {ENTRY_SIZE}-byte entries")
+        self.entries = size // ENTRY_SIZE
+        if self.entries:
+            self._file = open(path, "rb")
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._file.close()
+            self._data = self._file = None
+            self.entries = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.entries
+
+    def find_entries(self, key: int) -> list[tuple[int, int]]:
+        """
+        All book entries of a position.
+        Args:
+            key: Polyglot key of the position
+        Returns:
+            List of (Polyglot move, weight), in book order
+        """
+        data = self._data
+        low, high = 0, self.entries
+        while low < high:
+            middle = (low + high) // 2
+            if _KEY.unpack_from(data, middle * ENTRY_SIZE)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = []
+        for index in range(low, self.entries):
+            entry_key, move, weight, _ = _ENTRY.unpack_from(data, index * ENTRY_SIZE)
+            if entry_key != key:
+                break
+            entries.append((move, weight))
+        return entries
+
+    def get_moves(self, board: Board) -> list[tuple[Move, int]]:
+        """
+        Book moves of a position.
+        Args:
+            board: The position
+        Returns:
+            List of (legal move, weight), heaviest first; book moves that are not legal are skipped
+        """
+        entries = self.find_entries(polyglot_key(board)) if self.entries else []
+        if not entries:
+            return []
+        legal_moves = {polyglot_move(move): move for move in board.get_all_legal_moves()}
+        moves = [(legal_moves[move], weight) for move, weight in entries if move in legal_moves]
+        moves.sort(key=lambda pair: pair[1], reverse=True)
+        return moves
+
+    def choose_move(self, board: Board, weighted_random: bool = False) -> Move | None:
+        """
+        Pick a book move.
+        Args:
+            board: The position
+            weighted_random: Pick at random in proportion to the weights instead of the heaviest move
+        Returns:
+            Move: The book move, or None if the position is not in the book
+        """
+        moves = self.get_moves(board)
+        if not moves:
+            return None
+        if weighted_random and sum(weight for _, weight in moves) > 0:
+            return random.choices([move for move, _ in moves], weights=[weight for _, weight in moves])[0]
+        return moves[0][0]
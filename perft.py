@@ -0,0 +1,142 @@
+"""
+Perft: count the leaf nodes of the legal move tree to a fixed depth, to check move generation
+against known counts and to time it.
+
+    python perft.py 5
+    python perft.py 4 --fen "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1" --divide
+    python perft.py 5 --hash --processes 4 --bitboards
+"""
+import argparse
+import os
+import time
+from multiprocessing import Pool
+from main import Board, Move, piece_helper
+from bitboard import BitboardBoard
+
+
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# Per-process hash table used by pool workers, created by _init_worker
+_worker_hash_table = None
+
+
+def perft(board: Board, depth: int, hash_table: dict = None) -> int:
+    """
+    Count the positions reachable in exactly `depth` plies.
+    Args:
+        board: The board to count from; it is returned to the same position afterwards
+        depth: How many plies deep to count
+        hash_table: Optional dict to remember subtree counts by position and depth
+    Returns:
+        int: Number of leaf positions
+    """
+    if depth == 0:
+        return 1
+    moves = board.get_all_legal_moves()
+    # Every legal move at the last ply is one leaf, so there is no need to make them
+    if depth == 1:
+        return len(moves)
+
+    if hash_table is not None:
+        # The Zobrist hash covers pieces, side to move, castling and en passant; depth sits in the low byte
+        key = board.zobrist_hash << 8 | depth
+        count = hash_table.get(key)
+        if count is not None:
+            return count
+
+    count = 0
+    for move in moves:
+        board.make_move(move)
+        count += perft(board, depth - 1, hash_table)
+        board.undo_move()
+
+    if hash_table is not None:
+        hash_table[key] = count
+    return count
+
+
+def divide(board: Board, depth: int, hash_table: dict = None, processes: int = 1) -> dict[Move, int]:
+    """
+    Count the leaf positions below each root move separately.
+    Args:
+        board: The board to count from
+        depth: How many plies deep to count, including the root move
+        hash_table: Optional dict to remember subtree counts (per worker when processes > 1)
+        processes: Number of worker processes to split the root moves across
+    Returns:
+        dict: {root move: number of leaf positions below it}
+    """
+    if depth < 1:
+        print(f"ERROR: divide called with invalid depth: {depth}")
+        return {}
+    moves = board.get_all_legal_moves()
+
+    if processes > 1:
+        fen = board.get_fen()
+        tasks = [(type(board), fen, move, depth - 1) for move in moves]
+        with Pool(processes, initializer=_init_worker, initargs=(hash_table is not None,)) as pool:
+            counts = pool.map(_perft_root_move, tasks, chunksize=1)
+        return dict(zip(moves, counts))
+
+    counts = {}
+    for move in moves:
+        board.make_move(move)
+        counts[move] = perft(board, depth - 1, hash_table)
+        board.undo_move()
+    return counts
+
+
+def _init_worker(use_hash: bool):
+    global _worker_hash_table
+    _worker_hash_table = {} if use_hash else None
+
+
+def _perft_root_move(task: tuple) -> int:
+    board_class, fen, move, depth = task
+    board = board_class(fen)
+    board.make_move(move)
+    return perft(board, depth, _worker_hash_table)
+
+
+def move_label(move: Move) -> str:
+    """Printable move with the promotion piece appended, so promotions stay distinct in divide output."""
+    label = move.get_printable()
+    if move.promotion_piece is not None:
+        label += "=" + "NBRQ"[abs(move.promotion_piece) - piece_helper.white_knight]
+    return label
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count and time legal move generation.")
+    parser.add_argument("depth", type=int, nargs="?", default=4, help="plies to search (default 4)")
+    parser.add_argument("--fen", default=STARTING_FEN, help="position to search from")
+    parser.add_argument("--divide", action="store_true", help="print the count below every root move")
+    parser.add_argument("--hash", action="store_true", help="cache subtree counts by Zobrist hash and depth")
+    parser.add_argument("--processes", type=int, default=1,
+                        help=f"split root moves across this many processes (this machine has {os.cpu_count()} cores)")
+    parser.add_argument("--bitboards", action="store_true", help="use BitboardBoard instead of Board")
+    args = parser.parse_args()
+
+    board = (BitboardBoard if args.bitboards else Board)(args.fen)
+    hash_table = {} if args.hash else None
+
+    start_time = time.perf_counter()
+    if args.divide or args.processes > 1:
+        counts = divide(board, args.depth, hash_table, args.processes)
+        nodes = sum(counts.values())
+    else:
+        counts = None
+        nodes = perft(board, args.depth, hash_table)
+    elapsed = time.perf_counter() - start_time
+
+    if args.divide:
+        for move in sorted(counts, key=move_label):
+            print(f"{move_label(move)}: {counts[move]}")
+        print()
+    print(f"Nodes: {nodes}")
+    print(f"Time: {elapsed:.3f}s")
+    print(f"Nodes/sec: {nodes / elapsed if elapsed > 0 else 0:.0f}")
+
+
+if __name__ == "__main__":
+    main()
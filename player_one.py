@@ -1,8 +1,12 @@
+import torch
 from main import Board
 from timer import Timer
 from main import Move
 from train_model import load_model
 from default_player import DefaultPlayer
+from nn_evaluation import BatchEvaluator, accepts_encoder_features, input_width
+from encoder import FEATURE_COUNT
+from evaluation_cache import EvaluationCache
 
 
 class PlayerOne(DefaultPlayer):
@@ -13,31 +17,62 @@ class PlayerOne(DefaultPlayer):
 
         self.model = load_model('chess_evaluator_best.pth')
         print("Neural network model loaded successfully!")
+        # Scores stay cached across moves and games, keyed by the board's Zobrist hash
+        self.cache = EvaluationCache()
+        # Batching feeds the model encoder.BoardEncoder features; a model trained on another input
+        # keeps scoring one position at a time through its own evaluate_position
+        if accepts_encoder_features(self.model):
+            self.evaluator = BatchEvaluator(self.model, cache=self.cache)
+        else:
+            self.evaluator = None
+            print(f"Model takes {input_width(self.model)} inputs, not the {FEATURE_COUNT} batch encoder features; "
+                  f"evaluating positions one at a time")
+
+    def save_cache(self, path: str) -> int:
+        """Save the evaluation cache, see EvaluationCache.save."""
+        return self.cache.save(path)
+
+    def load_cache(self, path: str) -> int:
+        """Warm-start the evaluation cache from a file written by save_cache."""
+        return self.cache.load(path)
+
+    def evaluate_moves(self, board: Board, moves: list[Move]) -> torch.Tensor:
+        """
+        Score the position after each move, in one forward pass if the model takes the encoder's features.
+        Args:
+            board: The current position; it is left as it was found
+            moves: Legal moves in that position
+        Returns:
+            torch.Tensor: 1-D tensor with the score of each child position, in the order of moves
+        """
+        if self.evaluator is not None:
+            return self.evaluator.evaluate_moves(board, moves)
+        scores = []
+        for move in moves:
+            board.make_move(move)
+            key = board.zobrist_hash
+            score = self.cache.get(key)
+            if score is None:
+                score = float(self.model.evaluate_position(board))
+                self.cache.put(key, score)
+            scores.append(score)
+            board.undo_move()
+        return torch.tensor(scores)
 
     def think(self, board: Board, timer: Timer) -> Move:
         # Get all legal moves
         legal_moves = board.get_all_legal_moves()
-        best_eval = float('inf') if board.is_white_turn else float('-inf')
-        
-        # Evaluate each move
-        for move in legal_moves:
-            # Create a copy of the board and make the move
-            board.make_move(move)
-            # Get evaluation from neural network
-            eval_cp = self.model.evaluate_position(board)
 
-            board.undo_move()
-            
-            # Choose the best move based on side to move
-            if board.is_white_turn:
-                if eval_cp < best_eval:
-                    best_eval = eval_cp
-                    best_move = move
-            else:
-                if eval_cp > best_eval:
-                    best_eval = eval_cp
-                    best_move = move
-        
+        # Evaluate every child position
+        evals = self.evaluate_moves(board, legal_moves)
+
+        # Choose the best move based on side to move
+        best_index = int(evals.argmin()) if board.is_white_turn else int(evals.argmax())
+        best_eval = float(evals[best_index])
+        best_move = legal_moves[best_index]
+
         print(f"Chosen move evaluation: {-best_eval/100:.2f} pawns")
+        stats = self.cache.stats()
+        print(f"eval cache hit rate {stats['hit_rate']:.1%}  entries {stats['entries']}  "
+              f"evictions {stats['evictions']}  memory {stats['memory_mb']:.1f} MB")
         return best_move
-
@@ -2,12 +2,14 @@ from PyQt6.QtWidgets import QApplication
 import sys
 from UI import ChessUI
 from main import Board, Move
+from bitboard import BitboardBoard
 from timer import Timer
-from settings import TURN_TIME_MS, INCREMENT_MS
+from settings import TURN_TIME_MS, INCREMENT_MS, USE_BITBOARDS, SEARCH_CACHE_DIR
 from default_player import DefaultPlayer
 from player_one import PlayerOne
 from player_two import PlayerTwo
 import time
+import os
 
 
 def play_game(board: Board, timer: Timer, white_player: DefaultPlayer, black_player: DefaultPlayer, window: ChessUI) -> str:
@@ -36,6 +38,10 @@ def play_game(board: Board, timer: Timer, white_player: DefaultPlayer, black_pla
         if game_state != "ongoing":
             return game_state
 
+def cache_path(player: DefaultPlayer) -> str:
+    """File in SEARCH_CACHE_DIR holding a player's search cache"""
+    return os.path.join(SEARCH_CACHE_DIR, player.name.replace(" ", "_") + ".cache")
+
 def main():
     # Create the application
     app = QApplication(sys.argv)
@@ -43,6 +49,14 @@ def main():
     # Initialize players
     player_one = PlayerOne()
     player_two = PlayerTwo()
+
+    # Warm-start the players from the caches of earlier runs
+    if SEARCH_CACHE_DIR is not None:
+        os.makedirs(SEARCH_CACHE_DIR, exist_ok=True)
+        for player in [player_one, player_two]:
+            loaded = player.load_cache(cache_path(player))
+            if loaded:
+                print(f"{player.name}: loaded {loaded} cached entries")
     
     # Initialize score tracking
     scores = {
@@ -63,7 +77,7 @@ def main():
     for fen in positions:
         for reverse_players in [False, True]:
             # Initialize game components
-            board = Board()
+            board = BitboardBoard(fen) if USE_BITBOARDS else Board(fen)
                 
             timer = Timer(TURN_TIME_MS, INCREMENT_MS)
             
@@ -86,6 +100,11 @@ def main():
                 scores["Draws"] += 1
                 print(f"Game Over: Draw by {result}!")
             
+            # Keep what the players searched for the next game and the next run
+            if SEARCH_CACHE_DIR is not None:
+                for player in [player_one, player_two]:
+                    player.save_cache(cache_path(player))
+
             # Print current scores
             print("\nCurrent Scores:")
             for player, score in scores.items():
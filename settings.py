@@ -3,3 +3,9 @@
 # Timer settings (in milliseconds)
 TURN_TIME_MS = 180000  # 3 minutes per side
 INCREMENT_MS = 0       # No increment
+
+# Board backend: False for the 8x8 list board, True for the bitboard board
+USE_BITBOARDS = False
+
+# Directory where players keep their search caches between games and runs (None to start cold every game)
+SEARCH_CACHE_DIR = "search_cache"
@@ -0,0 +1,185 @@
+"""
+Precomputed move and attack tables, indexed by square (row * 8 + col, so 0 is a8 and 63 is h1).
+The bitboard masks are built once at import (or read back from tables.bin next to this module
+when USE_TABLE_CACHE is set); the square lists used by the 8x8 board and the sliding attack lookups
+are derived from the masks.
+"""
+import os
+from array import array
+
+
+# Set to True to read the masks from (and write them to) the cache file instead of rebuilding them on import
+USE_TABLE_CACHE = False
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tables.bin")
+_CACHE_VERSION = 1
+
+WHITE = 0
+BLACK = 1
+
+KNIGHT_OFFSETS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+# Ray directions as (row_direction, col_direction): rook directions first, then bishop directions
+DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+ROOK_DIRECTIONS = range(0, 4)
+BISHOP_DIRECTIONS = range(4, 8)
+# A direction is "positive" if stepping along it increases the square index
+POSITIVE_DIRECTION = [row_direction * 8 + col_direction > 0 for row_direction, col_direction in DIRECTIONS]
+
+# Bitboard masks
+KNIGHT_ATTACKS = [0] * 64
+KING_ATTACKS = [0] * 64
+PAWN_ATTACKS = [[0] * 64, [0] * 64]    # [color][square] -> squares attacked by a pawn of that color
+RAYS = [[0] * 64 for _ in DIRECTIONS]  # [direction][square] -> every square along the ray, excluding the start
+BETWEEN = [0] * (64 * 64)              # [a * 64 + b] -> squares strictly between a and b if they share a line
+LINE = [0] * (64 * 64)                 # [a * 64 + b] -> the whole rank, file or diagonal through a and b
+
+# Square lists for the 8x8 board, in the same order as the masks above
+KNIGHT_TARGETS = [[] for _ in range(64)]
+KING_TARGETS = [[] for _ in range(64)]
+PAWN_ATTACK_TARGETS = [[[] for _ in range(64)], [[] for _ in range(64)]]
+RAY_TARGETS = [[[] for _ in DIRECTIONS] for _ in range(64)]  # [square][direction] -> squares, nearest first
+
+# Sliding attacks along one line (a pair of opposite directions), looked up by the pieces standing on it:
+# [line][square] -> the squares of the line whose occupancy matters (the far ends never do),
+# and a dict {occupied & that mask: squares attacked along the line}
+LINE_DIRECTIONS = [(0, 1), (2, 3), (4, 7), (5, 6)]  # file, rank, diagonal, anti-diagonal
+LINE_BLOCKER_MASKS = [[0] * 64 for _ in LINE_DIRECTIONS]
+LINE_ATTACKS = [[{} for _ in range(64)] for _ in LINE_DIRECTIONS]
+
+# Castling, in the order of the rights bits (white kingside, white queenside, black kingside, black queenside):
+# the king's square and destination, the squares that must be empty and the squares the king crosses,
+# which must not be attacked
+CASTLING_KING_SQUARES = [(60, 62), (60, 58), (4, 6), (4, 2)]
+CASTLING_EMPTY_SQUARES = [[61, 62], [57, 58, 59], [5, 6], [1, 2, 3]]
+CASTLING_SAFE_SQUARES = [[61, 62], [59, 58], [5, 6], [3, 2]]
+CASTLING_EMPTY_MASKS = [sum(1 << square for square in squares) for squares in CASTLING_EMPTY_SQUARES]
+
+
+def squares_of(bitboard: int) -> list[int]:
+    """List the index of every set bit, lowest first."""
+    squares = []
+    while bitboard:
+        lowest = bitboard & -bitboard
+        squares.append(lowest.bit_length() - 1)
+        bitboard ^= lowest
+    return squares
+
+
+def _build_masks():
+    for row in range(8):
+        for col in range(8):
+            square = row * 8 + col
+
+            for row_direction, col_direction in KNIGHT_OFFSETS:
+                new_row, new_col = row + row_direction, col + col_direction
+                if 0 <= new_row < 8 and 0 <= new_col < 8:
+                    KNIGHT_ATTACKS[square] |= 1 << (new_row * 8 + new_col)
+
+            for direction, (row_direction, col_direction) in enumerate(DIRECTIONS):
+                new_row, new_col = row + row_direction, col + col_direction
+                if 0 <= new_row < 8 and 0 <= new_col < 8:
+                    KING_ATTACKS[square] |= 1 << (new_row * 8 + new_col)
+                between = 0
+                while 0 <= new_row < 8 and 0 <= new_col < 8:
+                    target = new_row * 8 + new_col
+                    RAYS[direction][square] |= 1 << target
+                    BETWEEN[square * 64 + target] = between
+                    between |= 1 << target
+                    new_row, new_col = new_row + row_direction, new_col + col_direction
+
+            for col_direction in [-1, 1]:
+                if 0 <= col + col_direction < 8:
+                    if row > 0:
+                        PAWN_ATTACKS[WHITE][square] |= 1 << ((row - 1) * 8 + col + col_direction)
+                    if row < 7:
+                        PAWN_ATTACKS[BLACK][square] |= 1 << ((row + 1) * 8 + col + col_direction)
+
+    # Directions come in opposite pairs (0/1, 2/3, 4/7, 5/6), which together span a whole line
+    for square in range(64):
+        for direction, opposite in LINE_DIRECTIONS:
+            line = RAYS[direction][square] | RAYS[opposite][square] | (1 << square)
+            for target in squares_of(RAYS[direction][square] | RAYS[opposite][square]):
+                LINE[square * 64 + target] = line
+
+
+def _build_line_attacks():
+    for line, directions in enumerate(LINE_DIRECTIONS):
+        for square in range(64):
+            mask = 0
+            for direction in directions:
+                ray = RAYS[direction][square]
+                if ray:
+                    far_end = ray.bit_length() - 1 if POSITIVE_DIRECTION[direction] else (ray & -ray).bit_length() - 1
+                    mask |= ray ^ (1 << far_end)
+            LINE_BLOCKER_MASKS[line][square] = mask
+
+            # Every subset of the mask, enumerated with the carry-rippler trick
+            attacks = LINE_ATTACKS[line][square]
+            blockers = 0
+            while True:
+                attacked = 0
+                for direction in directions:
+                    ray = RAYS[direction][square]
+                    stops = ray & blockers
+                    if stops:
+                        nearest = (stops & -stops).bit_length() - 1 if POSITIVE_DIRECTION[direction] else stops.bit_length() - 1
+                        ray ^= RAYS[direction][nearest]
+                    attacked |= ray
+                attacks[blockers] = attacked
+                blockers = (blockers - mask) & mask
+                if not blockers:
+                    break
+
+
+def _all_masks() -> list[list[int]]:
+    return [KNIGHT_ATTACKS, KING_ATTACKS, PAWN_ATTACKS[WHITE], PAWN_ATTACKS[BLACK]] + RAYS + [BETWEEN, LINE]
+
+
+def _load_cache() -> bool:
+    masks = _all_masks()
+    values = array('Q')
+    try:
+        with open(CACHE_PATH, 'rb') as f:
+            values.fromfile(f, 2 + sum(len(mask) for mask in masks))
+    except (OSError, EOFError):
+        return False
+    if values[0] != _CACHE_VERSION or values[1] != len(masks):
+        return False
+    position = 2
+    for mask in masks:
+        mask[:] = values[position:position + len(mask)]
+        position += len(mask)
+    return True
+
+
+def _save_cache():
+    values = array('Q', [_CACHE_VERSION, len(_all_masks())])
+    for mask in _all_masks():
+        values.extend(mask)
+    # Write to a temporary file first so a process reading the cache never sees half a file
+    temporary_path = f"{CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(temporary_path, 'wb') as f:
+            values.tofile(f)
+        os.replace(temporary_path, CACHE_PATH)
+    except OSError:
+        pass  # The cache is only an optimization; a read-only checkout just rebuilds every time
+
+
+def _init_tables():
+    if not (USE_TABLE_CACHE and _load_cache()):
+        _build_masks()
+        if USE_TABLE_CACHE:
+            _save_cache()
+
+    for square in range(64):
+        KNIGHT_TARGETS[square] = squares_of(KNIGHT_ATTACKS[square])
+        KING_TARGETS[square] = squares_of(KING_ATTACKS[square])
+        for color in [WHITE, BLACK]:
+            PAWN_ATTACK_TARGETS[color][square] = squares_of(PAWN_ATTACKS[color][square])
+        for direction in range(8):
+            ray = squares_of(RAYS[direction][square])
+            RAY_TARGETS[square][direction] = ray if POSITIVE_DIRECTION[direction] else ray[::-1]
+    _build_line_attacks()
+
+
+_init_tables()
@@ -1,5 +1,34 @@
 import unittest
 from main import Board, Move, piece_helper
+from bitboard import BitboardBoard, rook_attacks, bishop_attacks
+import tables
+import perft
+import benchmark
+from alpha_beta_player import AlphaBetaPlayer, MATE_SCORE
+from lazy_smp import LazySMPPlayer
+from opening_book import OpeningBook, polyglot_key, polyglot_move
+from timer import Timer
+from move_ordering import MoveOrdering
+from transposition_table import TranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
+from evaluation_cache import EvaluationCache
+import pickle
+import os
+import tempfile
+import struct
+import random
+import threading
+try:
+    import numpy as np
+    import encoder
+    import nnue
+except ImportError:  # The neural network tests need numpy and torch from requirements.txt
+    np = encoder = nnue = None
+try:
+    import torch
+    import nn_evaluation
+    import inference_server
+except ImportError:
+    torch = nn_evaluation = inference_server = None
 import time
 
 
@@ -27,16 +56,18 @@ def move_generation_test(board: Board, depth: int) -> int:
 
 
 class TestBoard(unittest.TestCase):
+    board_class = Board
+
     def test_initial_position_moves(self):
         """Test legal moves from the initial position"""
-        board = Board()
+        board = self.board_class()
         moves = board.get_all_legal_moves()
         self.assertEqual(len(moves), 20)  # 16 pawn moves + 4 knight moves
 
     def test_en_passant(self):
         """Test en passant capture is correctly generated"""
         # Position after 1. e4 c5 2. e5 d5
-        board = Board("rnbqkbnr/pp2pppp/8/2ppP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3")
+        board = self.board_class("rnbqkbnr/pp2pppp/8/2ppP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3")
         moves = board.get_all_legal_moves()
         # Find en passant capture
         en_passant_moves = [move for move in moves if move.is_en_passant]
@@ -48,7 +79,7 @@ class TestBoard(unittest.TestCase):
     def test_castling(self):
         """Test castling moves are correctly generated"""
         # Position where both sides can castle both ways
-        board = Board("r3k2r/pppqpppp/2n2n2/3p4/3P4/2N2N2/PPPQPPPP/R3K2R w KQkq - 0 1")
+        board = self.board_class("r3k2r/pppqpppp/2n2n2/3p4/3P4/2N2N2/PPPQPPPP/R3K2R w KQkq - 0 1")
         moves = board.get_all_legal_moves()
         castle_moves = [move for move in moves if move.is_kingside_castle or move.is_queenside_castle]
         self.assertEqual(len(castle_moves), 2)  # Both kingside and queenside castling should be possible
@@ -56,7 +87,7 @@ class TestBoard(unittest.TestCase):
     def test_pawn_promotion(self):
         """Test pawn promotion moves are correctly generated"""
         # Position with white pawn about to promote
-        board = Board("8/3P4/8/8/8/8/8/k6K w - - 0 1")
+        board = self.board_class("8/3P4/8/8/8/8/8/k6K w - - 0 1")
         moves = board.get_all_legal_moves()
         promotion_moves = [move for move in moves if move.promotion_piece is not None]
         self.assertEqual(len(promotion_moves), 4)  # Should be able to promote to Q, R, B, N
@@ -64,20 +95,20 @@ class TestBoard(unittest.TestCase):
     def test_checkmate_position(self):
         """Test that no moves are available in checkmate position"""
         # Scholar's mate position
-        board = Board("rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 0 4")
+        board = self.board_class("rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 0 4")
         moves = board.get_all_legal_moves()
         self.assertEqual(len(moves), 0)  # No legal moves in checkmate
 
     def test_stalemate_position(self):
         """Test that no moves are available in stalemate position"""
         # Common stalemate position
-        board = Board("k7/8/1Q6/8/8/8/8/7K b - - 0 1")
+        board = self.board_class("k7/8/1Q6/8/8/8/8/7K b - - 0 1")
         moves = board.get_all_legal_moves()
         self.assertEqual(len(moves), 0)  # No legal moves in stalemate
 
     def test_check_evasion(self):
         """Test that only legal moves that do not enter check are generated"""
-        board = Board("8/8/8/8/3r4/8/4K3/8 w - - 0 1")
+        board = self.board_class("8/8/8/8/3r4/8/4K3/8 w - - 0 1")
         moves = board.get_all_legal_moves()
         self.assertTrue(all(board.get_piece(move.start_row, move.start_col) == piece_helper.white_king for move in moves))
         self.assertEqual(len(moves), 5)
@@ -85,15 +116,154 @@ class TestBoard(unittest.TestCase):
     def test_discovered_check(self):
         """Test that discovered checks are correctly handled"""
         # Position where moving a bishop reveals a rook's check
-        board = Board("8/1K6/8/8/8/8/Rb2k3/8 b - - 0 1")
+        board = self.board_class("8/1K6/8/8/8/8/Rb2k3/8 b - - 0 1")
         moves = board.get_all_legal_moves()
         # The bishop cannot move in a way that exposes the king to the rook
         bishop_moves = [move for move in moves if board.get_piece(move.start_row, move.start_col) == piece_helper.black_bishop]
         self.assertEqual(len(bishop_moves), 0)  # Can only move along the diagonal to maintain protection
 
+    def test_en_passant_discovered_check(self):
+        """Test that en passant is rejected when removing both pawns exposes the king along the rank"""
+        board = self.board_class("8/8/8/K2pP2r/8/8/8/7k w - d6 0 1")
+        moves = board.get_all_legal_moves()
+        self.assertFalse(any(move.is_en_passant for move in moves))
+        self.assertEqual(len(moves), 6)
+
+    def test_pinned_piece_moves_along_pin(self):
+        """Test that a pinned slider may only move along the pin ray"""
+        board = self.board_class("4r1k1/8/8/8/8/8/4R3/4K3 w - - 0 1")
+        rook_moves = board.get_piece_moves(6, 4)
+        self.assertEqual(sorted((move.end_row, move.end_col) for move in rook_moves),
+                         [(0, 4), (1, 4), (2, 4), (3, 4), (4, 4), (5, 4)])
+
+    def test_attackers_of(self):
+        """Test that attackers are found by looking outward from the target square"""
+        board = self.board_class("4k3/8/2n5/1b2r3/3P4/2N2Q2/4P3/3RK3 w - - 0 1")
+        self.assertEqual(sorted(board.attackers_of(3, 3, True)), [(5, 2), (5, 5)])  # d5: Nc3, Qf3 (Rd1 is blocked)
+        self.assertEqual(board.attackers_of(3, 3, False), [(3, 4)])                 # d5: Re5
+        self.assertEqual(board.attackers_of(4, 3, True), [(7, 3)])                  # d4: Rd1
+        self.assertTrue(board.is_square_attacked(4, 3, True))    # d4 is attacked by black: Nc6
+        self.assertTrue(board.is_square_attacked(1, 3, True))    # d7 is attacked by black: Ke8
+        self.assertFalse(board.is_square_attacked(4, 7, False))  # h4 is not attacked by white
+
+    def test_piece_lists_follow_moves(self):
+        """Test that piece lists and king squares stay in sync with the board through make/undo"""
+        def expected_piece_lists(board):
+            squares = {True: set(), False: set()}
+            for row in range(8):
+                for col in range(8):
+                    if board.board[row][col] != piece_helper.empty:
+                        squares[board.board[row][col] > 0].add(row * 8 + col)
+            return squares
+
+        # Castling both ways, en passant and promotions with capture are all available
+        board = self.board_class("r3k2r/1P6/8/8/3pP3/8/8/R3K2R b KQkq e3 0 1")
+        for move in board.get_all_legal_moves():
+            board.make_move(move)
+            for reply in board.get_all_legal_moves():
+                board.make_move(reply)
+                self.assertEqual(board.piece_squares, expected_piece_lists(board))
+                for is_white in [True, False]:
+                    king_row, king_col = board.find_king(is_white)
+                    self.assertEqual(abs(board.get_piece(king_row, king_col)), piece_helper.white_king)
+                board.undo_move()
+            board.undo_move()
+        self.assertEqual(board.piece_squares, expected_piece_lists(board))
+
+    def test_threefold_repetition(self):
+        """Test repetition counting across make/undo and its reset after a pawn move"""
+        board = self.board_class()
+        shuffle = [Move(7, 6, 5, 5), Move(0, 6, 2, 5), Move(5, 5, 7, 6), Move(2, 5, 0, 6)]  # Nf3 Nf6 Ng1 Ng8
+        for move in shuffle:
+            board.make_move(move)
+        self.assertEqual(board.repetition_counts[board.get_zobrist_hash()], 2)
+        self.assertEqual(board.get_gamestate(), "ongoing")
+        for move in shuffle:
+            board.make_move(move)
+        self.assertEqual(board.get_gamestate(), "draw_threefold_repetition")
+        board.undo_move()
+        self.assertEqual(board.get_gamestate(), "ongoing")
+        board.make_move(shuffle[-1])
+
+        # A pawn move starts a fresh count, and undoing it brings the old one back
+        board.make_move(Move(6, 4, 4, 4))
+        self.assertEqual(board.repetition_counts, {board.get_zobrist_hash(): 1})
+        board.undo_move()
+        self.assertEqual(board.get_gamestate(), "draw_threefold_repetition")
+        while board.undo_move():
+            pass
+        self.assertEqual(board.repetition_counts, {board.get_zobrist_hash(): 1})
+        self.assertEqual(board.repetition_stack, [])
+
+    def test_has_legal_move(self):
+        """Test the early-exit legal move check against checkmate, stalemate and double check"""
+        self.assertTrue(self.board_class().has_legal_move())
+        checkmate = self.board_class("rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3")
+        self.assertFalse(checkmate.has_legal_move())
+        self.assertEqual(checkmate.get_gamestate(), "checkmate")
+        stalemate = self.board_class("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+        self.assertFalse(stalemate.has_legal_move())
+        self.assertEqual(stalemate.get_gamestate(), "stalemate")
+        # Double check with one flight square for the king
+        double_check = self.board_class("4k3/8/3N4/8/8/8/8/4R1K1 b - - 0 1")
+        self.assertTrue(double_check.has_legal_move())
+        self.assertEqual(len(double_check.get_all_legal_moves()), 3)
+
+    def test_staged_move_generation(self):
+        """Test that captures and promotions come before quiet moves and the board may change between yields"""
+        board = self.board_class("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        fen = board.get_fen()
+        moves = []
+        for move in board.generate_legal_moves():
+            moves.append(move)
+            board.make_move(move)
+            board.get_all_legal_moves()
+            board.undo_move()
+        self.assertEqual(board.get_fen(), fen)
+        self.assertEqual(moves, board.get_all_legal_moves())
+        self.assertEqual(len(moves), 48)
+        captures = [move for move in moves if board.get_piece(move.end_row, move.end_col) != piece_helper.empty]
+        self.assertEqual(len(captures), 8)
+        self.assertEqual(set(moves[:8]), set(captures))
+
+        quiet_moves = list(board.generate_quiet_moves())
+        self.assertEqual(quiet_moves, moves[8:])
+        self.assertTrue(board.is_legal_move(quiet_moves[0]))
+        self.assertFalse(board.is_legal_move(Move(7, 4, 5, 4)))  # King two squares up the file
+        self.assertFalse(board.is_legal_move(Move(1, 0, 2, 0)))  # Black pawn on white's turn
+
+        promotions = list(self.board_class("4k3/1P6/8/8/8/8/8/4K3 w - - 0 1").generate_legal_moves())
+        self.assertEqual([move.promotion_piece for move in promotions[:4]],
+                         [piece_helper.white_queen, piece_helper.white_rook, piece_helper.white_bishop, piece_helper.white_knight])
+        self.assertEqual(len(promotions), 9)
+
+    def test_legal_captures(self):
+        """Test that the captures-only path matches the captures, en passant and promotions of the full list"""
+        for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+                    "rnbqkbnr/pp2pppp/8/2ppP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3"]:
+            board = self.board_class(fen)
+            expected = [move for move in board.get_all_legal_moves()
+                        if board.get_piece(move.end_row, move.end_col) != piece_helper.empty
+                        or move.is_en_passant or move.promotion_piece is not None]
+            self.assertEqual(sorted(board.get_legal_captures()), sorted(expected))
+            self.assertTrue(expected)
+
+    def test_static_exchange_evaluation(self):
+        """Test exchange outcomes including x-ray recaptures behind the first attacker"""
+        def see(fen, printable):
+            board = self.board_class(fen)
+            move = next(move for move in board.get_legal_captures() if move.get_printable() == printable)
+            return board.static_exchange_evaluation(move)
+        self.assertEqual(see("1k1r4/1pp4p/p7/4p3/8/P5P1/1PP4P/2K1R3 w - - 0 1", "e1-e5"), 100)
+        self.assertEqual(see("1k1r3q/1ppn3p/p4b2/4p3/8/P2N2P1/1PP1R1BP/2K1Q3 w - - 0 1", "d3-e5"), -220)
+        self.assertEqual(see("3rk3/8/8/3p4/8/8/3R4/3RK3 w - - 0 1", "d2-d5"), 100)
+        self.assertEqual(see("3rk3/3r4/8/3p4/8/8/3R4/3RK3 w - - 0 1", "d2-d5"), -400)
+        self.assertEqual(see("4k3/8/2p5/3q4/4P3/8/8/4K3 w - - 0 1", "e4-d5"), 800)
+
     def test_gen_by_depth(self):
         """Test move generation by depth"""
-        board = Board("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8")
+        board = self.board_class("rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8")
         
         start = time.time()
         result = move_generation_test(board, 1)
@@ -117,7 +287,7 @@ class TestBoard(unittest.TestCase):
 
     def test_gen_by_depth2(self):
         """Test move generation by depth"""
-        board = Board()
+        board = self.board_class()
 
         start = time.time()
         result = move_generation_test(board, 1)
@@ -147,16 +317,16 @@ class TestBoard(unittest.TestCase):
     def test_zobrist_hash(self):
         """Test that Zobrist hashing works correctly"""
         # Test 1: Same position should have same hash
-        board1 = Board()
-        board2 = Board()
+        board1 = self.board_class()
+        board2 = self.board_class()
         self.assertEqual(board1.get_zobrist_hash(), board2.get_zobrist_hash())
 
         # Test 2: Different positions should have different hashes
-        board2 = Board("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1")  # After 1. e4
+        board2 = self.board_class("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1")  # After 1. e4
         self.assertNotEqual(board1.get_zobrist_hash(), board2.get_zobrist_hash())
 
         # Test 3: Moving a piece and moving it back should give the same hash
-        board = Board()
+        board = self.board_class()
         original_hash = board.get_zobrist_hash()
         
         # Make a move
@@ -171,15 +341,585 @@ class TestBoard(unittest.TestCase):
         self.assertEqual(original_hash, final_hash)
 
         # Test 4: Test that castling rights affect the hash
-        board1 = Board("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")  # All castling rights
-        board2 = Board("r3k2r/8/8/8/8/8/8/R3K2R w KQ - 0 1")    # Only white castling rights
+        board1 = self.board_class("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")  # All castling rights
+        board2 = self.board_class("r3k2r/8/8/8/8/8/8/R3K2R w KQ - 0 1")    # Only white castling rights
         self.assertNotEqual(board1.get_zobrist_hash(), board2.get_zobrist_hash())
 
         # Test 5: Test that en passant square affects the hash
-        board1 = Board("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1")  # After 1. e4
-        board2 = Board("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")   # Same but no e.p.
+        board1 = self.board_class("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1")  # After 1. e4
+        board2 = self.board_class("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")   # Same but no e.p.
         self.assertNotEqual(board1.get_zobrist_hash(), board2.get_zobrist_hash())
 
+    def test_incremental_zobrist_hash(self):
+        """Test that the running hash matches a full recomputation after every make/undo"""
+        # Castling, promotions, en passant and rook captures all within two plies
+        board = self.board_class("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        root_hash = board.get_zobrist_hash()
+        for move in board.get_all_legal_moves():
+            board.make_move(move)
+            self.assertEqual(board.get_zobrist_hash(), board.compute_zobrist_hash())
+            for reply in board.get_all_legal_moves():
+                board.make_move(reply)
+                self.assertEqual(board.get_zobrist_hash(), board.compute_zobrist_hash())
+                board.undo_move()
+            board.undo_move()
+        self.assertEqual(board.get_zobrist_hash(), root_hash)
+
+    def test_rook_capture_clears_castling(self):
+        """Test that capturing a rook on its home square removes the opponent's castling right"""
+        board = self.board_class("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+        board.make_move(Move(7, 0, 0, 0))  # Rxa8
+        self.assertEqual(board.get_fen().split()[2], "Kk")
+        self.assertEqual(board.get_zobrist_hash(), board.compute_zobrist_hash())
+
+    def test_incremental_evaluation(self):
+        """Test that make_move and undo_move keep the evaluation sums equal to a full recomputation"""
+        self.assertEqual(self.board_class().evaluate(), 0)  # Symmetric position
+        white = self.board_class("4k3/8/8/8/8/8/8/3QK3 w - - 0 1")
+        black = self.board_class("3qk3/8/8/8/8/8/8/4K3 b - - 0 1")
+        self.assertGreater(white.evaluate(), 0)
+        self.assertEqual(white.evaluate(), black.evaluate())
+
+        for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1",
+                    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1"]:
+            board = self.board_class(fen)
+            expected = (board.eval_score, board.eval_phase)
+            for move in board.get_all_legal_moves():
+                board.make_move(move)
+                self.assertTrue(board.check_evaluation(), move.get_printable())
+                for reply in board.get_all_legal_moves():
+                    board.make_move(reply)
+                    self.assertTrue(board.check_evaluation(), f"{move.get_printable()} {reply.get_printable()}")
+                    board.undo_move()
+                board.undo_move()
+                self.assertEqual((board.eval_score, board.eval_phase), expected)
+
+
+class TestMove(unittest.TestCase):
+    def test_packed_move_attributes(self):
+        """Test that packed moves expose the same attributes as they were built with"""
+        move = Move(1, 3, 0, 2, promotion_piece=piece_helper.white_knight)
+        self.assertEqual((move.start_row, move.start_col, move.end_row, move.end_col), (1, 3, 0, 2))
+        self.assertEqual(move.promotion_piece, piece_helper.white_knight)
+        self.assertFalse(move.is_en_passant or move.is_kingside_castle or move.is_queenside_castle)
+        self.assertEqual(Move(6, 3, 7, 3, promotion_piece=piece_helper.black_queen).promotion_piece, piece_helper.black_queen)
+        self.assertTrue(Move(3, 4, 2, 3, is_en_passant=True).is_en_passant)
+        self.assertEqual(Move(7, 4, 7, 6, is_kingside_castle=True).get_printable(), "O-O")
+        self.assertEqual(Move(6, 4, 4, 4).get_printable(), "e2-e4")
+        self.assertEqual(Move(6, 4, 4, 4), Move(6, 4, 4, 4))
+        self.assertLess(Move(7, 7, 7, 7, promotion_piece=piece_helper.white_queen), 1 << 16)
+
+
+class TestBitboardBoard(TestBoard):
+    board_class = BitboardBoard
+
+    def test_bitboards_match_board(self):
+        """Test that incremental bitboard updates agree with a rebuild from the 8x8 board"""
+        board = BitboardBoard("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        for move in board.get_all_legal_moves():
+            board.make_move(move)
+            for reply in board.get_all_legal_moves():
+                board.make_move(reply)
+                bitboards, occupancy = board.bitboards[:], board.occupancy[:]
+                board.sync_bitboards()
+                self.assertEqual((bitboards, occupancy), (board.bitboards, board.occupancy))
+                board.undo_move()
+            board.undo_move()
+
+
+class TestPerft(unittest.TestCase):
+    def test_perft_modes_agree(self):
+        """Test that bulk counting, the hash table, divide and the process pool give the same counts"""
+        fen = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+        board = Board(fen)
+        self.assertEqual(perft.perft(board, 3), 97862)
+        self.assertEqual(perft.perft(board, 3, {}), 97862)
+        counts = perft.divide(board, 2)
+        self.assertEqual(len(counts), 48)
+        self.assertEqual(sum(counts.values()), 2039)
+        self.assertEqual(perft.divide(BitboardBoard(fen), 2, {}, processes=2), counts)
+        self.assertEqual(board.get_fen(), Board(fen).get_fen())
+
+    def test_moves_pickle(self):
+        """Test that packed moves survive pickling, which the process pool relies on"""
+        move = Move(1, 0, 0, 0, promotion_piece=piece_helper.white_queen)
+        self.assertEqual(pickle.loads(pickle.dumps(move)), move)
+        self.assertIsInstance(pickle.loads(pickle.dumps(move)), Move)
+        self.assertEqual(perft.move_label(move), "a7-a8=Q")
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_find_regressions(self):
+        """Test that only results slower than the baseline by more than the threshold are flagged"""
+        baseline = {"perft": {"start": 1000.0, "kiwipete": 1000.0}, "get_fen": {"start": 500.0}}
+        results = {"perft": {"start": 850.0, "kiwipete": 950.0}, "get_fen": {"start": 900.0}}
+        regressions = benchmark.find_regressions(results, baseline, threshold=0.1)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("perft/start"))
+        self.assertEqual(benchmark.find_regressions(results, baseline, threshold=0.2), [])
+
+
+class TestAlphaBetaPlayer(unittest.TestCase):
+    def test_finds_mates(self):
+        """Test that the search finds a back-rank mate and a mate in two"""
+        player = AlphaBetaPlayer(max_depth=4)
+        board = Board("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1")
+        self.assertEqual(player.think(board, Timer(600000, 0)).get_printable(), "a1-a8")
+        self.assertEqual(player.iterations[-1][1], MATE_SCORE - 1)
+        board = Board("6k1/6p1/6Q1/8/8/8/8/K4R2 w - - 0 1")
+        player.think(board, Timer(600000, 0))
+        self.assertEqual(player.iterations[-1][1], MATE_SCORE - 3)
+
+    def test_quiescence_sees_recapture(self):
+        """Test that a one-ply search does not grab a pawn defended by a pawn"""
+        player = AlphaBetaPlayer(max_depth=1)
+        board = Board("4k3/8/2p5/3p4/8/8/3Q4/4K3 w - - 0 1")
+        self.assertNotEqual(player.think(board, Timer(600000, 0)).get_printable(), "d2-d5")
+        self.assertEqual(board.get_fen(), "4k3/8/2p5/3p4/8/8/3Q4/4K3 w - - 0")
+
+    def test_time_budget(self):
+        """Test that an interrupted search returns a legal move and leaves the board as it found it"""
+        player = AlphaBetaPlayer()
+        board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        fen = board.get_fen()
+        timer = Timer(3000, 0)
+        start_time = time.time()
+        move = player.think(board, timer)
+        self.assertLess(time.time() - start_time, player.time_budget_ms(timer) / 1000 + 0.5)
+        self.assertIn(move, board.get_all_legal_moves())
+        self.assertEqual(board.get_fen(), fen)
+        self.assertGreaterEqual(len(player.iterations), 1)
+
+    def test_lazy_smp(self):
+        """Test that helpers searching through the shared table still give a legal move and an unchanged board"""
+        player = LazySMPPlayer(workers=2, max_depth=3, hash_size_mb=1)
+        try:
+            board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+            fen = board.get_fen()
+            move = player.think(board, Timer(60000, 0))
+            self.assertIn(move, board.get_all_legal_moves())
+            self.assertEqual(board.get_fen(), fen)
+            board.make_move(move)
+            self.assertIsNotNone(player.transposition_table.probe(board.get_zobrist_hash()))
+        finally:
+            player.close()
+
+
+class TestMoveOrdering(unittest.TestCase):
+    def test_order_moves(self):
+        """Test hash move, MVV-LVA captures, killers and history in that order"""
+        board = Board("4k3/8/2n5/3q1p2/4P3/2N5/8/4K3 w - - 0 1")
+        ordering = MoveOrdering()
+        moves = board.get_all_legal_moves()
+        hash_move, killer = Move(7, 4, 7, 5), Move(5, 2, 3, 1)  # Kf1, Nb5
+        ordering.record_cutoff(board, killer, 3, 2, 4)
+        ordering.record_cutoff(board, Move(7, 4, 6, 4), 5, 4, 0)  # Ke2 earns history at another ply
+        ordered = [move.get_printable() for move in ordering.order_moves(board, moves, hash_move, 2)]
+        self.assertEqual(ordered[:6], ["e1-f1", "e4-d5", "c3-d5", "e4-f5", "c3-b5", "e1-e2"])
+        self.assertEqual(sorted(ordered), sorted(move.get_printable() for move in moves))
+        self.assertEqual(ordering.stats()["first_move_cutoff_rate"], 0.5)
+
+    def test_staged_moves(self):
+        """Test that staged generation gives the order of order_moves and skips quiet moves after an early cut-off"""
+        board = Board("4k3/8/2n5/3q1p2/4P3/2N5/8/4K3 w - - 0 1")
+        ordering = MoveOrdering()
+        hash_move, killer = Move(7, 4, 7, 5), Move(5, 2, 3, 1)  # Kf1, Nb5
+        ordering.record_cutoff(board, killer, 3, 2, 4)
+        ordering.record_cutoff(board, Move(7, 4, 6, 4), 5, 4, 0)
+        ordering.killers[2][1] = Move(5, 2, 3, 3)  # Nxd5 is a capture here, so not searched as a killer
+        expected = ordering.order_moves(board, board.get_all_legal_moves(), hash_move, 2)
+        self.assertEqual(list(ordering.staged_moves(board, hash_move, 2)), expected)
+        # An illegal hash move is skipped
+        self.assertEqual(list(ordering.staged_moves(board, Move(7, 4, 5, 4), 2)),
+                         ordering.order_moves(board, board.get_all_legal_moves(), None, 2))
+
+        quiet_calls = []
+        board.generate_quiet_moves = lambda: quiet_calls.append(1) or iter(())
+        staged = ordering.staged_moves(board, hash_move, 2)
+        self.assertEqual([next(staged) for _ in range(4)], expected[:4])  # Hash move and the captures
+        self.assertEqual(quiet_calls, [])
+
+    def test_captures_do_not_become_killers(self):
+        """Test that cut-offs by captures leave the killer slots and history alone"""
+        board = Board("4k3/8/8/3p4/4P3/8/8/4K3 w - - 0 1")
+        ordering = MoveOrdering()
+        ordering.record_cutoff(board, Move(4, 4, 3, 3), 4, 0, 0)
+        self.assertEqual(ordering.killers[0], [None, None])
+        self.assertFalse(any(ordering.history))
+
+
+class TestTranspositionTable(unittest.TestCase):
+    def test_probe_and_store(self):
+        """Test that entries round-trip and unknown keys miss"""
+        table = TranspositionTable(0.01)
+        move = Move(6, 4, 4, 4)
+        table.store(0xDEADBEEF12345678, 5, BOUND_LOWER, -99995, move)
+        self.assertEqual(table.probe(0xDEADBEEF12345678), (5, BOUND_LOWER, -99995, move))
+        self.assertIsNone(table.probe(0xDEADBEEF12345679))
+        # A result without a move keeps the move already stored for the position
+        table.store(0xDEADBEEF12345678, 6, BOUND_UPPER, 12, None)
+        self.assertEqual(table.probe(0xDEADBEEF12345678), (6, BOUND_UPPER, 12, move))
+        stats = table.stats()
+        self.assertEqual((stats["probes"], stats["hits"], stats["stores"]), (3, 2, 2))
+
+    def test_bucket_replacement(self):
+        """Test that a deep entry survives shallower stores to its bucket until a new search starts"""
+        table = TranspositionTable(0.01)
+        deep, shallow, other = 7, 7 + table.num_buckets, 7 + 2 * table.num_buckets  # Same bucket
+        table.store(deep, 8, BOUND_EXACT, 1, None)
+        table.store(shallow, 2, BOUND_EXACT, 2, None)
+        table.store(other, 3, BOUND_EXACT, 3, None)
+        self.assertEqual(table.probe(deep)[2], 1)
+        self.assertIsNone(table.probe(shallow))
+        self.assertEqual(table.probe(other)[2], 3)
+        self.assertEqual(table.collisions, 1)
+        table.new_search()
+        table.store(shallow, 1, BOUND_EXACT, 2, None)
+        self.assertIsNone(table.probe(deep))
+        self.assertEqual(table.probe(shallow)[2], 2)
+
+    def test_external_buffer(self):
+        """Test a table laid over a caller-provided buffer, as used for shared memory"""
+        buffer = bytearray(64 * 32 + 5)
+        table = TranspositionTable(buffer=buffer)
+        self.assertEqual(table.num_buckets, 64)
+        table.store(12345, 3, BOUND_EXACT, 0, None)
+        self.assertEqual(TranspositionTable(buffer=buffer).probe(12345), (3, BOUND_EXACT, 0, None))
+        self.assertGreater(table.fill(), 0)
+        table.clear()
+        self.assertIsNone(table.probe(12345))
+
+    def test_save_and_load(self):
+        """Test that saved entries load into a table of another size and are replaced first after a new search"""
+        table = TranspositionTable(0.01)
+        table.new_search()
+        move = Move(6, 4, 4, 4)
+        keys = [0x0123456789ABCDEF * (i + 1) & (2 ** 64 - 1) for i in range(50)]
+        for depth, key in enumerate(keys):
+            table.store(key, depth % 10, BOUND_EXACT, depth - 25, move)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "table.cache")
+            saved = table.save(path)
+            self.assertEqual(saved, int(table.fill() * table.num_buckets * 2))
+            self.assertLess(os.path.getsize(path), saved * 16 + 32)
+
+            loaded_table = TranspositionTable(0.02)
+            self.assertEqual(loaded_table.load(path), saved)
+            self.assertEqual(loaded_table.age, table.age)
+            for key in keys:
+                self.assertEqual(loaded_table.probe(key), table.probe(key))
+            self.assertEqual(loaded_table.load(os.path.join(directory, "missing.cache")), 0)
+
+            # Once the next search starts, a shallow new entry evicts a deep loaded one
+            table = TranspositionTable(0.01)
+            table.store(5, 9, BOUND_EXACT, 0, None)
+            table.save(path)
+            table = TranspositionTable(0.01)
+            table.load(path)
+            table.new_search()
+            table.store(5 + table.num_buckets, 1, BOUND_EXACT, 0, None)
+            self.assertIsNone(table.probe(5))
+
+
+class TestOpeningBook(unittest.TestCase):
+    def test_polyglot_keys(self):
+        """Test the board's hashes against the reference keys of the Polyglot book format"""
+        board = Board()
+        self.assertEqual(polyglot_key(board), 0x463B96181691FC9C)
+        expected = [0x823C9B50FD114196, 0x0756B94461C50FB0, 0x662FAFB965DB29D4, 0x22A48B5A8E47FF78]
+        for move, key in zip([Move(6, 4, 4, 4), Move(1, 3, 3, 3), Move(4, 4, 3, 4), Move(1, 5, 3, 5)], expected):
+            board.make_move(move)
+            self.assertEqual(polyglot_key(board), key)
+        # e5xf6 is possible, so the en passant file is hashed and the key is the running hash
+        self.assertEqual(polyglot_key(board), board.get_zobrist_hash())
+
+    def test_book_moves(self):
+        """Test that the memory-mapped book finds weighted moves, including castling, by binary search"""
+        start = Board()
+        castle = Board("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+        e4, d4 = Move(6, 4, 4, 4), Move(6, 3, 4, 3)
+        kingside = next(move for move in castle.get_all_legal_moves() if move.is_kingside_castle)
+        entries = sorted([(polyglot_key(start), polyglot_move(d4), 5), (polyglot_key(start), polyglot_move(e4), 10),
+                          (polyglot_key(castle), polyglot_move(kingside), 1), (1, 0, 1), (2 ** 64 - 1, 0, 1)])
+        self.assertEqual(polyglot_move(kingside), 0x0107)  # e1h1
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "book.bin")
+            with open(path, "wb") as f:
+                for key, move, weight in entries:
+                    f.write(struct.pack(">QHHI", key, move, weight, 0))
+            with OpeningBook(path) as book:
+                self.assertEqual(len(book), 5)
+                self.assertEqual(book.get_moves(start), [(e4, 10), (d4, 5)])
+                self.assertEqual(book.choose_move(castle), kingside)
+                self.assertIsNone(book.choose_move(Board("4k3/8/8/8/8/8/8/4K3 w - - 0 1")))
+
+            player = AlphaBetaPlayer(max_depth=1, book_path=path)
+            self.assertEqual(player.think(start, Timer(1000, 0)), e4)
+            self.assertEqual(player.nodes, 0)
+            player.book.close()
+
+
+class TestEvaluationCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        """Test that a full cache evicts the least recently used position"""
+        cache = EvaluationCache(capacity=2)
+        cache.put(1, 10.0)
+        cache.put(2, 20.0)
+        self.assertEqual(cache.get(1), 10.0)  # 2 is now the least recently used
+        cache.put(3, 30.0)
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(cache.get(1), 10.0)
+        self.assertEqual(cache.get(3), 30.0)
+        cache.put(3, 31.0)  # Updating a cached position evicts nothing
+        self.assertEqual(len(cache), 2)
+
+        stats = cache.stats()
+        self.assertEqual((stats["probes"], stats["hits"], stats["evictions"]), (4, 3, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 0.75)
+        self.assertGreater(stats["memory_mb"], 0)
+        cache.clear()
+        self.assertEqual((len(cache), cache.stats()["probes"]), (0, 0))
+
+    def test_save_and_load(self):
+        """Test that saved scores load in their order of use and that bad files load nothing"""
+        cache = EvaluationCache()
+        for key in range(1, 6):
+            cache.put(key << 59, key / 4)
+        cache.get(1 << 59)  # Now the most recently used
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "eval.cache")
+            self.assertEqual(cache.save(path), 5)
+            self.assertEqual(os.path.getsize(path), 12 + 5 * 16)
+
+            loaded = EvaluationCache(capacity=3)
+            self.assertEqual(loaded.load(path), 5)
+            self.assertEqual(list(loaded.entries.items()), [(4 << 59, 1.0), (5 << 59, 1.25), (1 << 59, 0.25)])
+
+            self.assertEqual(EvaluationCache().load(os.path.join(directory, "missing.cache")), 0)
+            with open(path, "r+b") as f:
+                f.truncate(40)
+            self.assertEqual(EvaluationCache().load(path), 0)
+            with open(path, "wb") as f:
+                f.write(b"TTAB" + bytes(8))
+            self.assertEqual(EvaluationCache().load(path), 0)
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestEncoder(unittest.TestCase):
+    def test_encode_boards(self):
+        """Test the vectorized features against the board squares and state"""
+        fens = ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+                "rnbqkbnr/pp2pppp/8/2ppP3/8/8/PPPP1PPP/RNBQKBNR w Kq d6 0 3",
+                "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 b - - 0 1"]
+        boards = [Board(fen) for fen in fens]
+        buffer = np.full((4, encoder.FEATURE_COUNT), 7.0, dtype=np.float32)
+        board_encoder = encoder.BoardEncoder(features=buffer)
+        features = board_encoder.encode_boards(boards)
+        self.assertTrue(np.shares_memory(features, buffer))
+        self.assertEqual(features.shape, (3, encoder.FEATURE_COUNT))
+
+        planes = encoder.piece_planes(features)
+        for board, row, position in zip(boards, features, planes):
+            for square in range(64):
+                piece = board.board[square >> 3][square & 7]
+                expected = np.zeros(12)
+                if piece:
+                    expected[abs(piece) - 1 + (6 if piece < 0 else 0)] = 1
+                self.assertTrue(np.array_equal(position[:, square >> 3, square & 7], expected))
+            self.assertEqual(row[encoder.SIDE_FEATURE], board.is_white_turn)
+            rights = [bool(board.castling_rights & (1 << bit)) for bit in range(4)]
+            self.assertEqual(list(row[encoder.CASTLING_FEATURE:encoder.CASTLING_FEATURE + 4]), rights)
+        self.assertEqual(list(np.nonzero(features[:, encoder.EN_PASSANT_FEATURE:])[0]), [1])
+        self.assertEqual(features[1, encoder.EN_PASSANT_FEATURE + 3], 1)
+
+        # Batches larger than the buffer grow it
+        self.assertEqual(board_encoder.encode_boards(boards * 3).shape, (9, encoder.FEATURE_COUNT))
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class TestNNUE(unittest.TestCase):
+    def test_incremental_matches_full(self):
+        """Test the accumulator through castling, en passant, promotions and undo against full evaluation"""
+        network = nnue.Network.random(hidden=32, l1=8)
+        fens = ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "rnbqkbnr/pp2pppp/8/2ppP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3",
+                "n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1"]
+        for net, places in [(network, 3), (network.quantize(), 9)]:
+            for fen in fens:
+                board = Board(fen)
+                start_fen = board.get_fen()
+                accumulator = nnue.Accumulator(net, board)
+                for move in board.get_all_legal_moves():
+                    board.make_move(move)
+                    self.assertAlmostEqual(accumulator.evaluate(board), net.evaluate(board), places=places)
+                    for reply in board.get_all_legal_moves():
+                        board.make_move(reply)
+                        self.assertAlmostEqual(accumulator.evaluate(board), net.evaluate(board), places=places)
+                        board.undo_move()
+                    board.undo_move()
+                self.assertEqual(accumulator.top, 0)
+                self.assertEqual(board.get_fen(), start_fen)
+                accumulator.detach(board)
+                self.assertIsNone(board.accumulator)
+
+    def test_save_and_load(self):
+        """Test that a weights file round-trips and that other files are rejected"""
+        network = nnue.Network.random(hidden=16, l1=4)
+        board = Board()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "net.nnue")
+            network.save(path)
+            loaded = nnue.Network.load(path)
+            self.assertAlmostEqual(loaded.evaluate(board), network.evaluate(board), places=3)
+            with open(path, "r+b") as f:
+                f.write(b"XXXX")
+            self.assertIsNone(nnue.Network.load(path))
+
+
+@unittest.skipIf(torch is None, "torch is not installed")
+class TestNNEvaluation(unittest.TestCase):
+    def test_batch_matches_single_positions(self):
+        """Test that one batched forward pass gives the scores of separate batch-of-one calls"""
+        torch.manual_seed(0)
+        evaluator = nn_evaluation.BatchEvaluator(nn_evaluation.reference_model())
+        board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        fen = board.get_fen()
+        moves = board.get_all_legal_moves()
+        batched = evaluator.evaluate_moves(board, moves)
+        self.assertEqual(board.get_fen(), fen)
+        self.assertEqual(batched.shape, (len(moves),))
+        for move, score in zip(moves, batched):
+            board.make_move(move)
+            single = evaluator.evaluate_positions([board])
+            board.undo_move()
+            self.assertAlmostEqual(single.item(), score.item(), places=4)
+        self.assertEqual(evaluator.batches, 1 + len(moves))
+
+        # Positions encoded by the caller score the same through the public forward pass
+        boards = []
+        for move in moves:
+            board.make_move(move)
+            boards.append(Board(board.get_fen()))
+            board.undo_move()
+        features = encoder.BoardEncoder(len(boards)).encode_boards(boards)
+        self.assertTrue(torch.allclose(evaluator.evaluate_features(features), batched, atol=1e-4))
+
+    def test_cache(self):
+        """Test that cached scores match the network and that repeated positions skip the forward pass"""
+        torch.manual_seed(0)
+        model = nn_evaluation.reference_model()
+        evaluator = nn_evaluation.BatchEvaluator(model)
+        cached = nn_evaluation.BatchEvaluator(model, cache=EvaluationCache(capacity=1000))
+        board = Board("r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1")
+        moves = board.get_all_legal_moves()
+        expected = evaluator.evaluate_moves(board, moves)
+        self.assertTrue(torch.allclose(cached.evaluate_moves(board, moves), expected))
+        self.assertEqual((cached.batches, cached.positions), (1, len(moves)))
+
+        # The same children again, as positions and as moves, come from the cache
+        children = []
+        for move in moves:
+            board.make_move(move)
+            children.append(Board(board.get_fen()))
+            board.undo_move()
+        self.assertTrue(torch.allclose(cached.evaluate_positions(children), expected))
+        self.assertTrue(torch.allclose(cached.evaluate_moves(board, moves), expected))
+        self.assertEqual(cached.batches, 1)
+        self.assertAlmostEqual(cached.cache.stats()["hit_rate"], 2 / 3)
+
+    def test_accepts_encoder_features(self):
+        """Test that only a network taking the encoder's features is batched"""
+        self.assertEqual(nn_evaluation.input_width(nn_evaluation.reference_model()), encoder.FEATURE_COUNT)
+        self.assertTrue(nn_evaluation.accepts_encoder_features(nn_evaluation.reference_model()))
+        self.assertFalse(nn_evaluation.accepts_encoder_features(torch.nn.Linear(10, 1)))
+        self.assertIsNone(nn_evaluation.input_width(object()))
+
+
+@unittest.skipIf(torch is None, "torch is not installed")
+class TestInferenceServer(unittest.TestCase):
+    def test_concurrent_clients(self):
+        """Test that requests from concurrent clients are batched and answered with the right scores"""
+        torch.manual_seed(0)
+        evaluator = nn_evaluation.BatchEvaluator(nn_evaluation.reference_model())
+        fens = ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "rnbqkbnr/pp2pppp/8/2ppP3/8/8/PPPP1PPP/RNBQKBNR w KQkq d6 0 3",
+                "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 b - - 0 1"]
+        results = [None] * len(fens)
+
+        def play(client, index):
+            board = Board(fens[index])
+            moves = board.get_all_legal_moves()
+            results[index] = (client.evaluate_moves(board, moves), client.evaluate_positions([board]))
+
+        with inference_server.InferenceServer(len(fens), seed=0, max_wait_ms=100) as server:
+            threads = [threading.Thread(target=play, args=(server.client(index), index)) for index in range(len(fens))]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            report = server.stop()
+
+        for fen, (served_moves, served_position) in zip(fens, results):
+            board = Board(fen)
+            self.assertTrue(torch.allclose(served_moves, evaluator.evaluate_moves(board, board.get_all_legal_moves()),
+                                           atol=1e-4))
+            self.assertTrue(torch.allclose(served_position, evaluator.evaluate_positions([board]), atol=1e-4))
+        self.assertEqual(report["requests"], 2 * len(fens))
+        self.assertEqual(report["positions"], sum(len(scores) + 1 for scores, *_ in results))
+        self.assertEqual(sum(report["batch_sizes"].values()), report["batches"])
+        self.assertLess(report["batches"], report["requests"])  # Concurrent requests shared batches
+        self.assertGreater(report["positions_per_second"], 0)
+        self.assertIsNone(server.stop())
+
+
+class TestTables(unittest.TestCase):
+    def test_between_and_line(self):
+        """Test the squares between and through two squares on a shared line"""
+        e1, h4, e8, a1 = 60, 39, 4, 56
+        self.assertEqual(tables.squares_of(tables.BETWEEN[e1 * 64 + h4]), [46, 53])  # g3, f2
+        self.assertEqual(tables.BETWEEN[e1 * 64 + h4], tables.BETWEEN[h4 * 64 + e1])
+        self.assertEqual(tables.squares_of(tables.BETWEEN[e1 * 64 + e8]), [12, 20, 28, 36, 44, 52])
+        self.assertEqual(tables.BETWEEN[e1 * 64 + 61], 0)  # Adjacent squares
+        self.assertEqual(tables.LINE[e1 * 64 + a1], 0xFF << 56)  # The whole first rank
+        self.assertEqual(tables.LINE[e1 * 64 + 45], 0)  # e1 and f3 share no line
+        self.assertEqual(tables.RAY_TARGETS[e1][0][:2], [52, 44])  # Nearest square first
+
+    def test_line_attacks(self):
+        """Test the sliding attack lookups against walking the rays square by square"""
+        def walk(square, occupied, directions):
+            attacks = 0
+            for direction in directions:
+                for target in tables.RAY_TARGETS[square][direction]:
+                    attacks |= 1 << target
+                    if occupied >> target & 1:
+                        break
+            return attacks
+        random_state = random.Random(1)
+        for _ in range(50):
+            occupied = random_state.getrandbits(64) & random_state.getrandbits(64)
+            for square in range(64):
+                self.assertEqual(rook_attacks(square, occupied), walk(square, occupied, tables.ROOK_DIRECTIONS))
+                self.assertEqual(bishop_attacks(square, occupied), walk(square, occupied, tables.BISHOP_DIRECTIONS))
+
+    def test_cache_round_trip(self):
+        """Test that masks written to the cache file load back unchanged"""
+        saved_path, saved_masks = tables.CACHE_PATH, [mask[:] for mask in tables._all_masks()]
+        with tempfile.TemporaryDirectory() as directory:
+            tables.CACHE_PATH = os.path.join(directory, "tables.bin")
+            try:
+                self.assertFalse(tables._load_cache())
+                tables._save_cache()
+                for mask in tables._all_masks():
+                    mask[:] = [0] * len(mask)
+                self.assertTrue(tables._load_cache())
+                self.assertEqual([mask[:] for mask in tables._all_masks()], saved_masks)
+            finally:
+                tables.CACHE_PATH = saved_path
+                for mask, saved in zip(tables._all_masks(), saved_masks):
+                    mask[:] = saved
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,245 @@
+"""
+Fixed-size transposition table for the search, keyed by Zobrist hash.
+
+Entries live in one flat array of unsigned 64-bit words, two words per entry and two entries per bucket:
+the first entry of a bucket keeps the deepest result (depth-preferred), the second takes everything else
+(always-replace). Each entry stores `key ^ data` next to `data`, so a probe only accepts an entry whose
+two words were written together; this keeps a table shared between processes safe from torn writes.
+
+Layout of the data word (low to high bits):
+    0-15   packed best move (0 if none)
+    16-35  score + SCORE_OFFSET
+    36-43  depth
+    44-45  bound type
+    46-53  age (search generation that wrote the entry)
+
+save and load keep the table between games and runs (the Zobrist keys are fixed, so stored keys stay
+valid). The file holds a header and then only the used entries as (key, data) word pairs, little-endian,
+so it can be loaded into a table of any size.
+"""
+import os
+import struct
+import sys
+from array import array
+from main import Move, _new_move
+
+
+BOUND_NONE = 0
+BOUND_LOWER = 1  # Score is at least this (fail high)
+BOUND_UPPER = 2  # Score is at most this (fail low)
+BOUND_EXACT = 3
+
+ENTRY_WORDS = 2
+BUCKET_ENTRIES = 2
+BUCKET_BYTES = ENTRY_WORDS * BUCKET_ENTRIES * 8
+SCORE_OFFSET = 1 << 19
+MAX_AGE = 255
+DEFAULT_SIZE_MB = 16
+FILL_SAMPLE_BUCKETS = 1000
+
+CACHE_MAGIC = b"TTAB"
+CACHE_VERSION = 1
+_CACHE_HEADER = struct.Struct("<4sIII")  # magic, version, age, number of entries
+
+
+class TranspositionTable:
+    def __init__(self, size_mb: float = DEFAULT_SIZE_MB, buffer=None):
+        """
+        Create a table of about `size_mb` megabytes, or lay it over an existing buffer.
+        Args:
+            size_mb: Size of the table in megabytes, ignored if a buffer is given
+            buffer: Optional writable buffer (e.g. shared memory) to use as storage;
+                    its size is rounded down to whole buckets
+        """
+        if buffer is not None:
+            self.num_buckets = len(memoryview(buffer)) // BUCKET_BYTES
+            self.table = memoryview(buffer)[:self.num_buckets * BUCKET_BYTES].cast('Q')
+        else:
+            self.num_buckets = max(1, int(size_mb * 1024 * 1024) // BUCKET_BYTES)
+            self.table = array('Q', bytes(self.num_buckets * BUCKET_BYTES))
+        self.age = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.collisions = 0
+
+    @property
+    def size_mb(self) -> float:
+        return self.num_buckets * BUCKET_BYTES / (1024 * 1024)
+
+    def new_search(self):
+        """Start a new search generation, so entries from earlier searches are replaced first."""
+        self.age = (self.age + 1) & MAX_AGE
+
+    def clear(self):
+        """Empty the table and reset the statistics."""
+        view = memoryview(self.table).cast('B')
+        view[:] = bytes(len(view))
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.collisions = 0
+
+    def probe(self, key: int) -> tuple[int, int, int, Move] | None:
+        """
+        Look up a position.
+        Args:
+            key: Zobrist hash of the position
+        Returns:
+            tuple: (depth, bound, score, best move or None), or None if the position is not stored
+        """
+        self.probes += 1
+        table = self.table
+        index = key % self.num_buckets * (ENTRY_WORDS * BUCKET_ENTRIES)
+        data = table[index + 1]
+        if not data or table[index] ^ data != key:
+            index += ENTRY_WORDS
+            data = table[index + 1]
+            if not data or table[index] ^ data != key:
+                return None
+        self.hits += 1
+        move = data & 0xFFFF
+        return (data >> 36 & 0xFF, data >> 44 & 3, (data >> 16 & 0xFFFFF) - SCORE_OFFSET,
+                _new_move(Move, move) if move else None)
+
+    def store(self, key: int, depth: int, bound: int, score: int, move: Move | None):
+        """
+        Store a search result.
+        Args:
+            key: Zobrist hash of the position
+            depth: Depth the position was searched to
+            bound: BOUND_EXACT, BOUND_LOWER or BOUND_UPPER
+            score: Score of the position
+            move: Best move found, or None
+        """
+        self.stores += 1
+        table = self.table
+        index = key % self.num_buckets * (ENTRY_WORDS * BUCKET_ENTRIES)
+        depth = min(max(depth, 0), 0xFF)
+
+        # Depth-preferred slot: take it for the same position, a stale entry or an equal or deeper search.
+        # Otherwise use the always-replace slot.
+        old_data = table[index + 1]
+        old_key = table[index] ^ old_data
+        if old_data and old_key != key:
+            second_data = table[index + ENTRY_WORDS + 1]
+            if (second_data and table[index + ENTRY_WORDS] ^ second_data == key) or \
+                    ((old_data >> 46 & MAX_AGE) == self.age and (old_data >> 36 & 0xFF) > depth):
+                index += ENTRY_WORDS
+                old_data = second_data
+                old_key = table[index] ^ old_data
+
+        if old_data and old_key == key:
+            if move is None:
+                move = old_data & 0xFFFF  # Keep the best move of a shallower search of the same position
+        elif old_data:
+            self.collisions += 1
+
+        data = ((move or 0) | (score + SCORE_OFFSET) << 16 | depth << 36 | bound << 44 | self.age << 46)
+        table[index] = key ^ data
+        table[index + 1] = data
+
+    def save(self, path: str) -> int:
+        """
+        Write the used entries to a file.
+        Args:
+            path: File to write
+        Returns:
+            int: Number of entries written
+        """
+        table = self.table
+        words = array('Q')
+        for check, data in zip(table[0::ENTRY_WORDS], table[1::ENTRY_WORDS]):
+            if data:
+                words.append(check ^ data)
+                words.append(data)
+        if sys.byteorder != "little":
+            words.byteswap()
+        with open(path, "wb") as f:
+            f.write(_CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, self.age, len(words) // ENTRY_WORDS))
+            words.tofile(f)
+        return len(words) // ENTRY_WORDS
+
+    def load(self, path: str) -> int:
+        """
+        Add the entries of a file written by save. An entry goes to an empty slot of its bucket, or replaces
+        the same position or the shallower entry if it was searched deeper. The table takes the saved age,
+        so after the next new_search the loaded entries are stale and are the first to be replaced.
+        Args:
+            path: File to read; a missing file loads nothing
+        Returns:
+            int: Number of entries loaded
+        """
+        if not os.path.exists(path):
+            return 0
+        with open(path, "rb") as f:
+            header = f.read(_CACHE_HEADER.size)
+            if len(header) < _CACHE_HEADER.size:
+                print(f"ERROR: {path} is too short to be a transposition table file")
+                return 0
+            magic, version, age, count = _CACHE_HEADER.unpack(header)
+            if magic != CACHE_MAGIC or version != CACHE_VERSION:
+                print(f"ERROR: {path} is not a version {CACHE_VERSION} transposition table file")
+                return 0
+            words = array('Q')
+            words.frombytes(f.read(count * ENTRY_WORDS * 8))
+        if len(words) != count * ENTRY_WORDS:
+            print(f"ERROR: {path} is truncated, expected {count} entries")
+            return 0
+        if sys.byteorder != "little":
+            words.byteswap()
+
+        table = self.table
+        loaded = 0
+        for position in range(0, len(words), ENTRY_WORDS):
+            key, data = words[position], words[position + 1]
+            first = key % self.num_buckets * (ENTRY_WORDS * BUCKET_ENTRIES)
+            second = first + ENTRY_WORDS
+            first_data, second_data = table[first + 1], table[second + 1]
+            if first_data and table[first] ^ first_data == key:
+                index = first
+            elif second_data and table[second] ^ second_data == key:
+                index = second
+            elif not first_data:
+                index = first
+            elif not second_data:
+                index = second
+            else:
+                index = first if (first_data >> 36 & 0xFF) <= (second_data >> 36 & 0xFF) else second
+            old_data = table[index + 1]
+            if old_data and (old_data >> 36 & 0xFF) >= (data >> 36 & 0xFF):
+                continue
+            table[index] = key ^ data
+            table[index + 1] = data
+            loaded += 1
+        self.age = age
+        return loaded
+
+    def fill(self) -> float:
+        """Fraction of entries in use, sampled from the first buckets."""
+        buckets = min(self.num_buckets, FILL_SAMPLE_BUCKETS)
+        table = self.table
+        used = sum(1 for index in range(1, buckets * BUCKET_ENTRIES * ENTRY_WORDS, ENTRY_WORDS) if table[index])
+        return used / (buckets * BUCKET_ENTRIES)
+
+    def stats(self) -> dict:
+        """
+        Usage statistics since the last reset.
+        Returns:
+            dict: size_mb, entries, probes, hits, hit_rate, stores, collisions (stores that evicted
+                  another position) and fill (fraction of entries in use)
+        """
+        return {
+            "size_mb": self.size_mb,
+            "entries": self.num_buckets * BUCKET_ENTRIES,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "stores": self.stores,
+            "collisions": self.collisions,
+            "fill": self.fill(),
+        }